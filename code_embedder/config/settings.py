@@ -4,7 +4,39 @@ from pathlib import Path
 class Settings:
     # Embedding configuration
     EMBEDDING_MODEL = "microsoft/codebert-base"
-    EMBEDDING_BATCH_SIZE = 16
+    # "torch", "onnx" or "onnx-int8" (ONNX Runtime on CPU, int8 weights)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    MODELS_DIR = "models"  # ONNX exports, relative to DATA_DIR
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))  # Files per batch when EMBEDDING_MAX_TOKENS is 0
+    # Batches are filled to a budget of padded tokens instead of a file count:
+    # EMBEDDING_SORT_WINDOW files are tokenized, sorted by length and split so
+    # that batch size times longest sequence stays within EMBEDDING_MAX_TOKENS
+    EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "8192"))
+    EMBEDDING_SORT_WINDOW = 512
+    # CPU sharding: worker processes each pinned to its own slice of cores,
+    # THREADS_PER_WORKER = 0 divides the available cores evenly
+    EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "1"))
+    THREADS_PER_WORKER = int(os.getenv("THREADS_PER_WORKER", "0"))
+    # Intra-op threads of a single embedding process, 0 keeps torch's default
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+    # Batch size, token budget and threads benchmarked per hardware and model;
+    # the saved result replaces the three settings above unless they are set in
+    # the environment. AUTO_CALIBRATE benchmarks when there is no saved result yet
+    USE_CALIBRATION = os.getenv("USE_CALIBRATION", "true").lower() == "true"
+    AUTO_CALIBRATE = os.getenv("AUTO_CALIBRATE", "true").lower() == "true"
+    CALIBRATION_FILE = "calibration.json"  # Relative to DATA_DIR, shared with the API
+    # Address of a running serve_embeddings.py ("unix:/path/to.sock" or "127.0.0.1:8765");
+    # when set, the model is not loaded in this process
+    EMBEDDING_SERVICE = os.getenv("EMBEDDING_SERVICE", "")
+    # The service embeds requests arriving within SERVICE_MAX_WAIT_MS of each
+    # other together, up to SERVICE_MAX_BATCH texts
+    SERVICE_MAX_BATCH = int(os.getenv("SERVICE_MAX_BATCH", "64"))
+    SERVICE_MAX_WAIT_MS = float(os.getenv("SERVICE_MAX_WAIT_MS", "5"))
+
+    # Embeddings keyed by (file_hash, model, max_length), shared with the API
+    USE_EMBEDDING_CACHE = os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true"
+    EMBEDDING_CACHE = "cache/embedding_cache.db"  # Relative to DATA_DIR
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "2048"))
     
     # Root data directory
     DATA_DIR = "data"
@@ -12,11 +44,37 @@ class Settings:
     # Path configuration (relative to DATA_DIR)
     CODE_DIR = "repositories"  # Where extracted code files are stored
     OUTPUT_DIR = "embeddings"  # Where to save the embeddings
+    MANIFEST_DIR = "manifests"  # Change manifest written by the GitHub extractor
+    FILE_MANIFEST = "file_manifest.db"  # Stat signature and hash per embedded file, kept in OUTPUT_DIR
+    EMBEDDING_SHARDS = "shards"  # .npy shards and their index.json, kept in OUTPUT_DIR
+    METADATA_DB = "metadata.db"  # SQLite metadata of every shard row, kept in OUTPUT_DIR
+    SHARD_ROWS = int(os.getenv("SHARD_ROWS", "4096"))  # Rows per .npy shard file
+    # Precision of stored rows: "float32", "float16" (half the size) or "int8"
+    # (a quarter, plus a scale per row); precision_check.py measures the recall cost
+    EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+    # Hashed token n-gram counts of every row, for the API's lexical first stage
+    BUILD_LEXICAL_INDEX = os.getenv("BUILD_LEXICAL_INDEX", "true").lower() == "true"
+    LEXICAL_INDEX = "lexical"  # Kept in OUTPUT_DIR
+    LEXICAL_NGRAM = 3  # Tokens per shingle
+    LEXICAL_FEATURES = 2 ** 20  # Hashed columns
+    # Full runs save a checkpoint this often, main.py --resume continues from the last one
+    CHECKPOINT_SECONDS = int(os.getenv("CHECKPOINT_SECONDS", "300"))
     
+    # Where file contents are read from: "worktree" (checked-out files) or
+    # "git" (HEAD tree of each repository's object database, no checkout needed)
+    SOURCE_MODE = os.getenv("SOURCE_MODE", "worktree")
+
     # File processing
     CODE_EXTENSIONS = [".py", ".java", ".js", ".go", ".c", ".cpp"]
     IGNORE_DIRS = ["__pycache__", ".git", "node_modules"]
     MAX_FILE_SIZE = 100000  # 100KB
+    RESPECT_GITIGNORE = True  # Skip paths excluded by the repositories' .gitignore files
+    SKIP_GENERATED = True  # Skip minified, generated and binary files
+    SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))  # Repositories walked in parallel
+    READ_WORKERS = int(os.getenv("READ_WORKERS", "4"))  # Threads reading and hashing files while the model runs
+    # file_hash algorithm: "md5" (matches existing metadata and caches), "blake2b"
+    # or "xxh3" (needs the xxhash package); changing it invalidates the embedding cache
+    HASH_ALGORITHM = os.getenv("HASH_ALGORITHM", "md5")
 
     def __init__(self):
         """Ensure directories exist"""
@@ -24,6 +82,7 @@ class Settings:
         self._data_path = Path(self.DATA_DIR)
         self._code_path = self._data_path / self.CODE_DIR
         self._output_path = self._data_path / self.OUTPUT_DIR
+        self._manifest_path = self._data_path / self.MANIFEST_DIR
         
         # Create directories
         self._data_path.mkdir(parents=True, exist_ok=True)
@@ -40,4 +99,45 @@ class Settings:
         """Get full path to embeddings directory"""
         return str(self._output_path)
 
+    @property
+    def shards_dir(self):
+        """Get full path to the embedding shards directory"""
+        return str(self._output_path / self.EMBEDDING_SHARDS)
+
+    @property
+    def lexical_dir(self):
+        """Get full path to the lexical index directory"""
+        return str(self._output_path / self.LEXICAL_INDEX)
+
+    @property
+    def metadata_path(self):
+        """Get full path to the metadata store"""
+        return str(self._output_path / self.METADATA_DB)
+
+    @property
+    def files_per_embed_call(self):
+        """Files handed to the embedder at once, enough for every worker"""
+        per_worker = self.EMBEDDING_SORT_WINDOW if self.EMBEDDING_MAX_TOKENS else self.EMBEDDING_BATCH_SIZE
+        return per_worker * max(1, self.EMBEDDING_WORKERS)
+
+    @property
+    def models_dir(self):
+        """Get full path to the exported models directory"""
+        return str(self._data_path / self.MODELS_DIR)
+
+    @property
+    def calibration_path(self):
+        """Get full path to the saved calibrations"""
+        return str(self._data_path / self.CALIBRATION_FILE)
+
+    @property
+    def embedding_cache_path(self):
+        """Get full path to the embedding cache database"""
+        return str(self._data_path / self.EMBEDDING_CACHE)
+
+    @property
+    def manifest_dir(self):
+        """Get full path to the change manifest directory"""
+        return str(self._manifest_path)
+
 settings = Settings()
\ No newline at end of file
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
+import argparse
 import json
+from collections import deque
+from itertools import islice
 import logging
+import os
+import shutil
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import sys
-from datetime import datetime
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -15,36 +19,293 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
-def save_embeddings(embeddings: np.ndarray, 
-                   metadata: List[Dict], 
-                   output_dir: Path) -> Dict:
-    """Save embeddings and metadata with validation"""
-    output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Save embeddings
-    embeddings_path = output_dir / "embeddings.npy"
-    np.save(embeddings_path, embeddings)
-    
-    # Save enriched metadata
-    full_metadata = {
-        "generated_at": datetime.now().isoformat(),
-        "embedding_version": "1.0",
-        "total_files": len(embeddings),
-        "files": metadata
-    }
-    
-    metadata_path = output_dir / "metadata.json"
-    with open(metadata_path, 'w', encoding='utf-8') as f:
-        json.dump(full_metadata, f, indent=2, ensure_ascii=False)
-    
+def describe_output(store, shards_dir: Path) -> Dict:
+    """Check that the metadata store and the shards hold the same rows, and describe them"""
+    from code_embedder.src.shard_store import read_index
+
+    index = read_index(str(shards_dir))
+    count = index["rows"] if index else 0
+    if count != len(store):
+        raise ValueError(f"Shards hold {count} rows but there are {len(store)} metadata rows")
     return {
-        "embeddings_path": str(embeddings_path.absolute()),
-        "metadata_path": str(metadata_path.absolute()),
-        "count": len(embeddings)
+        "embeddings_path": str(shards_dir.absolute()),
+        "metadata_path": str(store.db_path.absolute()),
+        "count": count
     }
 
-def main() -> Optional[Dict]:
+def save_metadata(metadata: List[Dict], metadata_path: Path, shards_dir: Path,
+                  model_id: Optional[str] = None) -> Dict:
+    """Replace the metadata store with one row per shard row, with validation"""
+    from code_embedder.src.metadata_store import MetadataStore
+    from code_embedder.src.shard_store import read_index
+
+    index = read_index(str(shards_dir))
+    count = index["rows"] if index else 0
+    if count != len(metadata):
+        raise ValueError(f"Shards hold {count} rows but there are {len(metadata)} metadata entries")
+    store = MetadataStore.create(str(metadata_path), metadata, {"model_id": model_id} if model_id else None)
+    return describe_output(store, shards_dir)
+
+def embed_files(file_paths: Iterable[str], finder, embedder, batch_size: int,
+                cache=None, read_workers: int = 1) -> Tuple[Optional[np.ndarray], List[Dict]]:
+    """
+    Read, describe and embed files in batches, skipping unreadable ones.
+    Files with the same content hash are embedded once and share the vector,
+    and hashes found in the embedding cache are not embedded at all.
+    Returns one embedding row per entry in the returned metadata.
+    """
+    from code_embedder.src.pipeline import EmbeddingPipeline
+
+    pipeline = EmbeddingPipeline(finder, embedder, batch_size, cache=cache, read_workers=read_workers)
+    return pipeline.run(file_paths)
+
+def stream_files(file_paths: Iterable[str], finder, embedder, writer, settings, cache=None,
+                 checkpoint=None, resume: Optional[Dict] = None, lexical=None) -> List[Dict]:
+    """
+    Like embed_files, but rows go straight into a ShardWriter as they are
+    embedded. Contents read are counted into lexical, a ContentCounts.
+    """
+    from code_embedder.src.pipeline import EmbeddingPipeline
+
+    pipeline = EmbeddingPipeline(finder, embedder, settings.files_per_embed_call,
+                                 cache=cache, read_workers=settings.READ_WORKERS,
+                                 checkpoint=checkpoint, checkpoint_seconds=settings.CHECKPOINT_SECONDS,
+                                 on_content=lexical.add if lexical is not None else None)
+    try:
+        return pipeline.stream(file_paths, writer, resume)
+    finally:
+        writer.close()
+
+def skip_to(file_paths: Iterable[str], position: int, next_path: str) -> Iterator[str]:
+    """Paths from position on, making sure the input is still the one the checkpoint was made for"""
+    iterator = iter(file_paths)
+    deque(islice(iterator, position), maxlen=0)
+    first = next(iterator, None)
+    if first != next_path:
+        raise ValueError(
+            f"Files changed since the checkpoint: expected {next_path} at position {position}, found {first}. "
+            "Run without --resume to start over"
+        )
+    yield first
+    yield from iterator
+
+def run_full(finder, embedder, settings, cache=None, resume: bool = False, lexical=None) -> List[Dict]:
+    """
+    Embed every file into a staging shard directory, checkpointing as it goes,
+    and return the metadata of its rows. With resume, an interrupted run
+    continues from its last checkpoint and ends with the same rows as a run
+    that was never interrupted.
+    """
+    from code_embedder.src.checkpoint import Checkpoint
+    from code_embedder.src.shard_store import ShardWriter
+
+    staging_dir = Path(settings.shards_dir + ".tmp")
+    checkpoint = Checkpoint(str(staging_dir), run={
+        "model": embedder.model_id,
+        "max_length": embedder.max_length,
+        "files_per_embed_call": settings.files_per_embed_call,
+        "max_tokens": settings.EMBEDDING_MAX_TOKENS,
+        "shard_rows": settings.SHARD_ROWS,
+        "storage_dtype": settings.EMBEDDING_STORAGE_DTYPE,
+        "hash_algorithm": settings.HASH_ALGORITHM,
+        "source_mode": settings.SOURCE_MODE
+    })
+    file_paths = (file_info['path'] for file_info in finder.iter_code_files())
+
+    state = checkpoint.load() if resume else None
+    if state:
+        writer = ShardWriter(str(staging_dir), settings.SHARD_ROWS, append=True, dtype=settings.EMBEDDING_STORAGE_DTYPE)
+        writer.rollback(state["writer"])
+        done = checkpoint.metadata(state)
+        logger.info(f"Resuming from checkpoint {state['saves']}: {len(done)} rows, {state['position']} files done")
+        file_paths = skip_to(file_paths, state["position"], state["next_path"])
+        resume_from = {"position": state["position"], "metadata": done, "failed": state["failed"]}
+    else:
+        if resume:
+            logger.info("No checkpoint to resume from, starting from scratch")
+        # Clears the staging directory, including checkpoints of earlier runs
+        writer = ShardWriter(str(staging_dir), settings.SHARD_ROWS, dtype=settings.EMBEDDING_STORAGE_DTYPE)
+        done, resume_from = [], None
+
+    metadata = done + stream_files(file_paths, finder, embedder, writer, settings, cache, checkpoint, resume_from,
+                                   lexical)
+    checkpoint.clear()
+    return metadata
+
+def migrate_legacy(output_dir: Path, shards_dir: Path, metadata_path: Path, rows_per_shard: int,
+                   dtype: str = "float32"):
+    """Convert the embeddings.npy and metadata.json of an older run into shards and a metadata store"""
+    from code_embedder.src.metadata_store import MetadataStore
+    from code_embedder.src.shard_store import convert_legacy, read_index
+
+    legacy_path = output_dir / "embeddings.npy"
+    if legacy_path.exists() and read_index(str(shards_dir)) is None:
+        convert_legacy(str(legacy_path), str(shards_dir), rows_per_shard, dtype)
+        legacy_path.unlink()
+    legacy_path = output_dir / "metadata.json"
+    if legacy_path.exists() and not metadata_path.exists():
+        with open(legacy_path, 'r', encoding='utf-8') as f:
+            MetadataStore.create(str(metadata_path), json.load(f)["files"])
+        legacy_path.unlink()
+        logger.info(f"Converted {legacy_path} into {metadata_path}")
+
+def open_metadata(metadata_path: Path, shards_dir: Path):
+    """Metadata store of a previous run, None if there is none or it does not match the shards"""
+    from code_embedder.src.metadata_store import MetadataStore
+    from code_embedder.src.shard_store import read_index
+
+    index = read_index(str(shards_dir))
+    if index is None or not metadata_path.exists():
+        return None
+    store = MetadataStore(str(metadata_path))
+    if index["rows"] != len(store):
+        logger.warning("Existing embeddings and metadata are out of sync, ignoring them")
+        return None
+    return store
+
+def lexical_counts(settings):
+    """ContentCounts for the pipeline to fill as it reads, None without a lexical index"""
+    from code_embedder.src.lexical_index import ContentCounts
+
+    return ContentCounts(settings.LEXICAL_NGRAM, settings.LEXICAL_FEATURES) if settings.BUILD_LEXICAL_INDEX else None
+
+def index_lexical(metadata: List[Dict], finder, settings, rebuild: bool = False, lexical=None):
+    """
+    Add the rows in metadata that the lexical index does not have yet, or
+    rebuild it after a full run renumbered the rows. Contents counted in
+    lexical while embedding are not read again. A failure is logged, the
+    embeddings do not depend on it.
+    """
+    from code_embedder.src.lexical_index import update_index
+
+    if not settings.BUILD_LEXICAL_INDEX:
+        return
+    try:
+        if rebuild:
+            shutil.rmtree(settings.lexical_dir, ignore_errors=True)
+        added = update_index(settings.lexical_dir, metadata, finder.read_file,
+                             settings.LEXICAL_NGRAM, settings.LEXICAL_FEATURES, known=lexical)
+        logger.info(f"Lexical index: {added} rows added, {len(metadata)} in total")
+    except Exception as e:
+        logger.error("Failed to update the lexical index: %s", str(e), exc_info=True)
+
+def apply_changes(store, stale_rows: List[int], file_paths: List[str],
+                  finder, embedder, file_manifest, settings, cache=None) -> Dict:
+    """
+    Update the previous output in place.
+    Rows never move: stale rows are marked deleted and new rows are appended
+    to the shards, so row positions stay valid for the vector database.
+    """
+    from code_embedder.src.shard_store import ShardWriter
+
+    shards_dir = Path(settings.shards_dir)
+    writer = ShardWriter(str(shards_dir), settings.SHARD_ROWS, append=True, dtype=settings.EMBEDDING_STORAGE_DTYPE)
+    lexical = lexical_counts(settings)
+    new_metadata = stream_files(file_paths, finder, embedder, writer, settings, cache, lexical=lexical)
+    store.append(new_metadata, deleted=stale_rows)
+    store.set_info(model_id=embedder.model_id)
+
+    result = describe_output(store, shards_dir)
+    all_metadata = store.all()
+    file_manifest.rebuild(all_metadata)
+    index_lexical(all_metadata, finder, settings, lexical=lexical)
+    return result
+
+def run_incremental(manifest, pending: Dict[str, Dict], store,
+                    finder, embedder, file_manifest, settings, cache=None) -> Dict:
+    """Apply the extractor's change manifest to the previous output"""
+    from code_embedder.src.change_manifest import ChangeManifest
+
+    stale_rows, to_embed = ChangeManifest.plan(store.all(), pending)
+    file_paths = [
+        str(Path(settings.code_dir) / repo / rel_path)
+        for repo, rel_paths in to_embed.items()
+        for rel_path in rel_paths
+    ]
+    file_paths = [path for path in file_paths if finder.is_code_file(path)]
+    logger.info(f"Incremental update: {len(stale_rows)} stale rows, {len(file_paths)} files to embed")
+
+    result = apply_changes(store, stale_rows, file_paths, finder, embedder, file_manifest, settings, cache)
+    manifest.mark_indexed(pending)
+    return result
+
+def run_stat_incremental(file_manifest, finder, embedder, settings, cache=None) -> Optional[Dict]:
+    """
+    Compare the discovered files with the file manifest. Files whose size and
+    mtime (or blob SHA, in git mode) are unchanged are not read at all; the
+    rest are hashed and only re-embedded when their content changed.
+    Returns None when the previous output cannot be updated.
+    """
+    from code_embedder.src.file_manifest import stat_signature
+
+    known = file_manifest.load()
+    signatures = {path: (entry.file_size, entry.last_modified) for path, entry in known.items()}
+
+    def unchanged(path: str, size: int, mtime: float) -> bool:
+        # Files known with the same signature skip the scanner's content check
+        return signatures.get(path) == stat_signature(size, mtime)
+
+    stale_rows = []
+    file_paths = []
+    touched = []  # (row, metadata) of files with a new signature but the same content
+    for record in finder.iter_code_files(unchanged=unchanged):
+        path = record['path']
+        entry = known.pop(path, None)
+        if entry is None:
+            file_paths.append(path)
+            continue
+        if 'blob_sha' in record:
+            if record['blob_sha'] == entry.file_hash:
+                continue
+        else:
+            if stat_signature(record['size'], record['mtime']) == (entry.file_size, entry.last_modified):
+                continue
+            metadata = finder.generate_metadata(path)
+            if metadata and metadata["file_hash"] == entry.file_hash:
+                touched.append((entry.row, metadata))
+                continue
+        stale_rows.append(entry.row)
+        file_paths.append(path)
+    # Whatever is left in the manifest was not found again
+    stale_rows.extend(entry.row for entry in known.values())
+
+    shards_dir = Path(settings.shards_dir)
+    store = open_metadata(Path(settings.metadata_path), shards_dir)
+    if store is None:
+        return None
+    if not (stale_rows or file_paths or touched):
+        logger.info("No files changed since the last run")
+        return describe_output(store, shards_dir)
+
+    logger.info(
+        f"Incremental update: {len(stale_rows)} stale rows, {len(file_paths)} files to embed, "
+        f"{len(touched)} files touched without content changes"
+    )
+    for row, metadata in touched:
+        store.update(row, file_size=metadata["file_size"], last_modified=metadata["last_modified"])
+    return apply_changes(store, sorted(stale_rows), file_paths, finder, embedder, file_manifest, settings, cache)
+
+def calibrate_embedder(embedder, settings) -> Optional[Dict]:
+    """Benchmark the embedder on this host, save the result and apply it to settings and embedder"""
+    import torch
+    from code_embedder.src.calibration import apply_calibration, calibrate, embedder_id, save_calibration, set_threads
+
+    default_threads = torch.get_num_threads()
+    logger.info("Calibrating batch size, token budget and threads for this host")
+    result = calibrate(embedder, threads=[settings.EMBEDDING_THREADS] if "EMBEDDING_THREADS" in os.environ else None)
+    if not result:
+        set_threads(embedder, settings.EMBEDDING_THREADS or default_threads)
+        return None
+    save_calibration(settings.calibration_path, embedder_id(settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL), result)
+    logger.info(f"Calibration saved to {settings.calibration_path}: {apply_calibration(settings, result)}")
+    # Settings pinned in the environment win over the benchmark
+    set_threads(embedder, settings.EMBEDDING_THREADS or default_threads)
+    embedder.max_tokens = settings.EMBEDDING_MAX_TOKENS or None
+    return result
+
+def main(full_rebuild: bool = False, resume: bool = False, recalibrate: bool = False) -> Optional[Dict]:
     """Run the embedding pipeline with proper metadata handling"""
+    embedder = None
     try:
         # Add project root to Python path
         project_root = Path(__file__).parent.parent
@@ -52,83 +313,144 @@ def main() -> Optional[Dict]:
 
         # Import modules
         from code_embedder.src.code_finder import CodeFinder
-        from code_embedder.src.embedder import CodeBertEmbedder
-        from code_embedder.src.metadata_generator import MetadataGenerator
+        from code_embedder.src.git_source import GitTreeSource
+        from code_embedder.src.embedder import create_embedder
+        from code_embedder.src.sharded_embedder import ShardedEmbedder
+        from code_embedder.src.change_manifest import ChangeManifest
+        from code_embedder.src.file_manifest import FileManifest
+        from code_embedder.src.embedding_cache import EmbeddingCache
+        from code_embedder.src.shard_store import INDEX_FILE, publish
+        from code_embedder.src.calibration import apply_calibration, embedder_id, load_calibration
         from code_embedder.config.settings import settings
 
         logger.info("=== Starting Embedding Pipeline ===")
         
         # Initialize components
-        finder = CodeFinder(
-            base_dir=settings.code_dir,
-            extensions=settings.CODE_EXTENSIONS,
-            ignore_dirs=settings.IGNORE_DIRS,
-            max_size=settings.MAX_FILE_SIZE
-        )
-        logger.info(f"CodeFinder initialized with base_dir: {settings.code_dir}, extensions: {settings.CODE_EXTENSIONS}, ignore_dirs: {settings.IGNORE_DIRS}, max_size: {settings.MAX_FILE_SIZE}")
-
-        embedder = CodeBertEmbedder(model_name=settings.EMBEDDING_MODEL)
-        logger.info(f"CodeBertEmbedder initialized with model: {settings.EMBEDDING_MODEL}")
-        # Process files
-        code_files = finder.find_all_code_files()
-        if not code_files:
-            logger.error("No code files found in %s", settings.code_dir)
-            return None
-        logger.info(f"Found {len(code_files)} code files to process.")
-        all_embeddings = []
-        all_metadata = []
-        batch = []
-        
-        for file_info in code_files:
-            file_path = file_info['path']
-            try:
-                if content := finder.read_file(file_path):
-                    # Generate enriched metadata
-                    metadata = MetadataGenerator.generate(file_path)
-                    if not metadata:
-                        continue
-                    
-                    batch.append(content)
-                    all_metadata.append(metadata)
-                    
-                    # Process batch when full
-                    if len(batch) >= settings.EMBEDDING_BATCH_SIZE:
-                        logger.info(f"Forming batch of {len(batch)} files for embedding.")
-                        embeddings = embedder.embed(batch)
-                        all_embeddings.append(embeddings)
-                        batch = []
-                        logger.info("Processed %d files", len(all_metadata))
-            except Exception as e:
-                logger.error("Failed to process %s: %s", file_path, str(e))
-                continue
+        if settings.SOURCE_MODE == "git":
+            finder = GitTreeSource(
+                base_dir=settings.code_dir,
+                extensions=settings.CODE_EXTENSIONS,
+                ignore_dirs=settings.IGNORE_DIRS,
+                max_size=settings.MAX_FILE_SIZE
+            )
+        else:
+            finder = CodeFinder(
+                base_dir=settings.code_dir,
+                extensions=settings.CODE_EXTENSIONS,
+                ignore_dirs=settings.IGNORE_DIRS,
+                max_size=settings.MAX_FILE_SIZE,
+                respect_gitignore=settings.RESPECT_GITIGNORE,
+                skip_generated=settings.SKIP_GENERATED,
+                workers=settings.SCAN_WORKERS,
+                hash_algorithm=settings.HASH_ALGORITHM
+            )
+        logger.info(f"{type(finder).__name__} initialized with base_dir: {settings.code_dir}, extensions: {settings.CODE_EXTENSIONS}, ignore_dirs: {settings.IGNORE_DIRS}, max_size: {settings.MAX_FILE_SIZE}")
 
-        # Process final batch
-        if batch:
-            embeddings = embedder.embed(batch)
-            all_embeddings.append(embeddings)
+        tuned = None
+        if settings.USE_CALIBRATION and not recalibrate:
+            tuned = load_calibration(settings.calibration_path,
+                                     embedder_id(settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL))
+            if tuned:
+                logger.info(f"Applying calibration from {tuned['calibrated_at']}: {apply_calibration(settings, tuned)}")
 
-        # Combine and save results
-        if not all_embeddings:
-            logger.error("No valid embeddings generated")
+        if settings.EMBEDDING_SERVICE:
+            embedder = create_embedder(settings.EMBEDDING_BACKEND, service=settings.EMBEDDING_SERVICE)
+        elif settings.EMBEDDING_WORKERS > 1:
+            embedder = ShardedEmbedder(
+                model_name=settings.EMBEDDING_MODEL,
+                max_tokens=settings.EMBEDDING_MAX_TOKENS or None,
+                workers=settings.EMBEDDING_WORKERS,
+                threads_per_worker=settings.THREADS_PER_WORKER,
+                backend=settings.EMBEDDING_BACKEND,
+                export_dir=settings.models_dir
+            )
+            if recalibrate:
+                logger.warning("Calibration benchmarks a single process, run it with EMBEDDING_WORKERS=1")
+        else:
+            embedder = create_embedder(
+                settings.EMBEDDING_BACKEND,
+                model_name=settings.EMBEDDING_MODEL,
+                max_tokens=settings.EMBEDDING_MAX_TOKENS or None,
+                export_dir=settings.models_dir,
+                threads=settings.EMBEDDING_THREADS or None
+            )
+            if recalibrate or (settings.USE_CALIBRATION and settings.AUTO_CALIBRATE and not tuned):
+                calibrate_embedder(embedder, settings)
+        logger.info(f"{type(embedder).__name__} initialized with model: {embedder.model_id}, max_tokens: {settings.EMBEDDING_MAX_TOKENS}")
+
+        cache = None
+        if settings.USE_EMBEDDING_CACHE:
+            cache = EmbeddingCache(
+                settings.embedding_cache_path,
+                model_name=embedder.model_id,
+                max_length=embedder.max_length,
+                max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+            )
+
+        output_dir = Path(settings.output_dir)
+        manifest = ChangeManifest(settings.manifest_dir)
+        file_manifest = FileManifest(str(output_dir / settings.FILE_MANIFEST))
+        shards_dir = Path(settings.shards_dir)
+        metadata_path = Path(settings.metadata_path)
+        migrate_legacy(output_dir, shards_dir, metadata_path, settings.SHARD_ROWS, settings.EMBEDDING_STORAGE_DTYPE)
+        # Resuming continues an interrupted full run, whatever changed since
+        if not (full_rebuild or resume) and (shards_dir / INDEX_FILE).exists():
+            pending = manifest.pending()
+            if pending:
+                store = open_metadata(metadata_path, shards_dir)
+                if store and all("relative_path" in meta for _, meta in store.scan(include_deleted=True)):
+                    logger.info("Change manifest has new commits, running incremental update")
+                    return run_incremental(manifest, pending, store, finder, embedder, file_manifest, settings, cache)
+                logger.info("Previous output predates change tracking, running full rebuild")
+            elif len(file_manifest):
+                logger.info("File manifest found, re-embedding changed files only")
+                result = run_stat_incremental(file_manifest, finder, embedder, settings, cache)
+                if result:
+                    return result
+                logger.info("Previous output could not be loaded, running full rebuild")
+
+        # Stream rows into fresh shards as files are discovered and embedded;
+        # they replace the previous output only once the run has finished
+        lexical = lexical_counts(settings)
+        all_metadata = run_full(finder, embedder, settings, cache, resume, lexical)
+
+        # Save results
+        if not all_metadata:
+            logger.error("No valid embeddings generated from code files in %s", settings.code_dir)
             return None
-            
-        final_embeddings = np.vstack(all_embeddings)
-        return save_embeddings(
-            embeddings=final_embeddings,
-            metadata=all_metadata,
-            output_dir=Path(settings.output_dir)
-        )
+        logger.info(f"Embedded {len(all_metadata)} code files.")
+
+        publish(settings.shards_dir + ".tmp", str(shards_dir))
+        result = save_metadata(all_metadata, metadata_path, shards_dir, embedder.model_id)
+        file_manifest.rebuild(all_metadata)
+        index_lexical(all_metadata, finder, settings, rebuild=True, lexical=lexical)
+        # Everything currently checked out is indexed now
+        manifest.mark_indexed(manifest.load().get("repos", {}))
+        return result
         
     except Exception as e:
         logger.error("Pipeline failed: %s", str(e), exc_info=True)
         return None
+    finally:
+        # Worker processes of the sharded embedder
+        if hasattr(embedder, "close"):
+            embedder.close()
 
 if __name__ == "__main__":
-    result = main()
+    parser = argparse.ArgumentParser(description="Embed code files from the cloned repositories")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the change and file manifests and previous output, re-embed everything")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted full run from its last checkpoint")
+    parser.add_argument("--calibrate", action="store_true",
+                        help="Benchmark batch size, token budget and threads again before embedding")
+    args = parser.parse_args()
+
+    result = main(full_rebuild=args.full, resume=args.resume, recalibrate=args.calibrate)
     if result:
         print("\n=== Embedding Generation Successful ===")
-        print(f"Embeddings: {result['embeddings_path']}")
-        print(f"Metadata: {result['metadata_path']}")
+        print(f"Embedding shards: {result['embeddings_path']}")
+        print(f"Metadata store: {result['metadata_path']}")
         print(f"Files Processed: {result['count']}")
         sys.exit(0)
     else:
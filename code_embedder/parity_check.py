@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+from itertools import islice
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+def main(backend: str, sample: int):
+    """Compare an ONNX backend with the PyTorch model on files from the corpus"""
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+    from code_embedder.src.code_finder import CodeFinder
+    from code_embedder.src.embedder import create_embedder
+    from code_embedder.src.onnx_embedder import parity_report
+    from code_embedder.config.settings import settings
+
+    finder = CodeFinder(
+        base_dir=settings.code_dir,
+        extensions=settings.CODE_EXTENSIONS,
+        ignore_dirs=settings.IGNORE_DIRS,
+        max_size=settings.MAX_FILE_SIZE
+    )
+    texts = [
+        content for content in (finder.read_file(f['path']) for f in islice(finder.iter_code_files(), sample))
+        if content
+    ]
+    if not texts:
+        logger.error("No code files found in %s", settings.code_dir)
+        return None
+
+    reference = create_embedder("torch", model_name=settings.EMBEDDING_MODEL)
+    candidate = create_embedder(backend, model_name=settings.EMBEDDING_MODEL, export_dir=settings.models_dir)
+    report = parity_report(reference, candidate, texts, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    report["backend"] = backend
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check an ONNX embedding backend against PyTorch")
+    parser.add_argument("--backend", default="onnx-int8", choices=["onnx", "onnx-int8"])
+    parser.add_argument("--sample", type=int, default=256, help="Number of corpus files to embed")
+    args = parser.parse_args()
+
+    report = main(args.backend, args.sample)
+    if not report:
+        sys.exit(1)
+    print(json.dumps(report, indent=2))
+    print(f"\nCosine drift: mean {1 - report['mean_cosine']:.6f}, max {1 - report['min_cosine']:.6f}")
+    print(f"Speedup over PyTorch: {report['speedup']:.2f}x")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+def main(queries: int, k: int):
+    """Compare search over float16 and int8 copies of the stored embeddings with float32"""
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+    from code_embedder.src.metadata_store import MetadataStore
+    from code_embedder.src.precision import recall_report
+    from code_embedder.src.shard_store import read_index, read_shards
+    from code_embedder.config.settings import settings
+
+    index = read_index(settings.shards_dir)
+    if not index or not Path(settings.metadata_path).exists():
+        logger.error("No embeddings found in %s, run main.py first", settings.shards_dir)
+        return None
+    if index["dtype"] != "float32":
+        logger.warning("Stored rows are %s already, recall is measured against them rather than float32",
+                       index["dtype"])
+
+    active = [row for row, _ in MetadataStore(settings.metadata_path).scan()]
+    report = recall_report(read_shards(settings.shards_dir)[active], queries=queries, k=k)
+    report["stored_dtype"] = index["dtype"]
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the recall cost of storing embeddings at lower precision")
+    parser.add_argument("--queries", type=int, default=200, help="Number of stored rows to search for")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    args = parser.parse_args()
+
+    report = main(args.queries, args.k)
+    if not report:
+        sys.exit(1)
+    print(json.dumps(report, indent=2))
+    print()
+    for dtype, result in report["precisions"].items():
+        print(f"{dtype:>8}: recall@{report['k']} {result['recall_at_k']:.4f}, "
+              f"{result['bytes_per_row']} bytes per row")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+
+def serve(address: str):
+    """Load the model once and serve it until interrupted"""
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+    from code_embedder.src.calibration import apply_calibration, embedder_id, load_calibration
+    from code_embedder.src.embedder import create_embedder
+    from code_embedder.src.embedding_service import EmbeddingServer
+    from code_embedder.src.sharded_embedder import ShardedEmbedder
+    from code_embedder.config.settings import settings
+
+    if settings.USE_CALIBRATION:
+        tuned = load_calibration(settings.calibration_path,
+                                 embedder_id(settings.EMBEDDING_BACKEND, settings.EMBEDDING_MODEL))
+        if tuned:
+            logger.info(f"Applying calibration from {tuned['calibrated_at']}: {apply_calibration(settings, tuned)}")
+
+    if settings.EMBEDDING_WORKERS > 1:
+        embedder = ShardedEmbedder(
+            model_name=settings.EMBEDDING_MODEL,
+            max_tokens=settings.EMBEDDING_MAX_TOKENS or None,
+            workers=settings.EMBEDDING_WORKERS,
+            threads_per_worker=settings.THREADS_PER_WORKER,
+            backend=settings.EMBEDDING_BACKEND,
+            export_dir=settings.models_dir
+        )
+    else:
+        embedder = create_embedder(
+            settings.EMBEDDING_BACKEND,
+            model_name=settings.EMBEDDING_MODEL,
+            max_tokens=settings.EMBEDDING_MAX_TOKENS or None,
+            export_dir=settings.models_dir,
+            threads=settings.EMBEDDING_THREADS or None
+        )
+
+    server = EmbeddingServer(embedder, address, max_batch=settings.SERVICE_MAX_BATCH,
+                             max_wait=settings.SERVICE_MAX_WAIT_MS / 1000)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if hasattr(embedder, "close"):
+            embedder.close()
+
+def bench(address: str, requests: int, concurrency: int):
+    """Compare one request at a time with concurrent requests against a running service"""
+    project_root = Path(__file__).parent.parent
+    sys.path.insert(0, str(project_root))
+
+    from code_embedder.src.calibration import synthetic_code
+    from code_embedder.src.embedding_service import EmbeddingClient, load_report
+
+    return load_report(EmbeddingClient(address), synthetic_code(requests), concurrency)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the embedding model to the pipeline and the API")
+    parser.add_argument("--address", default=None,
+                        help="unix:/path/to.sock or host:port, defaults to EMBEDDING_SERVICE or 127.0.0.1:8765")
+    parser.add_argument("--bench", type=int, default=0, metavar="REQUESTS",
+                        help="Load test a running service with this many single-file requests instead of serving")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent clients for --bench")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from code_embedder.config.settings import settings
+    address = args.address or settings.EMBEDDING_SERVICE or "127.0.0.1:8765"
+
+    if args.bench:
+        report = bench(address, args.bench, args.concurrency)
+        print(json.dumps(report, indent=2))
+        print(f"\nConcurrent throughput: {report['speedup']:.1f}x one request at a time")
+    else:
+        serve(address)
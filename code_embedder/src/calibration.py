@@ -0,0 +1,178 @@
+import json
+import os
+import platform
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import torch
+
+from .sharded_embedder import available_cores
+
+logger = logging.getLogger(__name__)
+
+# Calibrated values and the settings they replace; a setting given in the
+# environment is left alone
+TUNED_SETTINGS = {
+    "batch_size": "EMBEDDING_BATCH_SIZE",
+    "max_tokens": "EMBEDDING_MAX_TOKENS",
+    "threads": "EMBEDDING_THREADS"
+}
+
+def embedder_id(backend: str, model_name: str) -> str:
+    """model_id of the embedder create_embedder() would build, known before loading it"""
+    return model_name if backend == "torch" else f"{model_name}+{backend}"
+
+def hardware_key() -> str:
+    """
+    CPU model and usable core count. Hosts built the same way, such as the
+    pods of one deployment, share a calibration even though their names differ.
+    """
+    cpu = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo", 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    except OSError:
+        pass
+    return f"{cpu} x{len(available_cores())}"
+
+def synthetic_code(count: int = 64, seed: int = 0) -> List[str]:
+    """Python and Java style functions from a few lines to a few hundred tokens"""
+    rng = random.Random(seed)
+    words = ["value", "items", "result", "index", "total", "node", "buffer", "count", "name", "config"]
+    texts = []
+    for i in range(count):
+        lines = rng.choice([2, 4, 8, 16, 32, 64])
+        a, b = rng.sample(words, 2)
+        if i % 2:
+            body = [f"        if ({a} > {j}) {{ {b} += {a} * {j}; }}" for j in range(lines)]
+            texts.append(f"public class C{i} {{\n    public int run(int {a}) {{\n        int {b} = 0;\n"
+                         + "\n".join(body) + f"\n        return {b};\n    }}\n}}\n")
+        else:
+            body = [f"    for {a} in range({j}):\n        {b}.append({a} * {j})" for j in range(lines)]
+            texts.append(f"def func_{i}({a}):\n    {b} = []\n" + "\n".join(body) + f"\n    return {b}\n")
+    return texts
+
+def set_threads(embedder, threads: int):
+    """Run the embedder's forward passes on this many threads"""
+    torch.set_num_threads(threads)
+    if hasattr(embedder, "session"):
+        # ONNX Runtime fixes its thread count when the session is created
+        embedder._load_model()
+
+def throughput(embedder, texts: List[str], batch_size: int, max_tokens: int) -> float:
+    """Files per second embedding texts the way main.py would hand them over"""
+    embedder.max_tokens = max_tokens or None
+    per_call = len(texts) if max_tokens else batch_size
+    calls = [texts[i:i + per_call] for i in range(0, len(texts), per_call)]
+    embedder.embed(calls[0])  # Warm up allocations for this configuration
+    started = time.perf_counter()
+    for call in calls:
+        embedder.embed(call)
+    return len(texts) / (time.perf_counter() - started)
+
+def calibrate(
+    embedder,
+    texts: Optional[List[str]] = None,
+    threads: Optional[Sequence[int]] = None,
+    batch_sizes: Sequence[int] = (8, 16, 32),
+    max_tokens: Sequence[int] = (4096, 8192, 16384)
+) -> Optional[Dict]:
+    """
+    Benchmark the embedder on synthetic code, first over thread counts and
+    then over batch sizes (a fixed number of files per forward pass) and
+    token budgets with the fastest thread count. The embedder is left
+    configured with the best result, which is returned with every trial.
+    """
+    texts = texts or synthetic_code()
+    if threads is None:
+        cores = len(available_cores())
+        threads = sorted({max(1, cores // share) for share in (8, 4, 2, 1)})
+    baseline = (batch_sizes[0], max_tokens[0] if max_tokens else 0)
+
+    trials = []
+    def trial(thread_count: int, batch_size: int, token_budget: int):
+        if any((t["threads"], t["batch_size"], t["max_tokens"]) == (thread_count, batch_size, token_budget)
+               for t in trials):
+            return
+        try:
+            set_threads(embedder, thread_count)
+            rate = throughput(embedder, texts, batch_size, token_budget)
+        except Exception as e:
+            logger.warning(f"Calibration trial failed for {thread_count} threads, batch size {batch_size}, "
+                           f"max tokens {token_budget}: {e}")
+            return
+        trials.append({"threads": thread_count, "batch_size": batch_size,
+                       "max_tokens": token_budget, "files_per_second": rate})
+        logger.info(f"Calibration: {thread_count} threads, batch size {batch_size}, "
+                    f"max tokens {token_budget}: {rate:.1f} files/s")
+
+    for thread_count in threads:
+        trial(thread_count, *baseline)
+    if not trials:
+        logger.error("Calibration failed, no configuration could embed the sample")
+        return None
+    best_threads = max(trials, key=lambda t: t["files_per_second"])["threads"]
+    for batch_size in batch_sizes:
+        trial(best_threads, batch_size, 0)
+    for token_budget in max_tokens:
+        trial(best_threads, batch_sizes[0], token_budget)
+
+    best = max(trials, key=lambda t: t["files_per_second"])
+    set_threads(embedder, best["threads"])
+    embedder.max_tokens = best["max_tokens"] or None
+    return {
+        **best,
+        "hardware": hardware_key(),
+        "calibrated_at": datetime.now().isoformat(),
+        "samples": len(texts),
+        "trials": trials
+    }
+
+def load_calibration(path: str, model_id: str, workload: str = "index") -> Optional[Dict]:
+    """
+    Saved calibration for this hardware, model and workload ("index" for
+    batch embedding, "query" for the API's single texts), None if there is none
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable calibration file {path}: {e}")
+        return None
+    return saved.get(hardware_key(), {}).get(model_id, {}).get(workload)
+
+def save_calibration(path: str, model_id: str, result: Dict, workload: str = "index"):
+    """Store a calibration next to those of other hosts and models"""
+    path = Path(path)
+    saved = {}
+    if path.exists():
+        try:
+            saved = json.loads(path.read_text(encoding='utf-8'))
+        except ValueError:
+            logger.warning(f"Replacing unreadable calibration file {path}")
+    saved.setdefault(hardware_key(), {}).setdefault(model_id, {})[workload] = result
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps(saved, indent=2), encoding='utf-8')
+    os.replace(tmp_path, path)
+
+def apply_calibration(settings, result: Dict) -> Dict:
+    """
+    Copy calibrated values onto settings unless the environment sets them.
+    Returns the settings that were changed.
+    """
+    applied = {}
+    for key, name in TUNED_SETTINGS.items():
+        if key in result and name not in os.environ:
+            setattr(settings, name, result[key])
+            applied[name] = result[key]
+    return applied
@@ -0,0 +1,87 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ChangeManifest:
+    """
+    Reads the change manifest written by the GitHub extractor and keeps
+    track of the last commit indexed for every repository.
+    """
+    MANIFEST_FILE = "changes.json"
+    STATE_FILE = "index_state.json"
+
+    def __init__(self, manifest_dir: str):
+        self.manifest_dir = Path(manifest_dir)
+        self.manifest_path = self.manifest_dir / self.MANIFEST_FILE
+        self.state_path = self.manifest_dir / self.STATE_FILE
+
+    def exists(self) -> bool:
+        return self.manifest_path.exists()
+
+    def load(self) -> Dict:
+        """Load the manifest, empty if the extractor has not written one"""
+        if not self.exists():
+            return {"repos": {}}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_state(self) -> Dict[str, str]:
+        """Last indexed commit per repository name"""
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def pending(self) -> Dict[str, Dict]:
+        """Manifest entries whose head commit has not been indexed yet"""
+        state = self.load_state()
+        pending = {}
+        for name, changes in self.load().get("repos", {}).items():
+            indexed = state.get(name)
+            if indexed == changes["head_commit"]:
+                continue
+            if not changes["full"] and indexed != changes["base_commit"]:
+                logger.warning(
+                    f"Skipping {name}: manifest starts at {changes['base_commit']} "
+                    f"but {indexed} was indexed last, rerun the extractor"
+                )
+                continue
+            pending[name] = changes
+        return pending
+
+    def mark_indexed(self, repos: Dict[str, Dict]):
+        """Record the head commits of the given manifest entries as indexed"""
+        state = self.load_state()
+        state.update({name: changes["head_commit"] for name, changes in repos.items()})
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def plan(metadata: List[Dict], pending: Dict[str, Dict]) -> Tuple[List[int], Dict[str, List[str]]]:
+        """
+        Work out which existing rows become stale and which files must be embedded.
+        Returns (stale row indices, {repo name: [relative paths to embed]}).
+        """
+        rows = {
+            (meta.get("repo_name"), meta.get("relative_path")): i
+            for i, meta in enumerate(metadata)
+            if not meta.get("deleted")
+        }
+        stale = set()
+        to_embed = {}
+        for repo, changes in pending.items():
+            paths = changes["added"] + changes["modified"] + [r["to"] for r in changes["renamed"]]
+            if changes["full"]:
+                stale.update(i for (name, _), i in rows.items() if name == repo)
+            else:
+                gone = changes["deleted"] + [r["from"] for r in changes["renamed"]] + paths
+                stale.update(rows[(repo, path)] for path in gone if (repo, path) in rows)
+            to_embed[repo] = paths
+        return sorted(stale), to_embed
@@ -0,0 +1,91 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Checkpoint:
+    """
+    Progress of a full embedding run, kept in its staging shard directory:
+
+        checkpoint.json   run settings, input position, shard and row counts
+        checkpoint.jsonl  metadata of the written rows, one line per row
+        pending-N.npy     rows not yet in a finished shard
+
+    Metadata lines are appended and the pending rows written before
+    checkpoint.json is replaced, so the state file always describes files
+    that are complete. Lines and shards beyond it are dropped on resume.
+    """
+    def __init__(self, directory: str, run: Dict):
+        self.directory = Path(directory)
+        self.run = run  # Settings that must not change between an interrupted run and its resume
+        self.state_path = self.directory / "checkpoint.json"
+        self.metadata_path = self.directory / "checkpoint.jsonl"
+        self.saves = 0
+
+    def load(self) -> Optional[Dict]:
+        """State of the last checkpoint, None if there is none or it was made with other settings"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable checkpoint {self.state_path}: {str(e)}")
+            return None
+        if state.get("run") != self.run:
+            logger.warning(f"Checkpoint was made with different settings ({state.get('run')}), not resuming")
+            return None
+        self.saves = state["saves"]
+        return state
+
+    def metadata(self, state: Dict) -> List[Dict]:
+        """Metadata of the rows written up to the checkpoint"""
+        with open(self.metadata_path, 'r+', encoding='utf-8') as f:
+            f.truncate(state["metadata_bytes"])  # Lines appended after the checkpoint
+            f.seek(0)
+            metadata = [json.loads(line) for line in f]
+        if len(metadata) != state["writer"]["rows"]:
+            raise ValueError(f"Checkpoint has {len(metadata)} metadata lines for {state['writer']['rows']} rows")
+        return metadata
+
+    def save(self, writer, position: int, next_path: str, new_metadata: List[Dict], failed: List[str]):
+        """
+        Record that the first position input paths are done: their rows are
+        in writer and next_path is the first one still to be embedded.
+        """
+        self.saves += 1
+        previous = self._pending_name(self.saves - 1)
+        writer_state = writer.checkpoint(self._pending_name(self.saves))
+        with open(self.metadata_path, 'a', encoding='utf-8') as f:
+            for meta in new_metadata:
+                f.write(json.dumps(meta, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            metadata_bytes = f.tell()
+        state = {
+            "run": self.run,
+            "saves": self.saves,
+            "position": position,
+            "next_path": next_path,
+            "writer": writer_state,
+            "metadata_bytes": metadata_bytes,
+            "failed": failed
+        }
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+        (self.directory / previous).unlink(missing_ok=True)
+        logger.info(f"Checkpoint {self.saves}: {writer_state['rows']} rows, {position} files done")
+
+    def clear(self):
+        """Remove the checkpoint files once the run has finished"""
+        for path in [self.state_path, self.metadata_path, *self.directory.glob("pending-*.npy")]:
+            path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _pending_name(saves: int) -> str:
+        return f"pending-{saves}.npy"
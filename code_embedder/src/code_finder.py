@@ -1,9 +1,13 @@
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 import os
 
 import logging
 
+from .ingest import hash_function, read_record
+from .metadata_generator import MetadataGenerator
+from .scanner import CodeScanner
+
 logger = logging.getLogger(__name__)
 
 class CodeFinder:
@@ -12,49 +16,57 @@ class CodeFinder:
         base_dir: str,
         extensions: List[str],
         ignore_dirs: List[str],
-        max_size: int
+        max_size: int,
+        respect_gitignore: bool = True,
+        skip_generated: bool = True,
+        workers: int = 1,
+        hash_algorithm: str = "md5"
     ):
         self.base_dir = Path(base_dir)
         self.extensions = extensions
         self.ignore_dirs = ignore_dirs
         self.max_size = max_size
+        self.hasher = hash_function(hash_algorithm)
+        self.scanner = CodeScanner(
+            extensions=extensions,
+            ignore_dirs=ignore_dirs,
+            max_size=max_size,
+            respect_gitignore=respect_gitignore,
+            skip_generated=skip_generated,
+            workers=workers
+        )
 
     def find_all_code_files(self) -> List[Dict]:
         """Find all code files in all repositories"""
-        code_files = []
-        logger.info(f"Starting to find all code files in: {self.base_dir}")
-        for repo_dir in self.base_dir.iterdir():
-            if repo_dir.is_dir():
-                code_files.extend(self._find_files_in_repo(repo_dir))
+        code_files = list(self.iter_code_files())
         logger.info(f"Found a total of {len(code_files)} code files.")
         return code_files
 
-    def _find_files_in_repo(self, repo_path: Path) -> List[Dict]:
-        """Find code files in a single repository"""
-        files = []
-        for root, dirs, files_in_dir in os.walk(repo_path):
-            # Skip ignored directories
-            dirs[:] = [d for d in dirs if d not in self.ignore_dirs]
-            
-            for file in files_in_dir:
-                file_path = Path(root) / file
-                if self._is_valid_code_file(file_path):
-                    files.append({
-                        'path': str(file_path),
-                        'extension': file_path.suffix,
-                        'size': file_path.stat().st_size,
-                        'repo': repo_path.name,
-                        'relative_path': str(file_path.relative_to(repo_path))
-                    })
-        return files
+    def iter_code_files(self, unchanged: Optional[Callable[[str, int, float], bool]] = None) -> Iterator[Dict]:
+        """Yield code files of all repositories as they are found, see CodeScanner for unchanged"""
+        logger.info(f"Starting to find all code files in: {self.base_dir}")
+        return self.scanner.scan(str(self.base_dir), unchanged)
 
-    def _is_valid_code_file(self, file_path: Path) -> bool:
-        """Check if file meets all criteria"""
-        return (
-            file_path.is_file() and
-            file_path.suffix in self.extensions and
-            file_path.stat().st_size <= self.max_size
-        )
+    def is_code_file(self, file_path: str) -> bool:
+        """Check a single path against the same rules as the full scan"""
+        parts = Path(os.path.relpath(file_path, self.base_dir)).parts
+        if len(parts) < 2 or parts[0] == os.pardir:
+            return False
+        return self.scanner.check_file(str(self.base_dir / parts[0]), "/".join(parts[1:]), parts[0]) is not None
+
+    def ingest(self, file_path: str) -> Optional[Tuple[Dict, Optional[str]]]:
+        """Metadata and content of a file from a single stat and read"""
+        record = read_record(file_path, self.hasher)
+        if record is None:
+            return None
+        if record.content is None:
+            logger.warning(f"Skipping {file_path}, not UTF-8 text")
+        return MetadataGenerator.generate_from_record(record), record.content
+
+    def generate_metadata(self, file_path: str) -> Optional[Dict]:
+        """Metadata for a file on disk"""
+        record = read_record(file_path, self.hasher)
+        return MetadataGenerator.generate_from_record(record) if record else None
 
     def read_file(self, file_path: str) -> Optional[str]:
         """Read file content with proper error handling"""
@@ -1,30 +1,107 @@
 import torch
 from transformers import AutoTokenizer, AutoModel
 import numpy as np
-from typing import List  # Add this import
+from typing import Dict, List, Optional, Tuple  # Add this import
+
+def create_embedder(backend: str = "torch", model_name: str = "microsoft/codebert-base",
+                    max_length: int = 512, max_tokens: Optional[int] = None,
+                    export_dir: Optional[str] = None, threads: Optional[int] = None,
+                    service: Optional[str] = None):
+    """
+    Embedder for a backend: "torch", "onnx" or "onnx-int8" (dynamically quantized).
+    threads sets the intra-op thread count, by default torch's own. With a
+    service address the model is not loaded here, texts are sent to the
+    embedding service listening there, which decides backend and batching.
+    """
+    if service:
+        from .embedding_service import EmbeddingClient
+        return EmbeddingClient(service)
+    if threads:
+        torch.set_num_threads(threads)
+    if backend == "torch":
+        return CodeBertEmbedder(model_name, max_length=max_length, max_tokens=max_tokens)
+    if backend in ("onnx", "onnx-int8"):
+        from .onnx_embedder import OnnxEmbedder
+        return OnnxEmbedder(model_name, max_length=max_length, max_tokens=max_tokens,
+                            quantize=backend == "onnx-int8", export_dir=export_dir)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+def token_budget_batches(lengths: List[int], max_tokens: int) -> List[List[int]]:
+    """
+    Group sequence indices into batches whose padded size, batch length times
+    longest sequence, stays within max_tokens. Sequences are taken shortest
+    first so each batch holds sequences of similar length.
+    """
+    batches = []
+    batch = []
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        # Sorted ascending, so the sequence being added is the longest so far
+        if batch and (len(batch) + 1) * lengths[index] > max_tokens:
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
 
 class CodeBertEmbedder:
-    def __init__(self, model_name: str = "microsoft/codebert-base"):
+    def __init__(self, model_name: str = "microsoft/codebert-base", max_length: int = 512,
+                 max_tokens: Optional[int] = None):
+        self.model_name = model_name
+        # Identifies the model and numerics for the embedding cache
+        self.model_id = model_name
+        self.max_length = max_length
+        # Padded tokens per forward pass; None embeds each call as a single batch
+        self.max_tokens = max_tokens
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModel.from_pretrained(model_name).to(self.device)
-        
+        self._load_model()
+
+    def _load_model(self):
+        self.model = AutoModel.from_pretrained(self.model_name).to(self.device)
+
     def embed(self, texts: List[str]) -> np.ndarray:
         """Convert code texts to embeddings"""
-        inputs = self.tokenizer(
-            texts,
-            padding=True,
-            truncation=True,
-            max_length=512,
-            return_tensors="pt"
-        ).to(self.device)
-        
+        return self.infer(self.prepare(texts))
+
+    def prepare(self, texts: List[str]) -> List[Tuple[List[int], Dict]]:
+        """
+        Tokenize texts into model inputs, as (row indices, inputs) per forward pass.
+        Split from infer() so tokenization can run while the model is busy.
+        """
+        if not (self.max_tokens and len(texts) > 1):
+            inputs = self.tokenizer(
+                texts,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="pt"
+            )
+            return [(list(range(len(texts))), inputs)]
+
+        # Tokenize once, then pad length-sorted batches within the token budget
+        input_ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)['input_ids']
+        return [
+            (batch, self.tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors="pt"))
+            for batch in token_budget_batches([len(ids) for ids in input_ids], self.max_tokens)
+        ]
+
+    def infer(self, prepared: List[Tuple[List[int], Dict]]) -> np.ndarray:
+        """Run the model on prepared inputs, one row per text in input order"""
+        rows = sum(len(indices) for indices, _ in prepared)
+        embeddings = None
+        for indices, inputs in prepared:
+            vectors = self._forward(inputs.to(self.device))
+            if embeddings is None:
+                embeddings = np.empty((rows, vectors.shape[1]), dtype=vectors.dtype)
+            embeddings[indices] = vectors
+        return embeddings
+
+    def _forward(self, inputs) -> np.ndarray:
         with torch.no_grad():
             outputs = self.model(**inputs)
-        
+
         # Mean pooling for sentence embeddings
         mask = inputs['attention_mask'].unsqueeze(-1)
         embeddings = (outputs.last_hidden_state * mask).sum(1) / mask.sum(1)
         return embeddings.cpu().numpy()
-    
-    
\ No newline at end of file
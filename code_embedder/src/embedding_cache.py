@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOUCH_BATCH = 512  # last_used updates written together in one transaction
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings keyed by (content hash, model name, max_length).
+    Vectors are stored as float32 blobs in SQLite; once the cache grows past
+    max_bytes the least recently used entries are evicted. Lookups share one
+    connection and their last_used updates are written TOUCH_BATCH at a
+    time, so a hit costs a read rather than a commit.
+    """
+    def __init__(self, db_path: str, model_name: str, max_length: int, max_bytes: int = 1024 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.model_name = model_name
+        self.max_length = max_length
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Shared by the pipeline's read and write threads, always used under the lock
+        self._conn = sqlite3.connect(str(self.db_path), timeout=60, check_same_thread=False)
+        with self._lock, self._conn as conn:
+            # WAL lets the API read while the pipeline writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "content_hash TEXT NOT NULL, "
+                "model_name TEXT NOT NULL, "
+                "max_length INTEGER NOT NULL, "
+                "vector BLOB NOT NULL, "
+                "last_used REAL NOT NULL, "
+                "PRIMARY KEY (content_hash, model_name, max_length))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._bytes = self._total_bytes(conn)
+
+    def get_many(self, content_hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors for the given hashes; misses are left out"""
+        keys = list(dict.fromkeys(content_hashes))
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                found.update((content_hash, np.frombuffer(vector, dtype=np.float32)) for content_hash, vector in
+                             self._conn.execute(
+                                 "SELECT content_hash, vector FROM embeddings WHERE model_name = ? AND max_length = ? "
+                                 f"AND content_hash IN ({', '.join('?' * len(batch))})",
+                                 [self.model_name, self.max_length] + batch
+                             ))
+            self._touched.update(dict.fromkeys(found, time.time()))
+            if len(self._touched) >= TOUCH_BATCH:
+                with self._conn:
+                    self._touch()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, content_hash: str):
+        """Cached vector for one hash, None on a miss"""
+        return self.get_many([content_hash]).get(content_hash)
+
+    def put_many(self, content_hashes: List[str], embeddings: np.ndarray):
+        """Store one embedding row per hash"""
+        rows = [
+            (content_hash, self.model_name, self.max_length,
+             np.asarray(vector, dtype=np.float32).tobytes(), time.time())
+            for content_hash, vector in zip(content_hashes, embeddings)
+        ]
+        with self._lock, self._conn as conn:
+            # Pending hits are written first so eviction sees them
+            self._touch()
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._bytes += sum(len(row[3]) for row in rows)
+            if self._bytes > self.max_bytes:
+                self._evict(conn)
+
+    def flush(self):
+        """Write the last_used times of hits not yet written"""
+        with self._lock, self._conn:
+            self._touch()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _touch(self):
+        """Write pending last_used times; the caller holds the lock inside a transaction"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE content_hash = ? AND model_name = ? AND max_length = ?",
+                [(used, content_hash, self.model_name, self.max_length)
+                 for content_hash, used in self._touched.items()]
+            )
+            self._touched = {}
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes"""
+        # Other processes write to the same file, so recount before evicting
+        total = self._total_bytes(conn)
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        if total > self.max_bytes:
+            for rowid, size in conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+                if total <= target:
+                    break
+                victims.append((rowid,))
+                total -= size
+            conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+            logger.info(f"Evicted {len(victims)} entries from the embedding cache")
+        self._bytes = total
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
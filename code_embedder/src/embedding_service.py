@@ -0,0 +1,289 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import TCPServer
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def parse_address(address: str) -> Tuple[str, object]:
+    """("unix", path) for "unix:/path/to.sock", ("tcp", (host, port)) for "host:port" """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+class MicroBatcher:
+    """
+    Coalesces concurrent embed requests into one embedder call. A worker
+    thread takes the first waiting request, keeps collecting until
+    max_batch texts are waiting or max_wait seconds have passed, embeds them
+    together and hands every caller its own rows.
+    """
+    def __init__(self, embedder, max_batch: int = 64, max_wait: float = 0.005):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Future of the embeddings of texts, one row per text"""
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(texts).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            requests = [request]
+            waiting = len(request[0])
+            deadline = time.monotonic() + self.max_wait
+            while waiting < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)  # Stop after this batch
+                    break
+                requests.append(request)
+                waiting += len(request[0])
+            self._embed(requests)
+
+    def _embed(self, requests: List[Tuple[List[str], Future]]):
+        texts = [text for batch, _ in requests for text in batch]
+        try:
+            vectors = self.embedder.embed(texts) if texts else None
+        except Exception as e:
+            if len(requests) == 1:
+                logger.error("Failed to embed a request of %d texts: %s", len(texts), e)
+                requests[0][1].set_exception(e)
+                return
+            # Retry each request on its own, so only the one with the bad input fails
+            logger.warning("Failed to embed a batch of %d texts from %d requests, retrying them one by one: %s",
+                           len(texts), len(requests), e)
+            for request in requests:
+                self._embed([request])
+            return
+        self.batches += 1
+        self.texts += len(texts)
+        start = 0
+        for batch, future in requests:
+            if vectors is None or not batch:
+                future.set_result(np.empty((0, 0), dtype=np.float32))
+            else:
+                future.set_result(vectors[start:start + len(batch)])
+            start += len(batch)
+
+class _Handler(BaseHTTPRequestHandler):
+    """POST /embed with {"texts": [...]} returns float32 rows; GET /health describes the model"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_error(404)
+            return
+        batcher = self.server.batcher
+        self._reply(200, "application/json", json.dumps({
+            "model_id": batcher.embedder.model_id,
+            "max_length": batcher.embedder.max_length,
+            "batches": batcher.batches,
+            "texts": batcher.texts
+        }).encode('utf-8'))
+
+    def do_POST(self):
+        if self.path != "/embed":
+            self.send_error(404)
+            return
+        try:
+            texts = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise ValueError("texts must be a list of strings")
+        except (KeyError, ValueError) as e:
+            self._reply(400, "text/plain", f"Bad request: {e}".encode('utf-8'))
+            return
+        try:
+            vectors = np.ascontiguousarray(self.server.batcher.embed(texts), dtype=np.float32)
+        except Exception as e:
+            self._reply(500, "text/plain", f"{type(e).__name__}: {e}".encode('utf-8'))
+            return
+        self._reply(200, "application/octet-stream", vectors.tobytes(),
+                    {"X-Embedding-Shape": f"{vectors.shape[0]},{vectors.shape[1] if vectors.ndim == 2 else 0}"})
+
+    def _reply(self, status: int, content_type: str, body: bytes, headers: Optional[Dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix socket peers have no host
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+class _UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        TCPServer.server_bind(self)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+class EmbeddingServer:
+    """
+    Serves one loaded embedder to every local process over a Unix socket
+    ("unix:/path/to.sock") or localhost HTTP ("127.0.0.1:8765"). Requests
+    arriving together are embedded in one batch by a MicroBatcher.
+    """
+    def __init__(self, embedder, address: str, max_batch: int = 64, max_wait: float = 0.005):
+        self.address = address
+        self.batcher = MicroBatcher(embedder, max_batch=max_batch, max_wait=max_wait)
+        kind, target = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target)  # Left over from a previous run
+            self.httpd = _UnixHTTPServer(target, _Handler)
+        else:
+            self.httpd = ThreadingHTTPServer(target, _Handler)
+            if target[1] == 0:
+                self.address = f"{target[0]}:{self.httpd.server_address[1]}"
+        self.httpd.daemon_threads = True
+        self.httpd.batcher = self.batcher
+        self._thread = None
+
+    def serve_forever(self):
+        logger.info(f"Embedding service listening on {self.address}")
+        self.httpd.serve_forever()
+
+    def start(self) -> "EmbeddingServer":
+        """Serve from a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name="embedding-service", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.close()
+        kind, target = parse_address(self.address)
+        if kind == "unix" and os.path.exists(target):
+            os.unlink(target)
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class EmbeddingClient:
+    """
+    Drop-in replacement for CodeBertEmbedder that sends texts to a running
+    EmbeddingServer instead of loading the model. model_id and max_length
+    come from the server, so cache keys match those of a local model.
+    Connections are kept per thread, so concurrent callers are batched together.
+    """
+    def __init__(self, address: str, timeout: float = 600):
+        self.address = address
+        self.timeout = timeout
+        self.max_tokens = None  # Batching is up to the server
+        self._local = threading.local()
+        info = self._request("GET", "/health")
+        info = json.loads(info[0])
+        self.model_id = info["model_id"]
+        self.max_length = info["max_length"]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Convert code texts to embeddings"""
+        body, headers = self._request("POST", "/embed", json.dumps({"texts": texts}).encode('utf-8'))
+        rows, dim = (int(n) for n in headers["X-Embedding-Shape"].split(","))
+        return np.frombuffer(body, dtype=np.float32).reshape(rows, dim).copy()
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[bytes, Dict]:
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.HTTPException) as e:
+                # A kept-alive connection the server has since closed; retry once on a new one
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise RuntimeError(f"Embedding service at {self.address} unreachable: {e}") from e
+                continue
+            if response.status != 200:
+                raise RuntimeError(f"Embedding service error {response.status}: {data.decode('utf-8', 'replace')}")
+            return data, dict(response.getheaders())
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            kind, target = parse_address(self.address)
+            if kind == "unix":
+                connection = _UnixHTTPConnection(target, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(*target, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+def load_report(client, texts: List[str], concurrency: int = 32) -> Dict:
+    """
+    Files per second embedding texts one per request, first one request at
+    a time and then from concurrency threads at once, which the service batches.
+    """
+    started = time.perf_counter()
+    for text in texts:
+        client.embed([text])
+    sequential = len(texts) / (time.perf_counter() - started)
+
+    pending = queue.Queue()
+    for text in texts:
+        pending.put(text)
+    def worker():
+        while True:
+            try:
+                text = pending.get_nowait()
+            except queue.Empty:
+                return
+            client.embed([text])
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    concurrent = len(texts) / (time.perf_counter() - started)
+    return {"requests": len(texts), "concurrency": concurrency, "sequential_files_per_second": sequential,
+            "concurrent_files_per_second": concurrent, "speedup": concurrent / sequential}
@@ -0,0 +1,65 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ManifestEntry(NamedTuple):
+    file_size: int
+    last_modified: str
+    file_hash: str
+    row: int
+
+def stat_signature(size: int, mtime: float) -> Tuple[int, str]:
+    """(size, last_modified) exactly as MetadataGenerator records them"""
+    return size, datetime.fromtimestamp(mtime).isoformat()
+
+class FileManifest:
+    """
+    Persistent index of the files behind the current embeddings, keyed by path.
+    Stores the stat signature and content hash of every active row so that
+    reruns can skip files that did not change without reading them.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, "
+                "file_size INTEGER NOT NULL, "
+                "last_modified TEXT NOT NULL, "
+                "file_hash TEXT NOT NULL, "
+                "row INTEGER NOT NULL)"
+            )
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def load(self) -> Dict[str, ManifestEntry]:
+        """All entries, path -> ManifestEntry"""
+        with self._connect() as conn:
+            return {
+                path: ManifestEntry(size, modified, file_hash, row)
+                for path, size, modified, file_hash, row in conn.execute(
+                    "SELECT path, file_size, last_modified, file_hash, row FROM files"
+                )
+            }
+
+    def rebuild(self, metadata: List[Dict]):
+        """Replace the manifest with the active rows of the given metadata"""
+        rows = (
+            (meta["file_path"], meta["file_size"], meta["last_modified"], meta["file_hash"], row)
+            for row, meta in enumerate(metadata)
+            if not meta.get("deleted")
+        )
+        with self._connect() as conn:
+            conn.execute("DELETE FROM files")
+            conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows)
+        logger.info(f"File manifest now tracks {len(self)} files")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
@@ -0,0 +1,161 @@
+import threading
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+from git import Repo
+from git.exc import GitError, InvalidGitRepositoryError, NoSuchPathError
+
+from .metadata_generator import MetadataGenerator
+
+logger = logging.getLogger(__name__)
+
+class GitTreeSource:
+    """
+    Drop-in replacement for CodeFinder that reads code files from the HEAD
+    tree of each repository's object database instead of a checked-out
+    working tree. File paths keep the data/repositories/<repo>/<path> layout
+    so metadata looks the same as in worktree mode, but nothing is read
+    from them: contents are streamed from git and the blob SHA is used as
+    the file hash.
+
+    A Repo reads blobs through one git cat-file process that cannot be
+    shared between threads, so every thread opens its own Repo per
+    repository; close() stops them all.
+    """
+    def __init__(
+        self,
+        base_dir: str,
+        extensions: List[str],
+        ignore_dirs: List[str],
+        max_size: int
+    ):
+        self.base_dir = Path(base_dir)
+        self.extensions = extensions
+        self.ignore_dirs = set(ignore_dirs)
+        self.max_size = max_size
+        self._local = threading.local()  # repo name -> Repo, per thread
+        self._opened: List[Repo] = []
+        self._lock = threading.Lock()
+
+    def find_all_code_files(self) -> List[Dict]:
+        """Find all code files in the HEAD trees of all repositories"""
+        return list(self.iter_code_files())
+
+    def iter_code_files(self, unchanged=None) -> Iterator[Dict]:
+        """Yield code files of all HEAD trees; unchanged is accepted for CodeFinder parity, blobs are never read"""
+        logger.info(f"Listing code files from git objects in: {self.base_dir}")
+        for repo_dir in sorted(self.base_dir.iterdir()):
+            if not repo_dir.is_dir():
+                continue
+            tree = self._head_tree(repo_dir.name)
+            if tree is None:
+                continue
+            for blob in tree.traverse(
+                predicate=lambda item, depth: item.type == "blob",
+                prune=lambda item, depth: item.type == "tree" and item.name in self.ignore_dirs
+            ):
+                if PurePosixPath(blob.path).suffix in self.extensions and blob.size <= self.max_size:
+                    yield {
+                        'path': str(repo_dir / blob.path),
+                        'extension': PurePosixPath(blob.path).suffix,
+                        'size': blob.size,
+                        'repo': repo_dir.name,
+                        'relative_path': blob.path,
+                        'blob_sha': blob.hexsha
+                    }
+
+    def is_code_file(self, file_path: str) -> bool:
+        """Check a single path against the extension and size rules"""
+        blob = self._lookup(file_path)
+        return (
+            blob is not None and
+            PurePosixPath(blob.path).suffix in self.extensions and
+            not any(part in self.ignore_dirs for part in PurePosixPath(blob.path).parts[:-1]) and
+            blob.size <= self.max_size
+        )
+
+    def read_file(self, file_path: str) -> Optional[str]:
+        """Read file content from the object database"""
+        blob = self._lookup(file_path)
+        if blob is None:
+            return None
+        return self._content(file_path, blob)
+
+    def ingest(self, file_path: str) -> Optional[Tuple[Dict, Optional[str]]]:
+        """Metadata and content of a file from a single blob lookup"""
+        blob = self._lookup(file_path)
+        if blob is None:
+            return None
+        return self._metadata(file_path, blob), self._content(file_path, blob)
+
+    def generate_metadata(self, file_path: str) -> Optional[Dict]:
+        """Metadata for a file, with the blob SHA as its content hash"""
+        blob = self._lookup(file_path)
+        if blob is None:
+            return None
+        return self._metadata(file_path, blob)
+
+    def close(self):
+        """Stop the git cat-file processes kept open for each repository and thread"""
+        with self._lock:
+            for repo in self._opened:
+                repo.close()
+            self._opened.clear()
+            self._local = threading.local()
+
+    def _content(self, file_path: str, blob) -> Optional[str]:
+        try:
+            if blob.size == 0:
+                return "[Empty file]"
+            content = blob.data_stream.read().decode('utf-8').strip()
+            return content if content else "[Empty file]"
+        except (GitError, UnicodeDecodeError) as e:
+            logger.warning(f"Error reading blob for {file_path}: {str(e)}")
+            return None
+
+    def _metadata(self, file_path: str, blob) -> Dict:
+        repo_name, _ = self._split(file_path)
+        commit = self._repo(repo_name).head.commit
+        return MetadataGenerator.generate_from_blob(
+            file_path=file_path,
+            file_size=blob.size,
+            blob_sha=blob.hexsha,
+            committed_at=commit.committed_datetime
+        )
+
+    def _split(self, file_path: str) -> Tuple[str, str]:
+        """Repository name and path inside the repository for a file path"""
+        relative = Path(file_path).relative_to(self.base_dir)
+        return relative.parts[0], "/".join(relative.parts[1:])
+
+    def _repo(self, repo_name: str) -> Repo:
+        repos = getattr(self._local, "repos", None)
+        if repos is None:
+            repos = self._local.repos = {}
+        if repo_name not in repos:
+            repos[repo_name] = Repo(str(self.base_dir / repo_name))
+            with self._lock:
+                self._opened.append(repos[repo_name])
+        return repos[repo_name]
+
+    def _head_tree(self, repo_name: str):
+        try:
+            return self._repo(repo_name).head.commit.tree
+        except (InvalidGitRepositoryError, NoSuchPathError, ValueError) as e:
+            logger.warning(f"Skipping {repo_name}, not a git repository with commits: {str(e)}")
+            return None
+
+    def _lookup(self, file_path: str):
+        try:
+            repo_name, rel_path = self._split(file_path)
+        except ValueError:
+            return None
+        tree = self._head_tree(repo_name)
+        if tree is None or not rel_path:
+            return None
+        try:
+            item = tree.join(rel_path)
+        except KeyError:
+            return None
+        return item if item.type == "blob" else None
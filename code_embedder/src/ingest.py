@@ -0,0 +1,89 @@
+import hashlib
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Files at least this large are mapped instead of copied; below the default
+# MAX_FILE_SIZE (100 KB) so the largest accepted files take this path
+MMAP_THRESHOLD = 64 * 1024
+
+def hash_function(name: str) -> Callable:
+    """
+    Hash constructor for an algorithm name. md5 matches the hashes already in
+    metadata and caches; blake2b and xxh3 are faster and xxh3 needs the
+    optional xxhash package, falling back to blake2b without it.
+    """
+    if name == "md5":
+        return hashlib.md5
+    if name == "xxh3":
+        try:
+            import xxhash
+            return xxhash.xxh3_128
+        except ImportError:
+            logger.warning("xxhash is not installed, hashing with blake2b instead of xxh3")
+            name = "blake2b"
+    if name == "blake2b":
+        return lambda data=b"": hashlib.blake2b(data, digest_size=16)
+    raise ValueError(f"Unknown hash algorithm: {name}")
+
+@dataclass
+class IngestRecord:
+    """Everything the pipeline needs from one file, from a single stat and read"""
+    path: str
+    size: int
+    mtime: float
+    file_hash: str
+    content: Optional[str]  # None when the file is not UTF-8 text
+
+def read_record(file_path: str, hasher: Callable = hashlib.md5,
+                mmap_threshold: int = MMAP_THRESHOLD) -> Optional[IngestRecord]:
+    """
+    Open, fstat and read a file once, then hash and decode the same bytes.
+    Content follows CodeFinder.read_file: newlines normalised, whitespace
+    stripped and "[Empty file]" for files with nothing in them.
+    """
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError as e:
+        logger.warning(f"Error opening {file_path}: {str(e)}")
+        return None
+    try:
+        stats = os.fstat(fd)
+        if stats.st_size >= mmap_threshold:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                return _record(file_path, stats, mapped, hasher)
+        chunks = []
+        remaining = stats.st_size + 1  # One byte extra notices a file that grew
+        while True:
+            request = max(remaining, 65536)
+            chunk = os.read(fd, request)
+            chunks.append(chunk)
+            # A short read of a regular file means end of file
+            if len(chunk) < request:
+                break
+            remaining -= len(chunk)
+        return _record(file_path, stats, b"".join(chunks), hasher)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Error reading {file_path}: {str(e)}")
+        return None
+    finally:
+        os.close(fd)
+
+def _record(file_path: str, stats: os.stat_result, data, hasher: Callable) -> IngestRecord:
+    file_hash = hasher(data).hexdigest()
+    try:
+        content = str(data, "utf-8").replace("\r\n", "\n").replace("\r", "\n").strip()
+        content = content or "[Empty file]"
+    except UnicodeDecodeError:
+        content = None
+    return IngestRecord(
+        path=file_path,
+        size=stats.st_size,
+        mtime=stats.st_mtime,
+        file_hash=file_hash,
+        content=content
+    )
@@ -0,0 +1,194 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+logger = logging.getLogger(__name__)
+
+MATRIX_FILE = "counts.npz"
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+_COMMENT = re.compile(r'/\*.*?\*/|//[^\n]*|#[^\n]*', re.DOTALL)
+_STRING = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+_TOKEN = re.compile(r'[A-Za-z_]\w*|\d+(?:\.\d+)?|[^\s\w]')
+
+def normalize_code(text: str) -> str:
+    """Code without comments, with string literals collapsed and lowercased"""
+    text = _STRING.sub(' "s" ', text)
+    text = _COMMENT.sub(' ', text)
+    return text.lower()
+
+def tokenize_code(text: str) -> List[str]:
+    """Identifiers, numbers and single punctuation characters"""
+    return _TOKEN.findall(text)
+
+def make_vectorizer(ngram: int = 3, features: int = 2 ** 20) -> HashingVectorizer:
+    """
+    Token n-grams (shingles) of normalized code hashed into a fixed number of
+    columns. No vocabulary is kept, so rows can be added at any time.
+    """
+    return HashingVectorizer(
+        preprocessor=normalize_code,
+        tokenizer=tokenize_code,
+        token_pattern=None,
+        lowercase=False,
+        ngram_range=(ngram, ngram),
+        n_features=features,
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32
+    )
+
+class LexicalIndex:
+    """
+    Sparse lexical index over the embedded files, one row per embedding row.
+    Raw n-gram counts are stored; when the index is opened they are weighted
+    (sublinear tf times idf over the active rows), normalized and inverted,
+    so a query only touches the rows sharing one of its n-grams. Top-k
+    cosine candidates come back in milliseconds without running the model.
+    """
+    def __init__(self, counts: sparse.csr_matrix, ngram: int = 3, features: int = 2 ** 20,
+                 rows: Optional[Sequence[int]] = None):
+        self.ngram = ngram
+        self.features = features
+        self.vectorizer = make_vectorizer(ngram, features)
+        self.rows = np.arange(counts.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        weighted = counts[self.rows]
+        weighted.data = 1 + np.log(weighted.data)
+        df = np.bincount(weighted.indices, minlength=features)
+        self.idf = (np.log((1 + len(self.rows)) / (1 + df)) + 1).astype(np.float32)
+        weighted = weighted @ sparse.diags(self.idf)
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        weighted = sparse.diags(1 / np.maximum(norms, 1e-12)) @ weighted
+        # Features by rows: a query's non-zero features select the postings to add up
+        self.postings = weighted.T.tocsr().astype(np.float32)
+
+    @classmethod
+    def open(cls, directory: str, rows: Optional[Sequence[int]] = None) -> Optional["LexicalIndex"]:
+        """Index saved in directory, restricted to rows if given; None if there is none"""
+        header = read_header(directory)
+        if header is None:
+            return None
+        counts = sparse.load_npz(Path(directory) / MATRIX_FILE).tocsr()
+        return cls(counts, header["ngram"], header["features"], rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def search(self, code: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the top_k rows sharing the most weighted n-grams with code"""
+        query = self.vectorizer.transform([code])
+        if not query.nnz or not len(self.rows):
+            return []
+        query.data = (1 + np.log(query.data)) * self.idf[query.indices]
+        query.data /= np.linalg.norm(query.data)
+        scores = (query @ self.postings).tocsr()
+        if not scores.nnz:
+            return []
+        top_k = min(top_k, scores.nnz)
+        top = np.argpartition(-scores.data, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores.data[top])]
+        return [(int(self.rows[scores.indices[i]]), float(scores.data[i])) for i in top]
+
+def read_header(directory: str) -> Optional[Dict]:
+    """index.json of a saved index, None if there is none"""
+    path = Path(directory) / INDEX_FILE
+    if not path.exists() or not (Path(directory) / MATRIX_FILE).exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    if header.get("version") != FORMAT_VERSION:
+        logger.warning(f"Ignoring lexical index in {directory} with format version {header.get('version')}")
+        return None
+    return header
+
+def count_rows(texts: Iterable[Optional[str]], ngram: int = 3, features: int = 2 ** 20,
+               chunk: int = 256) -> sparse.csr_matrix:
+    """n-gram counts of texts, an empty row for None"""
+    vectorizer = make_vectorizer(ngram, features)
+    blocks = []
+    pending = []
+    for text in texts:
+        pending.append(text or "")
+        if len(pending) >= chunk:
+            blocks.append(vectorizer.transform(pending))
+            pending = []
+    if pending:
+        blocks.append(vectorizer.transform(pending))
+    if not blocks:
+        return sparse.csr_matrix((0, features), dtype=np.float32)
+    return sparse.vstack(blocks, format="csr", dtype=np.float32)
+
+class ContentCounts:
+    """
+    n-gram counts of file contents as the embedding pipeline reads them,
+    keyed by content hash, so update_index does not read the files again.
+    add() may be called from several threads.
+    """
+    def __init__(self, ngram: int = 3, features: int = 2 ** 20):
+        self.ngram = ngram
+        self.features = features
+        self._vectorizer = make_vectorizer(ngram, features)
+        self.rows: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}  # content hash -> (columns, counts)
+
+    def add(self, content_key: str, text: str):
+        if content_key not in self.rows:
+            row = self._vectorizer.transform([text])
+            self.rows[content_key] = (row.indices, row.data)
+
+def _stack(rows: List[Optional[Tuple[np.ndarray, np.ndarray]]], features: int) -> sparse.csr_matrix:
+    """One csr matrix from (columns, counts) rows, an empty row for None"""
+    empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
+    rows = [row if row is not None else empty for row in rows]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(columns) for columns, _ in rows], out=indptr[1:])
+    indices = np.concatenate([columns for columns, _ in rows]) if rows else empty[0]
+    data = np.concatenate([counts for _, counts in rows]) if rows else empty[1]
+    return sparse.csr_matrix((data.astype(np.float32), indices, indptr), shape=(len(rows), features))
+
+def save_counts(directory: str, counts: sparse.csr_matrix, ngram: int, features: int):
+    """Write counts and index.json, replacing any previous index only once both are complete"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / (MATRIX_FILE + ".tmp.npz")
+    sparse.save_npz(tmp_path, counts)
+    os.replace(tmp_path, directory / MATRIX_FILE)
+    tmp_path = directory / (INDEX_FILE + ".tmp")
+    tmp_path.write_text(json.dumps({
+        "version": FORMAT_VERSION, "rows": counts.shape[0], "ngram": ngram, "features": features
+    }), encoding='utf-8')
+    os.replace(tmp_path, directory / INDEX_FILE)
+
+def update_index(directory: str, metadata: List[Dict], read: Callable[[str], Optional[str]],
+                 ngram: int = 3, features: int = 2 ** 20, known: Optional[ContentCounts] = None) -> int:
+    """
+    Bring the index in directory in line with metadata, the full row list
+    including deleted rows. Rows already indexed are kept and only new
+    ones are added, from known counts by content hash or else read; an
+    index with other settings or more rows than metadata is rebuilt.
+    Deleted rows get empty rows. Returns the number of rows added.
+    """
+    header = read_header(directory)
+    counts = None
+    if header and header["ngram"] == ngram and header["features"] == features and header["rows"] <= len(metadata):
+        counts = sparse.load_npz(Path(directory) / MATRIX_FILE).tocsr()
+    start = counts.shape[0] if counts is not None else 0
+    new = metadata[start:]
+    if known is None or (known.ngram, known.features) != (ngram, features):
+        known = ContentCounts(ngram, features)
+    rows = [None if meta.get("deleted") else known.rows.get(meta.get("file_hash")) for meta in new]
+    unread = [i for i, meta in enumerate(new) if rows[i] is None and not meta.get("deleted")]
+    read_counts = count_rows((read(new[i]["file_path"]) for i in unread), ngram, features)
+    for j, i in enumerate(unread):
+        rows[i] = (read_counts[j].indices, read_counts[j].data)
+    added = _stack(rows, features)
+    counts = added if counts is None else sparse.vstack([counts, added], format="csr", dtype=np.float32)
+    save_counts(directory, counts, ngram, features)
+    return len(new)
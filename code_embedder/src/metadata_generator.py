@@ -20,6 +20,7 @@ class MetadataGenerator:
                 "file_path": str(path),
                 "file_name": path.name,
                 "repo_name": MetadataGenerator._extract_repo_name(path),
+                "relative_path": MetadataGenerator._extract_relative_path(path),
                 "language": MetadataGenerator._detect_language(path),
                 "file_size": stats.st_size,
                 "last_modified": datetime.fromtimestamp(stats.st_mtime).isoformat(),
@@ -30,6 +31,39 @@ class MetadataGenerator:
             logger.error(f"Metadata generation failed for {file_path}: {str(e)}")
             return None
 
+    @staticmethod
+    def generate_from_record(record) -> Dict:
+        """Generate metadata from an IngestRecord without touching the file again"""
+        path = Path(record.path)
+        return {
+            "file_path": str(path),
+            "file_name": path.name,
+            "repo_name": MetadataGenerator._extract_repo_name(path),
+            "relative_path": MetadataGenerator._extract_relative_path(path),
+            "language": MetadataGenerator._detect_language(path),
+            "file_size": record.size,
+            "last_modified": datetime.fromtimestamp(record.mtime).isoformat(),
+            "file_hash": record.file_hash,
+            "file_extension": path.suffix.lower()
+        }
+
+    @staticmethod
+    def generate_from_blob(file_path: str, file_size: int, blob_sha: str, committed_at: datetime) -> Dict:
+        """Generate metadata for a file read from git objects instead of disk"""
+        path = Path(file_path)
+        return {
+            "file_path": str(path),
+            "file_name": path.name,
+            "repo_name": MetadataGenerator._extract_repo_name(path),
+            "relative_path": MetadataGenerator._extract_relative_path(path),
+            "language": MetadataGenerator._detect_language(path),
+            "file_size": file_size,
+            "last_modified": committed_at.isoformat(),
+            "file_hash": blob_sha,
+            "blob_sha": blob_sha,
+            "file_extension": path.suffix.lower()
+        }
+
     @staticmethod
     def _extract_repo_name(path: Path) -> str:
         """Extract repository name from path structure"""
@@ -43,6 +77,16 @@ class MetadataGenerator:
             logger.warning(f"Couldn't extract repo name from {path}: {str(e)}")
         return "unknown"
 
+    @staticmethod
+    def _extract_relative_path(path: Path) -> str:
+        """Path of the file inside its repository, using forward slashes"""
+        parts = path.parts
+        if "repositories" in parts:
+            repo_index = parts.index("repositories") + 1
+            if repo_index + 1 < len(parts):
+                return "/".join(parts[repo_index + 1:])
+        return path.name
+
     @staticmethod
     def _detect_language(path: Path) -> str:
         """Detect programming language from file extension"""
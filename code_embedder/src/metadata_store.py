@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Typed columns, in the order MetadataGenerator writes the keys
+COLUMNS = [
+    ("file_path", "TEXT NOT NULL"),
+    ("file_name", "TEXT"),
+    ("repo_name", "TEXT"),
+    ("relative_path", "TEXT"),
+    ("language", "TEXT"),
+    ("file_size", "INTEGER"),
+    ("last_modified", "TEXT"),
+    ("file_hash", "TEXT"),
+    ("blob_sha", "TEXT"),
+    ("file_extension", "TEXT")
+]
+FIELDS = [name for name, _ in COLUMNS]
+
+class MetadataStore:
+    """
+    Per-row file metadata in SQLite, replacing metadata.json. Row numbers
+    match the embedding shards; deleted rows keep their place with deleted
+    set. Columns are typed and indexed so single rows and filtered scans
+    (by repo, language, hash or path) don't need the whole table in memory.
+    Keys outside the schema are kept in a JSON column, so every dict comes
+    back exactly as it was stored.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "row INTEGER PRIMARY KEY, "
+                + "".join(f"{name} {kind}, " for name, kind in COLUMNS) +
+                "deleted INTEGER NOT NULL DEFAULT 0, "
+                "extra TEXT)"
+            )
+            for column in ("repo_name", "language", "file_hash", "file_path"):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS files_{column} ON files ({column})")
+            conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+
+    @classmethod
+    def create(cls, db_path: str, metadata: Iterable[Dict], info: Optional[Dict[str, str]] = None) -> "MetadataStore":
+        """Write a new store next to db_path and swap it in once it is complete"""
+        tmp_path = Path(str(db_path) + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+        store = cls(str(tmp_path))
+        store.append(metadata)
+        # Marks this set of rows: incremental runs append to it, the next full run replaces it
+        store.set_info(created_at=datetime.now().isoformat(), **(info or {}))
+        os.replace(tmp_path, db_path)
+        return cls(db_path)
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def append(self, metadata: Iterable[Dict], deleted: Iterable[int] = ()) -> int:
+        """
+        Add rows after the existing ones, returning how many were added.
+        Rows in deleted are tombstoned in the same transaction.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE files SET deleted = 1 WHERE row = ?", ((row,) for row in deleted))
+            start = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            added = conn.executemany(
+                f"INSERT INTO files (row, {', '.join(FIELDS)}, deleted, extra) "
+                f"VALUES ({', '.join('?' * (len(FIELDS) + 3))})",
+                (self._to_row(start + i, meta) for i, meta in enumerate(metadata))
+            ).rowcount
+            conn.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)", [
+                ("generated_at", datetime.now().isoformat()),
+                ("embedding_version", "1.0"),
+                ("total_files", str(start + max(added, 0)))
+            ])
+        return max(added, 0)
+
+    def mark_deleted(self, rows: Iterable[int]):
+        """Tombstone rows whose files changed or disappeared"""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE files SET deleted = 1 WHERE row = ?", ((row,) for row in rows))
+
+    def update(self, row: int, **fields):
+        """Overwrite columns of one row, for example the stat signature of a touched file"""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown metadata columns: {sorted(unknown)}")
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                f"UPDATE files SET {', '.join(f'{name} = ?' for name in fields)} WHERE row = ?",
+                (*fields.values(), row)
+            )
+
+    def get(self, row: int) -> Optional[Dict]:
+        """Metadata of one row, None if there is no such row"""
+        with closing(self._connect()) as conn:
+            found = conn.execute(f"SELECT {self._select()} FROM files WHERE row = ?", (row,)).fetchone()
+        return self._to_dict(found) if found else None
+
+    def rows(self, rows: Iterable[int]) -> List[Dict]:
+        """Metadata of the given rows, in the order asked for"""
+        rows = list(rows)
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                for record in conn.execute(
+                    f"SELECT row, {self._select()} FROM files WHERE row IN ({', '.join('?' * len(batch))})", batch
+                ):
+                    found[record[0]] = self._to_dict(record[1:])
+        return [found[row] for row in rows]
+
+    def scan(self, include_deleted: bool = False, **filters) -> Iterator[Tuple[int, Dict]]:
+        """(row, metadata) in row order, optionally filtered by column values, e.g. scan(language="Python")"""
+        unknown = set(filters) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown metadata columns: {sorted(unknown)}")
+        conditions = [f"{name} = ?" for name in filters]
+        if not include_deleted:
+            conditions.append("deleted = 0")
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        with closing(self._connect()) as conn:
+            for record in conn.execute(
+                f"SELECT row, {self._select()} FROM files{where} ORDER BY row", tuple(filters.values())
+            ):
+                yield record[0], self._to_dict(record[1:])
+
+    def all(self) -> List[Dict]:
+        """Every row including deleted ones, indexable by row number"""
+        return [meta for _, meta in self.scan(include_deleted=True)]
+
+    def set_info(self, **values: str):
+        """Record facts about the rows, such as the model_id that embedded them"""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO info VALUES (?, ?)", values.items())
+
+    def info(self) -> Dict[str, str]:
+        """created_at and model_id of the store, and generated_at, embedding_version and total_files of the last write"""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT key, value FROM info"))
+
+    @staticmethod
+    def _select() -> str:
+        return ", ".join(FIELDS + ["deleted", "extra"])
+
+    @staticmethod
+    def _to_row(row: int, meta: Dict) -> Tuple:
+        extra = {key: value for key, value in meta.items() if key not in FIELDS and key != "deleted"}
+        return (row, *(meta.get(name) for name in FIELDS), int(bool(meta.get("deleted"))),
+                json.dumps(extra, ensure_ascii=False) if extra else None)
+
+    @staticmethod
+    def _to_dict(record: Tuple) -> Dict:
+        # Columns that were never set are left out, as they were in metadata.json
+        meta = {name: value for name, value in zip(FIELDS, record) if value is not None}
+        deleted, extra = record[len(FIELDS)], record[len(FIELDS) + 1]
+        if extra:
+            meta.update(json.loads(extra))
+        if deleted:
+            meta["deleted"] = True
+        return meta
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path))
@@ -0,0 +1,131 @@
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+import torch
+from transformers import AutoModel
+
+from .embedder import CodeBertEmbedder
+
+logger = logging.getLogger(__name__)
+
+class _HiddenStates(torch.nn.Module):
+    """Exposes only last_hidden_state so the exported graph has one output"""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+def export_onnx(model_name: str, export_dir: str, quantize: bool = False) -> str:
+    """
+    Export a model to ONNX once, optionally with dynamic int8 quantization of
+    its weights, and return the path. Existing exports are reused.
+    """
+    target_dir = Path(export_dir) / model_name.replace("/", "--")
+    fp32_path = target_dir / "model.onnx"
+    int8_path = target_dir / "model.int8.onnx"
+    target_dir.mkdir(parents=True, exist_ok=True)
+
+    if not fp32_path.exists():
+        logger.info(f"Exporting {model_name} to {fp32_path}")
+        # Eager attention traces to plain ops that every opset supports
+        model = AutoModel.from_pretrained(model_name, attn_implementation="eager").eval()
+        dummy = torch.ones((2, 8), dtype=torch.long)
+        dynamic = {0: "batch", 1: "sequence"}
+        tmp_path = fp32_path.with_suffix(".tmp")
+        torch.onnx.export(
+            _HiddenStates(model),
+            (dummy, dummy),
+            str(tmp_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": dynamic, "attention_mask": dynamic, "last_hidden_state": dynamic},
+            opset_version=17,
+            dynamo=False
+        )
+        os.replace(tmp_path, fp32_path)
+
+    if not quantize:
+        return str(fp32_path)
+    if not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info(f"Quantizing {fp32_path} to int8")
+        tmp_path = int8_path.with_suffix(".tmp")
+        quantize_dynamic(str(fp32_path), str(tmp_path), weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return str(int8_path)
+
+class OnnxEmbedder(CodeBertEmbedder):
+    """
+    CodeBertEmbedder running the exported model through ONNX Runtime on CPU.
+    Tokenization, token-budgeted batching and mean pooling are inherited,
+    only the forward pass differs.
+    """
+    def __init__(
+        self,
+        model_name: str = "microsoft/codebert-base",
+        max_length: int = 512,
+        max_tokens: Optional[int] = None,
+        quantize: bool = False,
+        export_dir: Optional[str] = None
+    ):
+        self.quantize = quantize
+        self.export_dir = export_dir or os.path.join("data", "models")
+        super().__init__(model_name, max_length=max_length, max_tokens=max_tokens)
+        self.model_id = f"{model_name}+onnx{'-int8' if quantize else ''}"
+
+    def _load_model(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # Follows torch's thread setting, which sharded workers pin per process
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = ort.InferenceSession(
+            export_onnx(self.model_name, self.export_dir, self.quantize),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+
+    def _forward(self, inputs) -> np.ndarray:
+        attention_mask = inputs['attention_mask'].cpu().numpy().astype(np.int64)
+        hidden = self.session.run(None, {
+            "input_ids": inputs['input_ids'].cpu().numpy().astype(np.int64),
+            "attention_mask": attention_mask
+        })[0]
+
+        # Mean pooling for sentence embeddings, as in CodeBertEmbedder
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(1) / mask.sum(1)
+
+def parity_report(reference, candidate, texts: List[str], batch_size: int = 16) -> Dict:
+    """
+    Embed the same texts with two embedders and report the cosine similarity
+    between their vectors and the speedup of the candidate.
+    """
+    timings = []
+    outputs = []
+    for embedder in (reference, candidate):
+        embedder.embed(texts[:batch_size])  # Warm up
+        started = time.perf_counter()
+        outputs.append(np.vstack([
+            embedder.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+        ]))
+        timings.append(time.perf_counter() - started)
+
+    expected, actual = outputs
+    cosine = (expected * actual).sum(1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return {
+        "texts": len(texts),
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "reference_seconds": timings[0],
+        "candidate_seconds": timings[1],
+        "speedup": timings[0] / timings[1] if timings[1] else float("inf")
+    }
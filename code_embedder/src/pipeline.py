@@ -0,0 +1,448 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # Passed down a queue when the stage feeding it has finished
+_FAILED = object()  # Vector slot of content whose batch could not be embedded
+_WRITTEN = object()  # Vector slot whose vector is already in the sink
+
+class RowCollector:
+    """Sink keeping the embedded rows in memory"""
+    def __init__(self):
+        self.rows: List[np.ndarray] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+    def append(self, vectors: np.ndarray) -> int:
+        first = len(self.rows)
+        self.rows.extend(vectors)
+        return first
+
+    def vector(self, row: int) -> np.ndarray:
+        return self.rows[row]
+
+    def array(self) -> Optional[np.ndarray]:
+        return np.vstack(self.rows) if self.rows else None
+
+class StageStats:
+    """Time a pipeline stage spent working and the number of items it handled"""
+    def __init__(self, name: str, workers: int = 1):
+        self.name = name
+        self.workers = workers
+        self.busy_seconds = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, items: int = 1):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - started
+                self.items += items
+
+class EmbeddingPipeline:
+    """
+    Embeds files in overlapping stages connected by bounded queues:
+
+        discover -> read + hash (thread pool) -> tokenize -> infer -> write
+
+    Reading and hashing run in worker threads and tokenization in its own
+    thread while the model runs on the calling thread, so disk and CPU work
+    overlap instead of alternating. The bounded queues keep memory flat when
+    one stage is slower than the rest. Files with the same content hash are
+    embedded once, hashes found in the embedding cache are not embedded at
+    all, and the output rows follow the order of the input paths.
+
+    Rows are handed to a sink (anything with count, append(vectors) and
+    vector(row), such as a ShardWriter) as soon as they and every row before
+    them are embedded, so vectors are not held until the end of the run.
+    With a Checkpoint, progress is saved every checkpoint_seconds so that an
+    interrupted run can be resumed with the same result. on_content(file_hash,
+    content) is called from the read threads with every content read.
+    """
+    def __init__(self, finder, embedder, batch_size: int, cache=None, read_workers: int = 4, queue_size: int = 4,
+                 checkpoint=None, checkpoint_seconds: float = 300, on_content=None):
+        self.finder = finder
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.cache = cache
+        self.read_workers = max(1, read_workers)
+        self.queue_size = max(1, queue_size)
+        self.checkpoint = checkpoint
+        self.checkpoint_seconds = checkpoint_seconds
+        self.on_content = on_content
+        # Finders that return metadata and content from a single read
+        self._ingest_once = callable(getattr(type(finder), "ingest", None))
+        # Embedders that split tokenization from inference get a separate tokenize stage
+        self._split = callable(getattr(type(embedder), "prepare", None))
+        self.stages = {
+            "discover": StageStats("discover"),
+            "read": StageStats("read", self.read_workers),
+            "tokenize": StageStats("tokenize"),
+            "infer": StageStats("infer"),
+            "write": StageStats("write")
+        }
+        self.wall_seconds = 0.0
+
+    def run(self, file_paths: Iterable[str]) -> Tuple[Optional[np.ndarray], List[Dict]]:
+        """Embed files, returning one embedding row per entry in the returned metadata"""
+        collector = RowCollector()
+        metadata = self.stream(file_paths, collector)
+        return collector.array(), metadata
+
+    def stream(self, file_paths: Iterable[str], sink, resume: Optional[Dict] = None) -> List[Dict]:
+        """
+        Embed files into a sink, returning the metadata of the rows appended
+        to it. To resume, file_paths starts at resume["position"] and
+        resume["metadata"] describes the rows already in the sink.
+        """
+        started = time.perf_counter()
+        self._sink = sink
+        self._unique_vectors: List = []  # one vector per distinct file_hash, None until embedded
+        self._unique_rows: Dict[str, int] = {}  # file_hash -> index in _unique_vectors
+        self._sink_rows: Dict[int, int] = {}  # index in _unique_vectors -> sink row holding its vector
+        self._row_sources: List[int] = []
+        self._row_inputs: List[int] = []  # position of every row's file in the input
+        self._metadata: List[Dict] = []
+        self._consumed = 0  # input files handled by the batch stage
+        self._emitted = 0  # rows before this one were written or dropped
+        self._kept: List[Dict] = []
+        self._failed: List[str] = []  # hashes of content that could not be embedded
+        self._error: Optional[Exception] = None
+        self._start = 0
+        self._checkpointed = 0  # rows in _kept already saved by a checkpoint
+        self._last_checkpoint = time.monotonic()
+        self._seeded = 0
+        if resume:
+            self._seed(resume)
+
+        ingested = queue.Queue(maxsize=self.batch_size * self.queue_size)
+        batches = queue.Queue(maxsize=self.queue_size)
+        inferred = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._read, args=(file_paths, ingested), name="pipeline-read", daemon=True),
+            threading.Thread(target=self._batch, args=(ingested, batches), name="pipeline-tokenize", daemon=True),
+            threading.Thread(target=self._write, args=(inferred,), name="pipeline-write", daemon=True)
+        ]
+        for thread in threads:
+            thread.start()
+        self._infer(batches, inferred)
+        for thread in threads:
+            thread.join()
+        if self.cache is not None:
+            self.cache.flush()
+        if not self._error:
+            # Every batch is done: rows still waiting had their batch fail
+            with self.stages["write"].timed(items=0):
+                self._emit(final=True)
+        self.wall_seconds = time.perf_counter() - started
+        self.log_report()
+        if self._error:
+            raise self._error
+
+        new_contents = len(self._unique_rows) - self._seeded
+        if new_contents < len(self._metadata):
+            logger.info(f"{len(self._metadata) - new_contents} files reused an existing embedding")
+        if self.cache is not None:
+            logger.info(f"Embedding cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        return self._kept
+
+    def _seed(self, resume: Dict):
+        """Start from a checkpoint: its content hashes map to the rows already in the sink"""
+        self._start = resume["position"]
+        for row, meta in enumerate(resume["metadata"]):
+            if meta["file_hash"] not in self._unique_rows:
+                self._unique_rows[meta["file_hash"]] = len(self._unique_vectors)
+                self._sink_rows[len(self._unique_vectors)] = row
+                self._unique_vectors.append(_WRITTEN)
+        for content_key in resume["failed"]:
+            if content_key not in self._unique_rows:
+                self._unique_rows[content_key] = len(self._unique_vectors)
+                self._unique_vectors.append(_FAILED)
+                self._failed.append(content_key)
+        self._seeded = len(self._unique_rows)
+
+    def report(self) -> Dict[str, Dict]:
+        """Busy time, items and utilization (busy time / wall time per worker) of every stage"""
+        wall = self.wall_seconds or 1e-9
+        return {
+            name: {
+                "busy_seconds": round(stage.busy_seconds, 3),
+                "items": stage.items,
+                "utilization": round(stage.busy_seconds / (wall * stage.workers), 3)
+            }
+            for name, stage in self.stages.items()
+        }
+
+    def log_report(self):
+        report = self.report()
+        logger.info(f"Pipeline finished in {self.wall_seconds:.2f}s")
+        for name, stats in report.items():
+            logger.info(f"  {name:<9} {stats['utilization']:6.1%} busy, {stats['busy_seconds']:.2f}s, {stats['items']} items")
+        bottleneck = max(report, key=lambda name: report[name]["utilization"])
+        logger.info(f"Bottleneck stage: {bottleneck}")
+
+    def _read(self, file_paths: Iterable[str], out: queue.Queue):
+        """
+        Discover paths and read and hash them in a thread pool, passing results
+        on in order. Finished files are looked up in the embedding cache a
+        chunk at a time, one get_many per chunk.
+        """
+        chunk_size = self.read_workers * 4
+        try:
+            with ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="pipeline-read") as pool:
+                in_flight = deque()
+                chunk = []
+                iterator = iter(file_paths)
+                while not self._error:
+                    with self.stages["discover"].timed(items=0):
+                        file_path = next(iterator, None)
+                    if file_path is None:
+                        break
+                    self.stages["discover"].items += 1
+                    in_flight.append((file_path, pool.submit(self._ingest, file_path)))
+                    if len(in_flight) >= chunk_size:
+                        path, future = in_flight.popleft()
+                        chunk.append((path, future.result()))
+                    if len(chunk) >= chunk_size:
+                        for item in self._resolve(chunk, pool):
+                            out.put(item)
+                        chunk = []
+                while in_flight:
+                    path, future = in_flight.popleft()
+                    chunk.append((path, future.result()))
+                for start in range(0, len(chunk), chunk_size):
+                    for item in self._resolve(chunk[start:start + chunk_size], pool):
+                        out.put(item)
+        except Exception as e:
+            self._error = e
+        finally:
+            out.put(_DONE)
+
+    def _ingest(self, file_path: str) -> Optional[Tuple[Dict, Optional[str]]]:
+        """Metadata, plus content when the finder reads both at once, for one file"""
+        with self.stages["read"].timed():
+            try:
+                if self._ingest_once:
+                    # Metadata and content from one read of the file
+                    ingested = self.finder.ingest(file_path)
+                    if not ingested or not ingested[1]:
+                        return None
+                    if self.on_content is not None:
+                        self.on_content(ingested[0]["file_hash"], ingested[1])
+                    return ingested
+                # Generate enriched metadata, reading content only when needed
+                metadata = self.finder.generate_metadata(file_path)
+                return (metadata, None) if metadata else None
+            except Exception as e:
+                logger.error("Failed to process %s: %s", file_path, str(e))
+                return None
+
+    def _resolve(self, chunk: List[Tuple[str, Optional[Tuple[Dict, Optional[str]]]]],
+                 pool: ThreadPoolExecutor) -> List[Optional[Tuple[Dict, Optional[str], Optional[np.ndarray]]]]:
+        """
+        (metadata, content, cached vector) of ingested files: content already
+        embedded in this run is dropped, cached content is replaced by its
+        vector with one cache lookup, and content not read yet is read now.
+        """
+        with self.stages["read"].timed(items=0):
+            keys = list(dict.fromkeys(item[0]["file_hash"] for _, item in chunk
+                                      if item is not None and item[0]["file_hash"] not in self._unique_rows))
+            cached = self.cache.get_many(keys) if self.cache is not None and keys else {}
+        reads = {
+            i: pool.submit(self._read_content, path, item[0]["file_hash"])
+            for i, (path, item) in enumerate(chunk)
+            if item is not None and item[1] is None
+            and item[0]["file_hash"] not in cached and item[0]["file_hash"] not in self._unique_rows
+        }
+        resolved = []
+        for i, (_, item) in enumerate(chunk):
+            if item is None:
+                resolved.append(None)
+                continue
+            metadata, content = item
+            content_key = metadata["file_hash"]
+            if content_key in cached:
+                resolved.append((metadata, None, cached[content_key]))
+            elif i in reads:
+                content = reads[i].result()
+                resolved.append((metadata, content, None) if content else None)
+            elif content_key in self._unique_rows:
+                resolved.append((metadata, None, None))
+            else:
+                resolved.append((metadata, content, None))
+        return resolved
+
+    def _read_content(self, file_path: str, content_key: str) -> Optional[str]:
+        with self.stages["read"].timed(items=0):
+            try:
+                content = self.finder.read_file(file_path)
+                if content and self.on_content is not None:
+                    self.on_content(content_key, content)
+                return content
+            except Exception as e:
+                logger.error("Failed to read %s: %s", file_path, str(e))
+                return None
+
+    def _batch(self, ingested: queue.Queue, out: queue.Queue):
+        """Assign rows in input order and group new content into tokenized batches"""
+        batch = []
+        batch_keys = []
+        try:
+            while True:
+                item = ingested.get()
+                if item is _DONE:
+                    break
+                self._consumed += 1
+                if item is None:
+                    continue
+                metadata, content, vector = item
+                content_key = metadata["file_hash"]
+                if content_key not in self._unique_rows:
+                    if vector is None:
+                        batch.append(content)
+                        batch_keys.append(content_key)
+                    self._unique_rows[content_key] = len(self._unique_vectors)
+                    self._unique_vectors.append(vector)
+                self._row_sources.append(self._unique_rows[content_key])
+                self._row_inputs.append(self._start + self._consumed - 1)
+                self._metadata.append(metadata)
+
+                # Process batch when full
+                if len(batch) >= self.batch_size:
+                    self._tokenize(batch, batch_keys, out)
+                    batch, batch_keys = [], []
+            if batch:
+                self._tokenize(batch, batch_keys, out)
+        except Exception as e:
+            self._error = e
+            # Keep draining so the read stage can put its last items and finish
+            while ingested.get() is not _DONE:
+                pass
+        finally:
+            out.put(_DONE)
+
+    def _tokenize(self, texts: List[str], keys: List[str], out: queue.Queue):
+        with self.stages["tokenize"].timed(len(texts)):
+            try:
+                prepared = self.embedder.prepare(texts) if self._split else texts
+            except Exception as e:
+                logger.error("Failed to tokenize a batch of %d files: %s", len(texts), str(e))
+                prepared = None
+        out.put((keys, prepared))
+
+    def _infer(self, batches: queue.Queue, out: queue.Queue):
+        """Run the model on the calling thread"""
+        try:
+            while True:
+                item = batches.get()
+                if item is _DONE:
+                    break
+                keys, prepared = item
+                vectors = None  # Failed batches are passed on so their rows can be dropped
+                if prepared is not None:
+                    logger.info(f"Embedding {len(keys)} files.")
+                    with self.stages["infer"].timed(len(keys)):
+                        try:
+                            vectors = self.embedder.infer(prepared) if self._split else self.embedder.embed(prepared)
+                        except Exception as e:
+                            logger.error("Failed to embed a batch of %d files: %s", len(keys), str(e))
+                out.put((keys, vectors))
+                logger.info("Processed %d files", len(self._metadata))
+        finally:
+            out.put(_DONE)
+
+    def _write(self, inferred: queue.Queue):
+        """Place vectors in their slots, store them in the embedding cache and emit finished rows"""
+        while True:
+            item = inferred.get()
+            if item is _DONE:
+                break
+            if self._error:
+                continue  # Keep draining so the model thread never blocks
+            keys, vectors = item
+            with self.stages["write"].timed(len(keys)):
+                if vectors is None:
+                    for key in keys:
+                        self._unique_vectors[self._unique_rows[key]] = _FAILED
+                    self._failed.extend(keys)
+                else:
+                    for key, vector in zip(keys, vectors):
+                        self._unique_vectors[self._unique_rows[key]] = vector
+                    if self.cache is not None:
+                        try:
+                            self.cache.put_many(keys, vectors)
+                        except Exception as e:
+                            logger.error("Failed to cache %d embeddings: %s", len(keys), str(e))
+                try:
+                    self._emit()
+                    if self.checkpoint and time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds:
+                        self._save_checkpoint()
+                except Exception as e:
+                    self._error = e
+
+    def _save_checkpoint(self):
+        """
+        Checkpoint at the first row still waiting for its batch. Everything
+        before it in the input is written or dropped and nothing after it is,
+        so a resumed run starting there rebuilds the same batches.
+        """
+        if self._emitted >= len(self._metadata):
+            return  # Nothing pending marks where to continue; wait for the next batch
+        row = self._emitted
+        self.checkpoint.save(
+            self._sink,
+            position=self._row_inputs[row],
+            next_path=self._metadata[row]["file_path"],
+            new_metadata=self._kept[self._checkpointed:],
+            failed=list(self._failed)
+        )
+        self._checkpointed = len(self._kept)
+        self._last_checkpoint = time.monotonic()
+
+    def _emit(self, final: bool = False):
+        """
+        Append the rows whose vectors are known, in input order, stopping at
+        the first row still waiting for its batch. Rows whose batch failed are
+        dropped. A vector already in the sink is read back from it for later
+        duplicates, so only vectors not yet written are kept in memory.
+        """
+        vectors = []
+        kept = []
+        sources = []
+        available = len(self._metadata)
+        while self._emitted < available:
+            source = self._row_sources[self._emitted]
+            vector = self._unique_vectors[source]
+            if vector is None and not final:
+                break
+            self._emitted += 1
+            if vector is None or vector is _FAILED:
+                continue
+            if vector is _WRITTEN:
+                vector = self._sink.vector(self._sink_rows[source])
+            vectors.append(vector)
+            kept.append(self._metadata[self._emitted - 1])
+            sources.append(source)
+        if not vectors:
+            return
+        first = self._sink.append(np.vstack(vectors))
+        for offset, source in enumerate(sources):
+            if source not in self._sink_rows:
+                self._sink_rows[source] = first + offset
+                self._unique_vectors[source] = _WRITTEN
+        self._kept.extend(kept)
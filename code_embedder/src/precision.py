@@ -0,0 +1,76 @@
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Convert float32 rows to a storage dtype. int8 is symmetric per row:
+    every row gets a float32 scale so that its largest component maps to 127.
+    Returns (stored rows, scales or None).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return stored, scales.astype(np.float32)
+    raise ValueError(f"Unknown storage dtype: {dtype}, expected one of {STORAGE_DTYPES}")
+
+def dequantize(stored: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """float32 rows back from their stored form"""
+    vectors = np.asarray(stored, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * np.asarray(scales, dtype=np.float32)[:, None]
+    return vectors
+
+def _top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k most cosine-similar corpus rows for every query"""
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+def recall_report(embeddings: np.ndarray, dtypes: List[str] = ("float16", "int8"),
+                  queries: int = 200, k: int = 10, seed: int = 0) -> Dict[str, Dict]:
+    """
+    Compare cosine top-k search over embeddings stored at lower precision
+    with float32. Queries are rows of the corpus itself, searched for
+    with their float32 vectors the way the API's query embeddings are.
+    Reports recall@k, bytes per row and search time per precision.
+    """
+    reference = np.asarray(embeddings, dtype=np.float32)
+    reference = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    k = min(k, len(reference))
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(reference), size=min(queries, len(reference)), replace=False)
+    query_vectors = reference[picked]
+
+    started = time.perf_counter()
+    expected = _top_k(reference, query_vectors, k)
+    report = {"float32": {"recall_at_k": 1.0, "bytes_per_row": reference.shape[1] * 4,
+                          "search_seconds": time.perf_counter() - started}}
+
+    for dtype in dtypes:
+        stored, scales = quantize(reference, dtype)
+        restored = dequantize(stored, scales)
+        restored /= np.maximum(np.linalg.norm(restored, axis=1, keepdims=True), 1e-12)
+        started = time.perf_counter()
+        found = _top_k(restored, query_vectors, k)
+        seconds = time.perf_counter() - started
+        hits = sum(len(set(a) & set(b)) for a, b in zip(expected, found))
+        report[dtype] = {
+            "recall_at_k": hits / (len(picked) * k),
+            "bytes_per_row": stored.itemsize * reference.shape[1] + (4 if scales is not None else 0),
+            "search_seconds": seconds
+        }
+    return {"rows": len(reference), "queries": len(picked), "k": k, "precisions": report}
@@ -0,0 +1,259 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Names that are almost always build output rather than hand-written code
+MINIFIED_SUFFIXES = (".min.js", "-min.js", ".bundle.js")
+GENERATED_SUFFIXES = ("_pb2.py", "_pb2_grpc.py", ".pb.go", "_generated.go", ".generated.js")
+GENERATED_MARKERS = (b"@generated", b"Code generated by", b"<auto-generated")
+
+SNIFF_BYTES = 4096
+MAX_SNIFF_LINE = 1000  # A first line this long is minified or data, not code
+
+class GitIgnore:
+    """
+    The subset of .gitignore semantics needed to prune a walk: comments,
+    negation, directory-only and anchored patterns, and *, ? and ** globs.
+    Rules are stacked per directory and the last matching rule wins.
+    """
+    def __init__(self, rules: Optional[List[Tuple[str, re.Pattern, bool, bool]]] = None):
+        # (base directory relative to the repo, regex, negated, directory only)
+        self.rules = rules or []
+
+    def child(self, base: str, gitignore_path: str) -> "GitIgnore":
+        """Rules for a directory, extended with the .gitignore file it contains"""
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8', errors='replace') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return self
+        rules = list(self.rules)
+        for line in lines:
+            rule = self._parse(base, line)
+            if rule:
+                rules.append(rule)
+        return GitIgnore(rules)
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Whether a repo-relative path (forward slashes) is ignored"""
+        result = False
+        for base, regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                candidate = rel_path[len(base) + 1:]
+            else:
+                candidate = rel_path
+            if regex.match(candidate):
+                result = not negated
+        return result
+
+    @staticmethod
+    def _parse(base: str, line: str) -> Optional[Tuple[str, re.Pattern, bool, bool]]:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            return None
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.strip("/") if dir_only else line
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not line:
+            return None
+
+        regex = ""
+        i = 0
+        while i < len(line):
+            if line.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+            elif line.startswith("**", i):
+                regex += ".*"
+                i += 2
+            elif line[i] == "*":
+                regex += "[^/]*"
+                i += 1
+            elif line[i] == "?":
+                regex += "[^/]"
+                i += 1
+            else:
+                regex += re.escape(line[i])
+                i += 1
+        if not anchored:
+            regex = "(?:.*/)?" + regex
+        # A match on a directory also covers everything below it
+        return base, re.compile(regex + "(?:/.*)?$"), negated, dir_only
+
+class _PathEntry:
+    """The parts of os.DirEntry that CodeScanner uses, for a path found without a walk"""
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def is_file(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def stat(self) -> os.stat_result:
+        return os.stat(self.path)
+
+class CodeScanner:
+    """
+    Finds code files with os.scandir, using the stat cached on each
+    directory entry so every file is stat'ed exactly once. Ignored
+    directories and .gitignore'd paths are pruned before they are entered,
+    and minified, generated and binary files are rejected before anything
+    downstream reads them. Results are yielded as they are found.
+
+    The content check reads the head of each file, so callers that already
+    know a file from a previous scan can pass unchanged(path, size, mtime);
+    files it returns True for are taken as they were accepted before.
+    """
+    def __init__(
+        self,
+        extensions: List[str],
+        ignore_dirs: List[str],
+        max_size: int,
+        respect_gitignore: bool = True,
+        skip_generated: bool = True,
+        workers: int = 1
+    ):
+        self.extensions = set(extensions)
+        self.ignore_dirs = set(ignore_dirs)
+        self.max_size = max_size
+        self.respect_gitignore = respect_gitignore
+        self.skip_generated = skip_generated
+        self.workers = max(1, workers)
+
+    def scan(self, base_dir: str, unchanged: Optional[Callable[[str, int, float], bool]] = None) -> Iterator[Dict]:
+        """Yield code files of every repository directory below base_dir"""
+        base = Path(base_dir)
+        if not base.is_dir():
+            return
+        with os.scandir(base) as entries:
+            repos = sorted(entry.name for entry in entries if entry.is_dir())
+        if self.workers == 1:
+            for repo_name in repos:
+                yield from self.scan_repo(str(base / repo_name), repo_name, unchanged)
+            return
+
+        # Repositories are walked in parallel but yielded in order, with a
+        # bounded number in flight so memory stays proportional to the workers
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan") as pool:
+            in_flight = deque()
+            for repo_name in repos:
+                in_flight.append(pool.submit(lambda name: list(self.scan_repo(str(base / name), name, unchanged)), repo_name))
+                if len(in_flight) >= self.workers * 2:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+    def scan_repo(self, repo_path: str, repo_name: Optional[str] = None,
+                  unchanged: Optional[Callable[[str, int, float], bool]] = None) -> Iterator[Dict]:
+        """Yield code files of a single repository"""
+        repo_name = repo_name or os.path.basename(repo_path)
+        stack = [(repo_path, "", GitIgnore())]
+        while stack:
+            dir_path, rel_dir, gitignore = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                logger.warning(f"Cannot list {dir_path}: {str(e)}")
+                continue
+
+            if self.respect_gitignore and any(entry.name == ".gitignore" for entry in entries):
+                gitignore = gitignore.child(rel_dir, os.path.join(dir_path, ".gitignore"))
+
+            subdirs = []
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in self.ignore_dirs or gitignore.ignored(rel_path, True):
+                        continue
+                    subdirs.append((entry.path, rel_path, gitignore))
+                    continue
+
+                record = self._file_record(entry, rel_path, repo_name, gitignore, unchanged)
+                if record:
+                    yield record
+
+            # Reversed so directories are visited in name order
+            stack.extend(reversed(subdirs))
+
+    def check_file(self, repo_path: str, rel_path: str, repo_name: Optional[str] = None) -> Optional[Dict]:
+        """
+        The record scan_repo would yield for one file of a repository, None if
+        the walk would skip it. Only the directories on the way are checked.
+        """
+        repo_name = repo_name or os.path.basename(repo_path)
+        parts = rel_path.split("/")
+        gitignore = GitIgnore()
+        dir_path, rel_dir = repo_path, ""
+        for part in parts[:-1]:
+            if self.respect_gitignore:
+                gitignore = gitignore.child(rel_dir, os.path.join(dir_path, ".gitignore"))
+            dir_path = os.path.join(dir_path, part)
+            rel_dir = f"{rel_dir}/{part}" if rel_dir else part
+            # The walk does not follow directory symlinks
+            if part in self.ignore_dirs or gitignore.ignored(rel_dir, True) or os.path.islink(dir_path):
+                return None
+        if self.respect_gitignore:
+            gitignore = gitignore.child(rel_dir, os.path.join(dir_path, ".gitignore"))
+        return self._file_record(_PathEntry(os.path.join(dir_path, parts[-1])), rel_path, repo_name, gitignore)
+
+    def _file_record(self, entry: os.DirEntry, rel_path: str, repo_name: str, gitignore: GitIgnore,
+                     unchanged: Optional[Callable[[str, int, float], bool]] = None) -> Optional[Dict]:
+        name = entry.name
+        extension = os.path.splitext(name)[1]
+        if extension not in self.extensions:
+            return None
+        lower = name.lower()
+        if self.skip_generated and lower.endswith(MINIFIED_SUFFIXES + GENERATED_SUFFIXES):
+            return None
+        if gitignore.ignored(rel_path, False):
+            return None
+        try:
+            if not entry.is_file():
+                return None
+            stats = entry.stat()
+        except OSError:
+            return None
+        if stats.st_size > self.max_size:
+            return None
+        if (self.skip_generated and stats.st_size
+                and not (unchanged and unchanged(entry.path, stats.st_size, stats.st_mtime))
+                and not self._looks_like_source(entry.path)):
+            return None
+        return {
+            'path': entry.path,
+            'extension': extension,
+            'size': stats.st_size,
+            'mtime': stats.st_mtime,
+            'repo': repo_name,
+            'relative_path': rel_path
+        }
+
+    @staticmethod
+    def _looks_like_source(path: str) -> bool:
+        """Reject binary, minified and generated files from their first bytes"""
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(SNIFF_BYTES)
+        except OSError:
+            return False
+        if b"\0" in head:
+            return False
+        first_line = head.split(b"\n", 1)[0]
+        if len(first_line) > MAX_SNIFF_LINE:
+            return False
+        return not any(marker in head for marker in GENERATED_MARKERS)
@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from .precision import dequantize, quantize
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+def read_index(directory: str) -> Optional[Dict]:
+    """Index manifest of a shard directory, None if there is none"""
+    try:
+        with open(Path(directory) / INDEX_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Unreadable shard index in {directory}: {str(e)}")
+        return None
+
+class ShardWriter:
+    """
+    Streams embedding rows into fixed-size .npy shards next to an index.json
+    listing the shards in row order:
+
+        {"version": 1, "dim": 768, "dtype": "float32", "rows": 8192,
+         "shards": [{"file": "shard-00000.npy", "rows": 4096}, ...]}
+
+    Rows are stored as float32, float16, or int8 with a float32 scale per
+    row in a shard-NNNNN.scales.npy beside each shard (see precision.py).
+    The dtype of an existing directory is kept when appending to it.
+
+    Only one shard is buffered in memory at a time, as float32. A shard file is written
+    once and never modified; the index is replaced atomically after every
+    shard, so a crash keeps every shard finished before it. Appending to an
+    existing directory continues after its last shard.
+    """
+    def __init__(self, directory: str, rows_per_shard: int = 4096, append: bool = False, dtype: str = "float32"):
+        self.directory = Path(directory)
+        self.rows_per_shard = max(1, rows_per_shard)
+        quantize(np.zeros((1, 1), dtype=np.float32), dtype)  # Rejects unknown dtypes
+        index = read_index(directory) if append else None
+        if index is None:
+            if self.directory.exists():
+                shutil.rmtree(self.directory)
+            index = {"version": FORMAT_VERSION, "dim": None, "dtype": dtype, "rows": 0, "shards": []}
+        elif index["dtype"] != dtype:
+            logger.info(f"Appending {index['dtype']} rows to {directory}, {dtype} applies from the next full run")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index = index
+        self._starts = []  # First row of every written shard
+        start = 0
+        for shard in index["shards"]:
+            self._starts.append(start)
+            start += shard["rows"]
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+        self._mapped: Dict[int, Tuple[np.ndarray, Optional[np.ndarray]]] = {}
+
+    @property
+    def count(self) -> int:
+        """Rows written so far, including the ones still buffered"""
+        return self.index["rows"] + self._buffered
+
+    def append(self, vectors: np.ndarray) -> int:
+        """Append rows and return the position of the first one"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if self.index["dim"] is None:
+            self.index["dim"] = int(vectors.shape[1])
+        elif vectors.shape[1] != self.index["dim"]:
+            raise ValueError(f"Expected {self.index['dim']}-dimensional rows, got {vectors.shape[1]}")
+        first = self.count
+        while len(vectors):
+            take = self.rows_per_shard - self._buffered
+            self._buffer.append(vectors[:take])
+            self._buffered += len(vectors[:take])
+            vectors = vectors[take:]
+            if self._buffered >= self.rows_per_shard:
+                self._flush()
+        return first
+
+    def vector(self, row: int) -> np.ndarray:
+        """Read back a row that was already appended"""
+        if row >= self.index["rows"]:
+            offset = row - self.index["rows"]
+            for part in self._buffer:
+                if offset < len(part):
+                    return part[offset]
+                offset -= len(part)
+            raise IndexError(f"Row {row} has not been written")
+        shard = int(np.searchsorted(self._starts, row, side="right")) - 1
+        if shard not in self._mapped:
+            entry = self.index["shards"][shard]
+            self._mapped[shard] = (
+                np.load(self.directory / entry["file"], mmap_mode="r"),
+                np.load(self.directory / entry["scales"], mmap_mode="r") if "scales" in entry else None
+            )
+        stored, scales = self._mapped[shard]
+        offset = row - self._starts[shard]
+        return dequantize(stored[offset:offset + 1], None if scales is None else scales[offset:offset + 1])[0]
+
+    def checkpoint(self, name: str) -> Dict:
+        """Save the buffered rows as name, so a resumed run can restore them with rollback"""
+        if self._buffered:
+            pending = np.concatenate(self._buffer)
+        else:
+            pending = np.empty((0, self.index["dim"] or 0), dtype=np.float32)
+        tmp_path = self.directory / (name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            np.save(f, pending)
+        os.replace(tmp_path, self.directory / name)
+        self._write_index()
+        return {"rows": self.count, "shards": len(self.index["shards"]), "pending": name}
+
+    def rollback(self, checkpoint: Dict):
+        """Return to a checkpoint, dropping shards written after it and restoring its buffered rows"""
+        kept = checkpoint["shards"]
+        for shard in self.index["shards"][kept:]:
+            (self.directory / shard["file"]).unlink(missing_ok=True)
+            if "scales" in shard:
+                (self.directory / shard["scales"]).unlink(missing_ok=True)
+        self.index["shards"] = self.index["shards"][:kept]
+        self.index["rows"] = sum(shard["rows"] for shard in self.index["shards"])
+        self._starts = self._starts[:kept]
+        self._mapped.clear()
+        pending = np.load(self.directory / checkpoint["pending"])
+        if self.index["rows"] + len(pending) != checkpoint["rows"]:
+            raise ValueError(f"Checkpoint of {checkpoint['rows']} rows does not match the shards in {self.directory}")
+        self._buffer = [pending] if len(pending) else []
+        self._buffered = len(pending)
+        self._write_index()
+
+    def close(self) -> Dict:
+        """Write the partially filled shard and return the index"""
+        self._flush()
+        self._write_index()
+        self._mapped.clear()
+        return self.index
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        name = f"shard-{len(self.index['shards']):05d}"
+        stored, scales = quantize(np.concatenate(self._buffer), self.index["dtype"])
+        entry = {"file": f"{name}.npy", "rows": self._buffered}
+        np.save(self.directory / entry["file"], stored)
+        if scales is not None:
+            entry["scales"] = f"{name}.scales.npy"
+            np.save(self.directory / entry["scales"], scales)
+        self._starts.append(self.index["rows"])
+        self.index["shards"].append(entry)
+        self.index["rows"] += self._buffered
+        self._buffer, self._buffered = [], 0
+        self._write_index()
+
+    def _write_index(self):
+        tmp_path = self.directory / (INDEX_FILE + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp_path, self.directory / INDEX_FILE)
+
+def read_shards(directory: str) -> np.ndarray:
+    """Every row of a shard directory as one float32 matrix, for reports and tests"""
+    index = read_index(directory)
+    if not index or not index["shards"]:
+        return np.empty((0, (index or {}).get("dim") or 0), dtype=np.float32)
+    directory = Path(directory)
+    return np.concatenate([
+        dequantize(
+            np.load(directory / shard["file"], mmap_mode="r"),
+            np.load(directory / shard["scales"]) if "scales" in shard else None
+        )
+        for shard in index["shards"]
+    ])
+
+def publish(staging_dir: str, directory: str):
+    """Replace a shard directory with a freshly written one"""
+    staging_dir, directory = Path(staging_dir), Path(directory)
+    retired = directory.with_name(directory.name + ".old")
+    if retired.exists():
+        shutil.rmtree(retired)
+    if directory.exists():
+        os.replace(directory, retired)
+    os.replace(staging_dir, directory)
+    if retired.exists():
+        shutil.rmtree(retired)
+
+def convert_legacy(npy_path: str, directory: str, rows_per_shard: int = 4096, dtype: str = "float32") -> Dict:
+    """Split a single embeddings.npy from an older run into shards"""
+    embeddings = np.load(npy_path, mmap_mode="r")
+    writer = ShardWriter(directory, rows_per_shard, dtype=dtype)
+    for start in range(0, len(embeddings), writer.rows_per_shard):
+        writer.append(np.array(embeddings[start:start + writer.rows_per_shard]))
+    index = writer.close()
+    logger.info(f"Converted {npy_path} into {len(index['shards'])} shards")
+    return index
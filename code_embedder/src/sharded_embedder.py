@@ -0,0 +1,163 @@
+import multiprocessing as mp
+import os
+import queue
+from typing import List, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def available_cores() -> List[int]:
+    """CPU ids this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _worker(backend: str, model_name: str, max_length: int, max_tokens: Optional[int],
+            export_dir: Optional[str], cores: List[int], tasks, results):
+    """Embed shards sent by the parent with one model pinned to a slice of cores"""
+    # Set before torch starts its thread pools
+    threads = str(len(cores))
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ["MKL_NUM_THREADS"] = threads
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    from .embedder import create_embedder
+
+    torch.set_num_threads(len(cores))
+    try:
+        embedder = create_embedder(backend, model_name, max_length=max_length,
+                                   max_tokens=max_tokens, export_dir=export_dir)
+    except Exception as e:
+        results.put((None, f"Model load failed: {e}"))
+        return
+    results.put((None, None))  # Ready
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, texts = task
+        try:
+            results.put((job_id, embedder.embed(texts)))
+        except Exception as e:
+            results.put((job_id, f"{type(e).__name__}: {e}"))
+
+class ShardedEmbedder:
+    """
+    Drop-in replacement for CodeBertEmbedder that splits every embed() call
+    across worker processes. Each worker loads its own copy of the model,
+    is pinned to its own slice of the available cores and runs torch with
+    one intra-op thread per core, so workers do not compete for CPUs.
+    Results come back in input order.
+    """
+    def __init__(
+        self,
+        model_name: str = "microsoft/codebert-base",
+        max_length: int = 512,
+        max_tokens: Optional[int] = None,
+        workers: int = 2,
+        threads_per_worker: int = 0,
+        timeout: float = 600,
+        backend: str = "torch",
+        export_dir: Optional[str] = None
+    ):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.model_id = model_name
+
+        if backend != "torch":
+            # Export once here instead of racing in every worker
+            from .onnx_embedder import export_onnx
+            export_onnx(model_name, export_dir or os.path.join("data", "models"), backend == "onnx-int8")
+            self.model_id = f"{model_name}+{backend}"
+
+        cores = available_cores()
+        self.workers = max(1, workers)
+        per_worker = threads_per_worker or max(1, len(cores) // self.workers)
+        context = mp.get_context("spawn")  # fork is unsafe once torch has started threads
+        self._results = context.Queue()
+        self._last_job = 0  # Job ids keep increasing across calls
+        self._tasks = []
+        self._processes = []
+        for i in range(self.workers):
+            # Contiguous slices keep a worker's threads on neighbouring cores
+            worker_cores = [cores[(i * per_worker + j) % len(cores)] for j in range(per_worker)]
+            tasks = context.Queue()
+            process = context.Process(
+                target=_worker,
+                args=(backend, model_name, max_length, max_tokens, export_dir, worker_cores, tasks, self._results),
+                name=f"embedder-{i}",
+                daemon=True
+            )
+            process.start()
+            self._tasks.append(tasks)
+            self._processes.append(process)
+
+        for _ in self._processes:
+            _, error = self._next_result()
+            if error:
+                self.close()
+                raise RuntimeError(error)
+        logger.info(f"Started {self.workers} embedding workers with {per_worker} threads each")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Convert code texts to embeddings, one shard per worker"""
+        # Dealing length-sorted texts round robin gives every worker a similar amount of work
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        shards = [order[i::self.workers] for i in range(self.workers)]
+        jobs = {}
+        for tasks, shard in zip(self._tasks, shards):
+            if shard:
+                self._last_job += 1
+                jobs[self._last_job] = shard
+                tasks.put((self._last_job, [texts[i] for i in shard]))
+
+        embeddings = None
+        errors = []
+        while jobs:
+            job_id, vectors = self._next_result()
+            if job_id not in jobs:
+                # Left behind by an earlier call that failed before collecting it
+                continue
+            shard = jobs.pop(job_id)
+            if isinstance(vectors, str):
+                errors.append(vectors)
+                continue
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+            embeddings[shard] = vectors
+        if errors:
+            raise RuntimeError(f"Embedding worker failed: {errors[0]}")
+        return embeddings
+
+    def close(self):
+        """Stop the worker processes"""
+        for tasks, process in zip(self._tasks, self._processes):
+            if process.is_alive():
+                tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._tasks = []
+
+    def _next_result(self):
+        """Wait for a worker result, failing if a worker has died"""
+        waited = 0
+        while True:
+            try:
+                return self._results.get(timeout=1)
+            except queue.Empty:
+                waited += 1
+                dead = [p.name for p in self._processes if not p.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Embedding worker exited unexpectedly: {', '.join(dead)}")
+                if waited >= self.timeout:
+                    raise RuntimeError("Timed out waiting for an embedding worker")
@@ -322,6 +322,800 @@ def test_metadata_generator_hash_consistency(tmp_path):
     metadata3 = MetadataGenerator.generate(str(test_file))
     assert metadata1["file_hash"] != metadata3["file_hash"]
 
+
+def test_metadata_generator_relative_path(tmp_path):
+    """Relative path inside the repository uses forward slashes"""
+    from src.metadata_generator import MetadataGenerator
+
+    repo_dir = tmp_path / "repositories" / "my_repo" / "pkg" / "sub"
+    repo_dir.mkdir(parents=True)
+    test_file = repo_dir / "mod.py"
+    test_file.write_text("content")
+
+    metadata = MetadataGenerator.generate(str(test_file))
+    assert metadata["relative_path"] == "pkg/sub/mod.py"
+
+def test_change_manifest_plan_and_state(tmp_path):
+    """Pending manifest entries map to stale rows and files to embed"""
+    import json
+    from src.change_manifest import ChangeManifest
+
+    manifest = ChangeManifest(str(tmp_path))
+    (tmp_path / "changes.json").write_text(json.dumps({"repos": {
+        "repo_a": {"base_commit": "a1", "head_commit": "a2", "full": False,
+                   "added": ["new.py"], "modified": ["edit.py"], "deleted": ["gone.py"],
+                   "renamed": [{"from": "old.py", "to": "moved.py"}]},
+        "repo_b": {"base_commit": None, "head_commit": "b1", "full": True,
+                   "added": ["b.py"], "modified": [], "deleted": [], "renamed": []},
+        "repo_c": {"base_commit": "c1", "head_commit": "c1", "full": False,
+                   "added": [], "modified": [], "deleted": [], "renamed": []},
+    }}))
+    (tmp_path / "index_state.json").write_text(json.dumps({"repo_a": "a1", "repo_c": "c1"}))
+
+    pending = manifest.pending()
+    assert sorted(pending) == ["repo_a", "repo_b"]
+
+    metadata = [
+        {"repo_name": "repo_a", "relative_path": "keep.py"},
+        {"repo_name": "repo_a", "relative_path": "edit.py"},
+        {"repo_name": "repo_a", "relative_path": "gone.py"},
+        {"repo_name": "repo_a", "relative_path": "old.py"},
+        {"repo_name": "repo_b", "relative_path": "b.py"},
+        {"repo_name": "repo_a", "relative_path": "edit.py", "deleted": True},
+    ]
+    stale, to_embed = ChangeManifest.plan(metadata, pending)
+    assert stale == [1, 2, 3, 4]
+    assert to_embed == {"repo_a": ["new.py", "edit.py", "moved.py"], "repo_b": ["b.py"]}
+
+    manifest.mark_indexed(pending)
+    assert manifest.load_state() == {"repo_a": "a2", "repo_b": "b1", "repo_c": "c1"}
+    assert manifest.pending() == {}
+
+def test_file_manifest_tracks_active_rows(tmp_path):
+    """FileManifest keeps one entry per active row, with MetadataGenerator's signature"""
+    import os
+    from src.file_manifest import FileManifest, stat_signature
+    from src.metadata_generator import MetadataGenerator
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    (repo_dir / "a.py").write_text("a = 1")
+    (repo_dir / "b.py").write_text("b = 2")
+    metadata = [MetadataGenerator.generate(str(repo_dir / name)) for name in ("a.py", "b.py", "a.py")]
+    metadata[0]["deleted"] = True
+
+    manifest = FileManifest(str(tmp_path / "out" / "file_manifest.db"))
+    assert len(manifest) == 0
+    manifest.rebuild(metadata)
+
+    entries = manifest.load()
+    assert len(manifest) == 2
+    assert entries[str(repo_dir / "a.py")].row == 2
+    assert entries[str(repo_dir / "b.py")].row == 1
+    assert entries[str(repo_dir / "b.py")].file_hash == metadata[1]["file_hash"]
+
+    stats = os.stat(repo_dir / "b.py")
+    entry = entries[str(repo_dir / "b.py")]
+    assert stat_signature(stats.st_size, stats.st_mtime) == (entry.file_size, entry.last_modified)
+
+    # Persisted across instances
+    assert FileManifest(str(tmp_path / "out" / "file_manifest.db")).load() == entries
+
+def test_embedding_cache_keys_and_eviction(tmp_path):
+    """Cached vectors are scoped to model and max_length, least recently used go first"""
+    import time
+    from src.embedding_cache import EmbeddingCache
+
+    db_path = str(tmp_path / "cache.db")
+    vectors = np.arange(12, dtype=np.float32).reshape(3, 4)  # 16 bytes per vector
+    cache = EmbeddingCache(db_path, model_name="model-a", max_length=512, max_bytes=40)
+    cache.put_many(["h1", "h2"], vectors[:2])
+    np.testing.assert_array_equal(cache.get("h1"), vectors[0])
+    assert cache.get("h3") is None
+    assert cache.hits == 1 and cache.misses == 1
+
+    assert EmbeddingCache(db_path, model_name="model-b", max_length=512).get("h1") is None
+    assert EmbeddingCache(db_path, model_name="model-a", max_length=256).get("h1") is None
+
+    # h2 is now the least recently used entry and is evicted when h3 overflows the cache
+    time.sleep(0.01)
+    cache.get("h1")
+    cache.put_many(["h3"], vectors[2:])
+    assert cache.get("h2") is None
+    assert sorted(cache.get_many(["h1", "h2", "h3"])) == ["h1", "h3"]
+
+def test_embedding_cache_writes_hits_in_batches(tmp_path):
+    """Hits are read without a commit and their last_used times written together"""
+    import sqlite3
+    from src import embedding_cache
+    from src.embedding_cache import EmbeddingCache
+
+    db_path = str(tmp_path / "cache.db")
+    hashes = [f"h{i}" for i in range(embedding_cache.TOUCH_BATCH + 10)]
+    cache = EmbeddingCache(db_path, model_name="model-a", max_length=512)
+    cache.put_many(hashes, np.ones((len(hashes), 4), dtype=np.float32))
+
+    def last_used():
+        with sqlite3.connect(db_path) as conn:
+            return dict(conn.execute("SELECT content_hash, last_used FROM embeddings"))
+
+    stored = last_used()
+    assert set(cache.get_many(hashes[:10])) == set(hashes[:10])
+    assert last_used() == stored
+    cache.flush()
+    assert all(last_used()[h] > stored[h] for h in hashes[:10])
+
+    # A lookup that reaches TOUCH_BATCH hits writes them without a flush
+    stored = last_used()
+    assert len(cache.get_many(hashes + ["missing"])) == len(hashes)
+    assert all(last_used()[h] > stored[h] for h in hashes)
+    assert cache.misses == 1
+    cache.close()
+
+def test_embed_files_uses_cache(tmp_path):
+    """A second run over the same content is served from the cache"""
+    from src.code_finder import CodeFinder
+    from src.embedding_cache import EmbeddingCache
+    sys.path.insert(0, str(project_root.parent))
+    from code_embedder.main import embed_files
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    (repo_dir / "a.py").write_text("a = 1")
+    (repo_dir / "b.py").write_text("b = 2")
+    (repo_dir / "copy.py").write_text("a = 1")
+    finder = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=1000)
+    paths = sorted(f['path'] for f in finder.find_all_code_files())
+
+    embedder = Mock()
+    embedder.embed.side_effect = lambda texts: np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), model_name="fake", max_length=512)
+
+    first, metadata = embed_files(paths, finder, embedder, batch_size=16, cache=cache)
+    assert embedder.embed.call_count == 1
+    assert len(embedder.embed.call_args[0][0]) == 2  # copy.py reuses a.py's vector
+
+    # Cached vectors are looked up once per read chunk, never one file at a time
+    with patch.object(cache, "get", side_effect=AssertionError("per-file lookup")), \
+         patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+        second, _ = embed_files(paths, finder, embedder, batch_size=16, cache=cache)
+    assert get_many.call_count == 1 and sorted(get_many.call_args[0][0]) == sorted(set(get_many.call_args[0][0]))
+    assert embedder.embed.call_count == 1
+    np.testing.assert_array_equal(first, second)
+    assert len(metadata) == 3
+
+def _tiny_bert(tmp_path):
+    """Save a small randomly initialised BERT and word-level tokenizer, no download needed"""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    model_dir = tmp_path / "tiny_bert"
+    model_dir.mkdir()
+    words = ["def", "return", "class", "print", "x", "y", "=", "(", ")", ":", "+", "1", "2"]
+    vocab = model_dir / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    BertTokenizerFast(vocab_file=str(vocab)).save_pretrained(str(model_dir))
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(words) + 5, hidden_size=16, num_hidden_layers=1,
+                        num_attention_heads=2, intermediate_size=32, max_position_embeddings=64)
+    BertModel(config).save_pretrained(str(model_dir))
+    return str(model_dir)
+
+def test_token_budget_batching(tmp_path):
+    """Length-sorted batches stay within the token budget and rows keep input order"""
+    from src.embedder import CodeBertEmbedder, token_budget_batches
+
+    batches = token_budget_batches([50, 3, 40, 4, 5], max_tokens=100)
+    assert batches == [[1, 3, 4], [2, 0]]
+    assert token_budget_batches([300], max_tokens=100) == [[0]]
+
+    model_dir = _tiny_bert(tmp_path)
+    texts = ["def x ( ) : return 1 " * 4, "x = 1", "print ( y )", "class x : y = 2 + 1", "y"]
+    budgeted = CodeBertEmbedder(model_dir, max_length=32, max_tokens=40)
+    single = CodeBertEmbedder(model_dir, max_length=32)
+
+    calls = []
+    forward = budgeted.model.forward
+    budgeted.model.forward = lambda **inputs: calls.append(inputs['input_ids'].shape) or forward(**inputs)
+    embeddings = budgeted.embed(texts)
+
+    assert len(calls) > 1
+    assert all(rows * length <= 40 for rows, length in calls if rows > 1)
+    expected = np.vstack([single.embed([text]) for text in texts])
+    np.testing.assert_allclose(embeddings, expected, atol=1e-5)
+
+def test_sharded_embedder_matches_single_process(tmp_path):
+    """Worker processes return the same vectors, in input order, as one embedder"""
+    from src.embedder import CodeBertEmbedder
+    from src.sharded_embedder import ShardedEmbedder
+
+    model_dir = _tiny_bert(tmp_path)
+    texts = ["def x ( ) : return 1 " * 4, "x = 1", "print ( y )", "class x : y = 2 + 1", "y"]
+    expected = CodeBertEmbedder(model_dir, max_length=32).embed(texts)
+
+    sharded = ShardedEmbedder(model_dir, max_length=32, workers=2, threads_per_worker=1)
+    processes = list(sharded._processes)
+    try:
+        np.testing.assert_allclose(sharded.embed(texts), expected, atol=1e-5)
+        np.testing.assert_allclose(sharded.embed(texts[:1]), expected[:1], atol=1e-5)
+        # A result an earlier failed call never collected is not taken for a new one
+        sharded._results.put((sharded._last_job, np.zeros((3, 16), dtype=np.float32)))
+        np.testing.assert_allclose(sharded.embed(texts), expected, atol=1e-5)
+    finally:
+        sharded.close()
+    assert not any(process.is_alive() for process in processes)
+
+def test_onnx_backend_parity(tmp_path):
+    """The exported ONNX model pools to the same vectors as PyTorch, int8 stays close"""
+    from src.embedder import create_embedder
+    from src.onnx_embedder import parity_report
+
+    model_dir = _tiny_bert(tmp_path)
+    export_dir = str(tmp_path / "models")
+    texts = ["def x ( ) : return 1 " * 4, "x = 1", "print ( y )", "class x : y = 2 + 1", "y"]
+    reference = create_embedder("torch", model_dir, max_length=32)
+
+    onnx = create_embedder("onnx", model_dir, max_length=32, max_tokens=40, export_dir=export_dir)
+    np.testing.assert_allclose(onnx.embed(texts), reference.embed(texts), atol=1e-4)
+    assert onnx.model_id.endswith("+onnx")
+
+    int8 = create_embedder("onnx-int8", model_dir, max_length=32, export_dir=export_dir)
+    report = parity_report(reference, int8, texts, batch_size=2)
+    assert report["texts"] == len(texts)
+    assert -1.0 <= report["min_cosine"] <= report["mean_cosine"] <= 1.0 + 1e-6
+    assert report["speedup"] > 0
+    assert len(list((tmp_path / "models").rglob("*.onnx"))) == 2
+
+    with pytest.raises(ValueError):
+        create_embedder("tensorrt", model_dir)
+
+def test_pipeline_keeps_rows_aligned(tmp_path):
+    """Overlapped stages return rows in input order and report every stage"""
+    from src.code_finder import CodeFinder
+    from src.embedder import CodeBertEmbedder
+    from src.pipeline import EmbeddingPipeline
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    snippets = ["x = 1", "print ( y )", "def x ( ) : return 1 " * 3, "class x : y = 2 + 1", "y"]
+    for i in range(20):
+        (repo_dir / f"f{i:02d}.py").write_text(snippets[i % len(snippets)] + " " + "x " * i)
+    (repo_dir / "copy.py").write_text((repo_dir / "f00.py").read_text())
+    finder = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=1000)
+    paths = sorted(f['path'] for f in finder.find_all_code_files())
+
+    embedder = CodeBertEmbedder(_tiny_bert(tmp_path), max_length=32, max_tokens=64)
+    pipeline = EmbeddingPipeline(finder, embedder, batch_size=4, read_workers=3, queue_size=2)
+    embeddings, metadata = pipeline.run(paths)
+
+    assert [m["file_path"] for m in metadata] == paths
+    expected = embedder.embed([finder.read_file(path) for path in paths])
+    np.testing.assert_allclose(embeddings, expected, atol=1e-5)
+
+    report = pipeline.report()
+    assert list(report) == ["discover", "read", "tokenize", "infer", "write"]
+    assert report["read"]["items"] == len(paths)
+    assert report["infer"]["items"] == len(paths) - 1  # the copy reuses a vector
+    assert all(0 <= stats["utilization"] for stats in report.values())
+
+def test_pipeline_raises_when_a_stage_fails(tmp_path):
+    """An error in the batch stage stops the run and is raised instead of hanging"""
+    import threading
+    from src.code_finder import CodeFinder
+    from src.pipeline import EmbeddingPipeline
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    for i in range(40):
+        (repo_dir / f"f{i:02d}.py").write_text(f"x = {i}")
+    finder = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=1000)
+    paths = sorted(f['path'] for f in finder.find_all_code_files())
+
+    embedder = Mock(spec=["embed"])
+    pipeline = EmbeddingPipeline(finder, embedder, batch_size=2, read_workers=2, queue_size=1)
+    def broken_tokenize(texts, keys, out):
+        raise RuntimeError("tokenizer crashed")
+    pipeline._tokenize = broken_tokenize
+
+    raised = []
+    def run():
+        try:
+            pipeline.run(paths)
+        except RuntimeError as e:
+            raised.append(e)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    assert [str(e) for e in raised] == ["tokenizer crashed"]
+
+def test_ingest_record_matches_separate_reads(tmp_path):
+    """One read gives the same metadata and content as MetadataGenerator plus read_file"""
+    import hashlib
+    from src.code_finder import CodeFinder
+    from src.ingest import hash_function, read_record
+    from src.metadata_generator import MetadataGenerator
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    (repo_dir / "crlf.py").write_bytes(b"  def f():\r\n    return 1\r\n\n")
+    (repo_dir / "empty.py").write_bytes(b"")
+    (repo_dir / "blank.py").write_bytes(b"  \n\n")
+    (repo_dir / "large.py").write_text("x = 1\n" * 1000)
+    (repo_dir / "latin1.py").write_bytes(b"name = '\xe9'\n")
+
+    finder = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=100000)
+    for name in ("crlf.py", "empty.py", "blank.py", "large.py"):
+        path = str(repo_dir / name)
+        metadata, content = finder.ingest(path)
+        assert metadata == MetadataGenerator.generate(path)
+        assert content == finder.read_file(path)
+
+    # Large files are mapped instead of copied, with the same result
+    mapped = read_record(str(repo_dir / "large.py"), mmap_threshold=1024)
+    assert mapped.content == finder.read_file(str(repo_dir / "large.py"))
+    assert mapped.file_hash == hashlib.md5((repo_dir / "large.py").read_bytes()).hexdigest()
+
+    # With the default threshold, files near MAX_FILE_SIZE are mapped too
+    import mmap
+    from src.ingest import MMAP_THRESHOLD
+    (repo_dir / "big.py").write_text("y = 2\n" * (MMAP_THRESHOLD // 6 + 1))
+    with patch("src.ingest.mmap.mmap", wraps=mmap.mmap) as mapping:
+        metadata, content = finder.ingest(str(repo_dir / "big.py"))
+    assert mapping.call_count == 1 and metadata["file_size"] < 100000
+    assert content == finder.read_file(str(repo_dir / "big.py"))
+
+    metadata, content = finder.ingest(str(repo_dir / "latin1.py"))
+    assert content is None and metadata["file_size"] == 11
+
+    blake = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=100000,
+                       hash_algorithm="blake2b")
+    data = (repo_dir / "crlf.py").read_bytes()
+    assert blake.ingest(str(repo_dir / "crlf.py"))[0]["file_hash"] == hashlib.blake2b(data, digest_size=16).hexdigest()
+    assert len(hash_function("xxh3")(data).hexdigest()) == 32  # xxh3, or blake2b without xxhash
+    with pytest.raises(ValueError):
+        hash_function("crc32")
+
+def test_pipeline_streams_into_shards(tmp_path):
+    """Rows are streamed into shards in input order, duplicates are read back and failed batches dropped"""
+    import json
+    from src.code_finder import CodeFinder
+    from src.pipeline import EmbeddingPipeline
+    from src.shard_store import ShardWriter, read_index
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    for name, text in [("a.py", "a = 1"), ("b.py", "bad"), ("c.py", "c = 333"), ("d.py", "a = 1")]:
+        (repo_dir / name).write_text(text)
+    finder = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=1000)
+    paths = sorted(f['path'] for f in finder.find_all_code_files())
+
+    def embed(texts):
+        if "bad" in texts:
+            raise RuntimeError("model failure")
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+    embedder = Mock(spec=["embed"])
+    embedder.embed.side_effect = embed
+
+    shards_dir = tmp_path / "shards"
+    writer = ShardWriter(str(shards_dir), rows_per_shard=2)
+    metadata = EmbeddingPipeline(finder, embedder, batch_size=1, read_workers=2).stream(paths, writer)
+    writer.close()
+
+    # b.py failed; d.py repeats a.py, whose shard was already on disk
+    assert [m["file_name"] for m in metadata] == ["a.py", "c.py", "d.py"]
+    index = read_index(str(shards_dir))
+    assert index["rows"] == 3 and [s["rows"] for s in index["shards"]] == [2, 1]
+    rows = np.concatenate([np.load(shards_dir / s["file"]) for s in index["shards"]])
+    np.testing.assert_array_equal(rows, [[5, 1], [7, 1], [5, 1]])
+
+    # Appending continues after the last shard and leaves the written ones alone
+    writer = ShardWriter(str(shards_dir), rows_per_shard=2, append=True)
+    assert writer.append(np.ones((3, 2))) == 3
+    np.testing.assert_array_equal(writer.vector(1), [7, 1])
+    index = writer.close()
+    assert index["rows"] == 6 and [s["rows"] for s in index["shards"]] == [2, 1, 2, 1]
+    assert json.loads((shards_dir / "index.json").read_text()) == index
+
+def test_metadata_store_rows_and_scans(tmp_path):
+    """Metadata comes back exactly as stored, by row, by filter and after incremental changes"""
+    from src.metadata_store import MetadataStore
+
+    files = [
+        {"file_path": "/r/a.py", "repo_name": "r", "language": "Python", "file_size": 10, "file_hash": "h1"},
+        {"file_path": "/r/b.js", "repo_name": "r", "language": "JavaScript", "file_size": 20, "file_hash": "h2"},
+        {"file_path": "/s/c.py", "repo_name": "s", "language": "Python", "file_size": 30, "file_hash": "h3",
+         "blob_sha": "h3", "note": {"kept": True}}
+    ]
+    store = MetadataStore.create(str(tmp_path / "metadata.db"), files)
+    assert len(store) == 3 and store.all() == files
+    assert store.get(2) == files[2] and store.get(7) is None
+    assert store.rows([2, 0]) == [files[2], files[0]]
+    assert [row for row, _ in store.scan(language="Python")] == [0, 2]
+    assert [meta["file_path"] for _, meta in store.scan(repo_name="r", language="Python")] == ["/r/a.py"]
+    with pytest.raises(ValueError):
+        list(store.scan(colour="red"))
+
+    # a.py changed: tombstone and append in one go, then refresh a touched file
+    assert store.append([dict(files[0], file_hash="h4")], deleted=[0]) == 1
+    store.update(1, file_size=21)
+    assert store.get(0)["deleted"] is True and store.get(3)["file_hash"] == "h4"
+    assert [row for row, _ in store.scan(language="Python")] == [2, 3]
+    assert store.get(1)["file_size"] == 21 and store.info()["total_files"] == "4"
+
+def test_resume_matches_uninterrupted_run(tmp_path, monkeypatch):
+    """A run resumed from a checkpoint ends with the same rows and metadata as one that was never interrupted"""
+    import json
+    import shutil
+    from types import SimpleNamespace
+    from src.code_finder import CodeFinder
+    sys.path.insert(0, str(project_root.parent))
+    import code_embedder.src.checkpoint as checkpoint_module
+    from code_embedder.main import run_full
+
+    repo_dir = tmp_path / "repositories" / "repo"
+    repo_dir.mkdir(parents=True)
+    texts = ["a = 1", "bad", "b = 22", "c = 333", "d = 4444", "a = 1", "e = 5", "bad", "f = 66", "g = 777"]
+    for i, text in enumerate(texts):
+        (repo_dir / f"f{i}.py").write_text(text)
+    finder = CodeFinder(str(tmp_path / "repositories"), extensions=[".py"], ignore_dirs=[], max_size=1000)
+
+    class Embedder:
+        model_id = "fake"
+        max_length = 512
+        def __init__(self):
+            self.embedded = []
+        def embed(self, batch):
+            if "bad" in batch:
+                raise RuntimeError("model failure")
+            self.embedded.extend(batch)
+            return np.array([[len(t), len(batch)] for t in batch], dtype=np.float32)
+
+    def settings(name):
+        return SimpleNamespace(shards_dir=str(tmp_path / name / "shards"), files_per_embed_call=2,
+                               EMBEDDING_MAX_TOKENS=0, SHARD_ROWS=3, HASH_ALGORITHM="md5", SOURCE_MODE="worktree",
+                               READ_WORKERS=2, CHECKPOINT_SECONDS=0, EMBEDDING_STORAGE_DTYPE="float32")
+
+    def rows(name):
+        staging = tmp_path / name / "shards.tmp"
+        index = json.loads((staging / "index.json").read_text())
+        assert not (staging / "checkpoint.json").exists()
+        return np.concatenate([np.load(staging / shard["file"]) for shard in index["shards"]])
+
+    # Keep a copy of the staging directory as it was after the second checkpoint
+    save = checkpoint_module.Checkpoint.save
+    def save_and_copy(self, *args, **kwargs):
+        save(self, *args, **kwargs)
+        if self.saves == 2:
+            shutil.copytree(self.directory, tmp_path / "crashed" / "shards.tmp")
+    monkeypatch.setattr(checkpoint_module.Checkpoint, "save", save_and_copy)
+    expected = run_full(finder, Embedder(), settings("uninterrupted"))
+    monkeypatch.undo()
+
+    state = json.loads((tmp_path / "crashed" / "shards.tmp" / "checkpoint.json").read_text())
+    with open(tmp_path / "crashed" / "shards.tmp" / "checkpoint.jsonl", "a") as f:
+        f.write('{"file_path": "written after the checkpoint"}\n')
+    embedder = Embedder()
+    resumed = run_full(finder, embedder, settings("crashed"), resume=True)
+
+    assert resumed == expected
+    # "a = 1" shares the failed batch with "bad", so their copies are dropped too
+    assert [m["file_name"] for m in expected] == ["f2.py", "f3.py", "f4.py", "f6.py", "f8.py", "f9.py"]
+    np.testing.assert_array_equal(rows("crashed"), rows("uninterrupted"))
+    # Only files after the checkpoint were embedded again, duplicates and failures before it were remembered
+    assert "a = 1" not in embedder.embedded and 0 < state["position"] <= len(texts)
+    assert set(embedder.embedded) <= set(texts[state["position"]:])
+
+def test_reduced_precision_shards(tmp_path):
+    """float16 and int8 shards are smaller on disk, read back as float32 and keep near neighbours"""
+    from src.precision import quantize, recall_report
+    from src.shard_store import ShardWriter, read_index, read_shards
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 16)).astype(np.float32)
+    vectors[3] = 0  # an all-zero row must not divide by zero
+
+    for dtype, tolerance in [("float16", 1e-2), ("int8", 5e-2)]:
+        shards_dir = tmp_path / dtype
+        writer = ShardWriter(str(shards_dir), rows_per_shard=20, dtype=dtype)
+        writer.append(vectors[:30])
+        np.testing.assert_allclose(writer.vector(25), vectors[25], atol=tolerance)
+        writer.append(vectors[30:])
+        index = writer.close()
+        assert index["dtype"] == dtype
+        assert np.load(shards_dir / index["shards"][0]["file"]).dtype == np.dtype(dtype)
+        assert ("scales" in index["shards"][0]) == (dtype == "int8")
+
+        rows = read_shards(str(shards_dir))
+        assert rows.dtype == np.float32 and rows.shape == vectors.shape
+        np.testing.assert_allclose(rows, vectors, atol=tolerance)
+        np.testing.assert_array_equal(rows[3], 0)
+        np.testing.assert_allclose(writer.vector(5), rows[5])
+
+        # Appends keep the precision the directory was written with
+        writer = ShardWriter(str(shards_dir), rows_per_shard=20, append=True)
+        writer.append(vectors[:1])
+        writer.close()
+        assert read_index(str(shards_dir))["dtype"] == dtype
+
+    with pytest.raises(ValueError):
+        quantize(vectors, "int4")
+
+    report = recall_report(vectors, queries=10, k=5)
+    assert report["queries"] == 10 and report["k"] == 5
+    assert report["precisions"]["float32"]["bytes_per_row"] == 64
+    assert report["precisions"]["float16"]["bytes_per_row"] == 32
+    assert report["precisions"]["int8"]["bytes_per_row"] == 20
+    assert report["precisions"]["float16"]["recall_at_k"] >= 0.9
+    assert report["precisions"]["int8"]["recall_at_k"] >= 0.8
+
+def test_calibration_picks_fastest_and_persists(tmp_path, monkeypatch):
+    """The fastest configuration is kept per hardware, model and workload, environment settings win"""
+    import time
+    from types import SimpleNamespace
+    from src.calibration import apply_calibration, calibrate, load_calibration, save_calibration, synthetic_code
+
+    def embed(texts):
+        # A token budget is four times faster per file than fixed batches
+        time.sleep(len(texts) * (0.0005 if embedder.max_tokens else 0.002))
+        return np.zeros((len(texts), 2), dtype=np.float32)
+    embedder = Mock(spec=["embed", "max_tokens"])
+    embedder.max_tokens = None
+    embedder.embed.side_effect = embed
+
+    texts = synthetic_code(16)
+    assert len(texts) == 16 and texts == synthetic_code(16) and len(set(map(len, texts))) > 2
+    threads = torch.get_num_threads()
+    result = calibrate(embedder, texts, threads=[threads], batch_sizes=(4, 8), max_tokens=(4096,))
+    assert result["max_tokens"] == 4096 and result["threads"] == threads
+    assert len(result["trials"]) == 3  # Deduplicated: the thread trial is also the token budget trial
+    assert embedder.max_tokens == 4096
+
+    path = str(tmp_path / "calibration.json")
+    assert load_calibration(path, "model") is None
+    save_calibration(path, "model", result)
+    save_calibration(path, "model", dict(result, threads=1), "query")
+    assert load_calibration(path, "model") == result
+    assert load_calibration(path, "model", "query")["threads"] == 1
+    assert load_calibration(path, "other-model") is None
+
+    settings = SimpleNamespace(EMBEDDING_BATCH_SIZE=16, EMBEDDING_MAX_TOKENS=8192, EMBEDDING_THREADS=0)
+    monkeypatch.setenv("EMBEDDING_THREADS", "2")
+    assert apply_calibration(settings, result) == {"EMBEDDING_BATCH_SIZE": 4, "EMBEDDING_MAX_TOKENS": 4096}
+    assert settings.EMBEDDING_THREADS == 0
+
+def test_embedding_service_batches_concurrent_clients(tmp_path):
+    """Clients get their own rows over a Unix socket or TCP, concurrent requests share forward passes"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from src.embedder import create_embedder
+    from src.embedding_service import EmbeddingServer, MicroBatcher, load_report
+
+    def embed(texts):
+        if "bad" in texts:
+            raise RuntimeError("model failure")
+        time.sleep(0.02)  # Fixed cost of a forward pass, whatever the batch size
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+    embedder = Mock(spec=["embed", "model_id", "max_length"])
+    embedder.model_id = "fake-model"
+    embedder.max_length = 512
+    embedder.embed.side_effect = embed
+
+    for address in [f"unix:{tmp_path / 'embed.sock'}", "127.0.0.1:0"]:
+        server = EmbeddingServer(embedder, address, max_batch=64, max_wait=0.01).start()
+        try:
+            client = create_embedder(service=server.address)
+            assert (client.model_id, client.max_length) == ("fake-model", 512)
+            np.testing.assert_array_equal(client.embed(["a", "abc"]), [[1, 1], [3, 1]])
+            assert client.embed([]).shape[0] == 0
+            with pytest.raises(RuntimeError, match="model failure"):
+                client.embed(["bad"])
+
+            calls = embedder.embed.call_count
+            texts = ["x" * n for n in range(1, 33)]
+            with ThreadPoolExecutor(16) as pool:
+                rows = list(pool.map(lambda text: client.embed([text])[0], texts))
+            np.testing.assert_array_equal(rows, [[len(t), 1] for t in texts])
+            assert embedder.embed.call_count - calls < len(texts) / 2
+        finally:
+            server.close()
+
+    # A bad input coalesced with others fails alone
+    batcher = MicroBatcher(embedder, max_batch=64, max_wait=0.2)
+    try:
+        futures = [batcher.submit(texts) for texts in (["ok"], ["bad"], ["fine", "x"])]
+        np.testing.assert_array_equal(futures[0].result(5), [[2, 1]])
+        with pytest.raises(RuntimeError, match="model failure"):
+            futures[1].result(5)
+        np.testing.assert_array_equal(futures[2].result(5), [[4, 1], [1, 1]])
+    finally:
+        batcher.close()
+
+    server = EmbeddingServer(embedder, "127.0.0.1:0", max_batch=64, max_wait=0.01).start()
+    try:
+        report = load_report(create_embedder(service=server.address), ["y"] * 32, concurrency=16)
+        assert report["speedup"] > 2
+    finally:
+        server.close()
+
+def test_lexical_index_finds_copies(tmp_path):
+    """Copies with other comments, strings and whitespace rank first; rows are appended and deleted rows left out"""
+    from src.lexical_index import LexicalIndex, read_header, update_index
+
+    sources = {
+        "sort.py": "def bubble(items):\n    for i in range(len(items)):\n        for j in range(len(items) - 1):\n"
+                   "            if items[j] > items[j + 1]:\n                items[j], items[j + 1] = items[j + 1], items[j]\n",
+        "fetch.js": "async function fetchUser(id) {\n  const res = await fetch('/api/users/' + id);\n  return res.json();\n}\n",
+        "Sum.java": "public class Sum { public static int total(int[] xs) { int t = 0; for (int x : xs) t += x; return t; } }\n"
+    }
+    for name, text in sources.items():
+        (tmp_path / name).write_text(text)
+    metadata = [{"file_path": str(tmp_path / name)} for name in sources]
+    reads = []
+    def read(path):
+        reads.append(path)
+        return (tmp_path / path).read_text()
+
+    directory = str(tmp_path / "lexical")
+    assert update_index(directory, metadata, read, ngram=3, features=2 ** 16) == 3
+    index = LexicalIndex.open(directory)
+    copy = ("def   bubble(items):  # sorts in place\n    for i in range(len(items)):\n"
+            "        for j in range(len(items) - 1):\n            if items[j] > items[j + 1]:\n"
+            "                items[j], items[j + 1] = items[j + 1], items[j]")
+    hits = index.search(copy, top_k=2)
+    assert hits[0][0] == 0 and hits[0][1] > 0.99
+    assert index.search("const res = await fetch(\"/api/other/\" + id);")[0][0] == 1
+    assert index.search("zzz") == []
+
+    # An incremental run appends one row and tombstones the Java file
+    (tmp_path / "Sum2.java").write_text(sources["Sum.java"])
+    metadata[2]["deleted"] = True
+    metadata.append({"file_path": str(tmp_path / "Sum2.java")})
+    reads.clear()
+    assert update_index(directory, metadata, read, ngram=3, features=2 ** 16) == 1
+    assert reads == [str(tmp_path / "Sum2.java")] and read_header(directory)["rows"] == 4
+    index = LexicalIndex.open(directory, rows=[0, 1, 3])
+    assert len(index) == 3
+    assert [row for row, _ in index.search(sources["Sum.java"])] == [3]
+
+    # Counts taken while the files were embedded are used instead of reading them again
+    from scipy import sparse
+    from src.lexical_index import MATRIX_FILE, ContentCounts
+    known = ContentCounts(ngram=3, features=2 ** 16)
+    for meta in metadata:
+        meta["file_hash"] = Path(meta["file_path"]).name
+        known.add(meta["file_hash"], Path(meta["file_path"]).read_text())
+    reads.clear()
+    rebuilt = tmp_path / "rebuilt"
+    assert update_index(str(rebuilt), metadata, read, ngram=3, features=2 ** 16, known=known) == 4
+    assert reads == []
+    expected = sparse.load_npz(Path(directory) / MATRIX_FILE)[[0, 1, 3]].toarray()
+    counts = sparse.load_npz(rebuilt / MATRIX_FILE).toarray()
+    np.testing.assert_array_equal(counts[[0, 1, 3]], expected)
+    assert not counts[2].any()
+
+def test_scanner_prunes_and_rejects(tmp_path):
+    """CodeScanner honours .gitignore and skips generated, minified and binary files"""
+    from src.scanner import CodeScanner
+
+    repo = tmp_path / "repo"
+    (repo / "src").mkdir(parents=True)
+    (repo / "build").mkdir()
+    (repo / "node_modules").mkdir()
+    (repo / ".gitignore").write_text("build/\n*.tmp.py\n/secret.py\n!keep.tmp.py\n")
+    (repo / "src" / ".gitignore").write_text("local_*.py\n")
+    files = {
+        "main.py": "print('main')\n",
+        "secret.py": "x = 1\n",
+        "src/secret.py": "only the root one is ignored\n",
+        "src/util.py": "def util(): pass\n",
+        "src/local_settings.py": "DEBUG = True\n",
+        "src/scratch.tmp.py": "tmp\n",
+        "src/keep.tmp.py": "kept\n",
+        "src/app.min.js": "var a=1;\n",
+        "src/messages_pb2.py": "# proto\n",
+        "src/gen.py": "# @generated by tool\nx = 1\n",
+        "src/long.js": "var x = 1;" * 200 + "\n",
+        "build/out.py": "built\n",
+        "node_modules/dep.js": "dep\n",
+    }
+    for rel, content in files.items():
+        (repo / rel).write_text(content)
+    (repo / "src" / "blob.py").write_bytes(b"abc\0def")
+
+    scanner = CodeScanner(extensions=[".py", ".js"], ignore_dirs=["node_modules"], max_size=100000)
+    records = list(scanner.scan(str(tmp_path)))
+    assert [r['relative_path'] for r in records] == [
+        "main.py", "src/keep.tmp.py", "src/secret.py", "src/util.py"
+    ]
+    assert all(r['repo'] == "repo" and r['size'] > 0 and r['mtime'] > 0 for r in records)
+
+    # Parallel walks yield the same records in the same order
+    parallel = CodeScanner(extensions=[".py", ".js"], ignore_dirs=["node_modules"], max_size=100000, workers=4)
+    assert list(parallel.scan(str(tmp_path))) == records
+
+    # Files the caller knows unchanged are not opened for the content check
+    opened = []
+    original = CodeScanner._looks_like_source
+    with patch.object(CodeScanner, "_looks_like_source",
+                      side_effect=lambda path: opened.append(path) or original(path)):
+        known = {r['path']: (r['size'], r['mtime']) for r in records if r['relative_path'] != "main.py"}
+        rescanned = list(scanner.scan(str(tmp_path), lambda path, size, mtime: known.get(path) == (size, mtime)))
+    assert rescanned == records
+    assert str(repo / "main.py") in opened
+    assert not set(known) & set(opened)
+
+    # A single path, as the incremental update checks it, gets the same verdict as the walk
+    from src.code_finder import CodeFinder
+    finder = CodeFinder(str(tmp_path), extensions=[".py", ".js"], ignore_dirs=["node_modules"], max_size=100000)
+    candidates = list(files) + ["src/blob.py", "missing.py"]
+    assert sorted(rel for rel in candidates if finder.is_code_file(str(repo / rel))) == sorted(
+        r['relative_path'] for r in records
+    )
+    assert not finder.is_code_file(str(tmp_path.parent / "main.py"))
+
+def _git_repo_without_checkout(tmp_path, files):
+    """Commit files in a scratch repo and clone it without a working tree"""
+    import subprocess
+    work = tmp_path / "work"
+    work.mkdir()
+    for rel, content in files.items():
+        path = work / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    run = lambda *args, cwd=work: subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+    run("init", "-q", "-b", "main")
+    run("add", "-A")
+    run("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "init")
+    repos_dir = tmp_path / "repositories"
+    repos_dir.mkdir()
+    run("clone", "-q", "--no-checkout", str(work), str(repos_dir / "my_repo"), cwd=tmp_path)
+    return repos_dir
+
+def test_git_tree_source_reads_objects(tmp_path):
+    """GitTreeSource lists and reads code files without a checkout"""
+    from src.git_source import GitTreeSource
+
+    repos_dir = _git_repo_without_checkout(tmp_path, {
+        "main.py": "def main(): pass\n",
+        "pkg/copy.py": "def main(): pass\n",
+        "pkg/big.py": "x = 1\n" * 100,
+        "notes.txt": "not code",
+        "node_modules/dep.py": "ignored = True\n",
+    })
+    assert not (repos_dir / "my_repo" / "main.py").exists()
+
+    source = GitTreeSource(str(repos_dir), extensions=[".py"], ignore_dirs=["node_modules"], max_size=100)
+    files = sorted(source.find_all_code_files(), key=lambda f: f['relative_path'])
+    assert [f['relative_path'] for f in files] == ["main.py", "pkg/copy.py"]
+    assert files[0]['blob_sha'] == files[1]['blob_sha']  # identical content, identical blob
+
+    path = files[1]['path']
+    assert source.is_code_file(path)
+    assert not source.is_code_file(str(repos_dir / "my_repo" / "pkg" / "big.py"))
+    assert source.read_file(path) == "def main(): pass"
+
+    metadata = source.generate_metadata(path)
+    assert metadata["repo_name"] == "my_repo"
+    assert metadata["relative_path"] == "pkg/copy.py"
+    assert metadata["file_hash"] == files[1]['blob_sha']
+    assert metadata["language"] == "Python"
+    assert source.ingest(path) == (metadata, "def main(): pass")
+    source.close()
+
+def test_git_tree_source_reads_from_several_threads(tmp_path):
+    """Concurrent reads each get their own git process instead of sharing one"""
+    from concurrent.futures import ThreadPoolExecutor
+    from src.git_source import GitTreeSource
+
+    files = {f"pkg/m{i}.py": f"value = {i}\n" * 20 for i in range(200)}
+    repos_dir = _git_repo_without_checkout(tmp_path, files)
+    source = GitTreeSource(str(repos_dir), extensions=[".py"], ignore_dirs=[], max_size=10000)
+    paths = [f['path'] for f in source.iter_code_files()]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = pool.map(source.ingest, paths, timeout=60)
+        contents = {metadata["relative_path"]: content for metadata, content in results}
+    assert contents == {rel: text.strip() for rel, text in files.items()}
+    source.close()
     
 if __name__ == "__main__":
     pytest.main(["-v", __file__])
\ No newline at end of file
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 class Settings:
     # GitHub configuration
@@ -21,25 +21,52 @@ class Settings:
     CODE_EXTENSIONS: List[str] = [".py", ".java", ".c", ".cpp", ".js", ".go"]
     MAX_FILE_SIZE: int = 100000  # 100KB
     IGNORE_DIRS: List[str] = ["__pycache__", ".git", "node_modules", "venv"]
+
+    # Cloning
+    CLONE_WORKERS: int = int(os.getenv("CLONE_WORKERS", "4"))
+    CLONE_TIMEOUT: float = float(os.getenv("CLONE_TIMEOUT", "600"))  # Seconds per repository, 0 = no limit
+    # "full" (default, regular clone), "shallow" (latest commit only), "blobless" (contents fetched on checkout),
+    # "sparse" (latest commit, only CODE_EXTENSIONS files fetched and checked out)
+    # or "objects" (latest commit, no working tree; use with the embedder's SOURCE_MODE=git)
+    CLONE_MODE: str = os.getenv("CLONE_MODE", "full")
+    # Share git objects between clones (forks of the same template) through a
+    # bare cache repository; maintain it with `main.py --maintain-cache`
+    USE_OBJECT_CACHE: bool = os.getenv("USE_OBJECT_CACHE", "false").lower() == "true"
     
     # Storage paths - now under data directory
     DATA_ROOT: str = "data"
     REPOS_DIR: str = "repositories"  # Now relative to DATA_ROOT
+    MANIFEST_DIR: str = "manifests"  # Change manifest shared with the code embedder
+    OBJECT_CACHE_DIR: str = "object_cache.git"  # Shared git objects, relative to DATA_ROOT
 
     def __init__(self):
         """Initialize required directories"""
         # Create full paths
         self._data_path = Path(self.DATA_ROOT)
         self._repos_path = self._data_path / self.REPOS_DIR
+        self._manifest_path = self._data_path / self.MANIFEST_DIR
         
         # Create directories
         self._data_path.mkdir(parents=True, exist_ok=True)
         self._repos_path.mkdir(parents=True, exist_ok=True)
+        self._manifest_path.mkdir(parents=True, exist_ok=True)
 
     @property
     def repos_root(self) -> str:
         """Get the full path to the repositories directory"""
         return str(self._repos_path)
 
+    @property
+    def object_cache_root(self) -> Optional[str]:
+        """Get the full path to the shared object cache, None when disabled"""
+        if not self.USE_OBJECT_CACHE:
+            return None
+        return str(self._data_path / self.OBJECT_CACHE_DIR)
+
+    @property
+    def manifest_root(self) -> str:
+        """Get the full path to the change manifest directory"""
+        return str(self._manifest_path)
+
 # Instantiate settings
 settings = Settings()
\ No newline at end of file
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import argparse
 import logging
 import sys
 from pathlib import Path
@@ -12,6 +13,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def create_getter():
+    """RepoGetter configured from settings"""
+    from src.repo_getter import RepoGetter
+    from config.settings import settings
+
+    return RepoGetter(
+        repos_dir=settings.repos_root,
+        max_workers=settings.CLONE_WORKERS,
+        timeout=settings.CLONE_TIMEOUT or None,
+        clone_mode=settings.CLONE_MODE,
+        code_extensions=settings.CODE_EXTENSIONS,
+        ignore_dirs=settings.IGNORE_DIRS,
+        object_cache=settings.object_cache_root
+    )
+
+def maintain_cache() -> None:
+    """Repack and garbage-collect the shared object cache"""
+    try:
+        sys.path.insert(0, str(Path(__file__).parent))
+        from config.settings import settings
+
+        if not settings.object_cache_root:
+            logger.error("Object cache is disabled, set USE_OBJECT_CACHE=true")
+            sys.exit(1)
+        summary = create_getter().maintain_object_cache()
+        logger.info(
+            f"Cache for {summary['clones']} clones: "
+            f"{summary['cache_bytes_before'] / 1_000_000:.1f} MB -> {summary['cache_bytes_after'] / 1_000_000:.1f} MB"
+        )
+    except Exception as e:
+        logger.error(f"Cache maintenance failed: {e}", exc_info=True)
+        sys.exit(1)
+
 def main() -> List[str]:
     """
     Clone repositories only.
@@ -19,20 +53,43 @@ def main() -> List[str]:
     """
     try:
         sys.path.insert(0, str(Path(__file__).parent))
-        from src.repo_getter import RepoGetter
+        from src.change_tracker import ChangeTracker
         from config.settings import settings
 
         logger.info("Starting repository cloning...")
         
         # Use the correct path from settings
-        getter = RepoGetter(repos_dir=settings.repos_root)  # Changed to use the property
-        cloned_repos = getter.clone_repos(settings.REPOSITORIES)
+        getter = create_getter()
+        results = getter.clone_all(settings.REPOSITORIES)
+        for result in results:
+            if result.success:
+                logger.info(
+                    f"{result.action} {result.url}: ok in {result.duration:.2f}s "
+                    f"({result.size_bytes / 1_000_000:.1f} MB on disk)"
+                )
+            else:
+                logger.warning(f"{result.action} {result.url}: failed after {result.duration:.2f}s - {result.error}")
+        cloned_repos = [result.path for result in results if result.success]
         
         if not cloned_repos:
             logger.error("No repositories were cloned successfully")
             return []
 
         logger.info(f"Successfully cloned {len(cloned_repos)} repositories")
+
+        tracker = ChangeTracker(
+            manifest_dir=settings.manifest_root,
+            code_extensions=settings.CODE_EXTENSIONS,
+            ignore_dirs=settings.IGNORE_DIRS
+        )
+        manifest = tracker.write_manifest(cloned_repos)
+        for name, changes in manifest["repos"].items():
+            logger.info(
+                f"{name}: {len(changes['added'])} added, {len(changes['modified'])} modified, "
+                f"{len(changes['deleted'])} deleted, {len(changes['renamed'])} renamed"
+                + (" (full index)" if changes["full"] else "")
+            )
+        logger.info(f"Change manifest written to {tracker.manifest_path}")
         return cloned_repos
         
     except ImportError as e:
@@ -43,4 +100,12 @@ def main() -> List[str]:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clone or update the configured repositories")
+    parser.add_argument("--maintain-cache", action="store_true",
+                        help="Repack and garbage-collect the shared object cache instead of cloning")
+    args = parser.parse_args()
+
+    if args.maintain_cache:
+        maintain_cache()
+    else:
+        main()
\ No newline at end of file
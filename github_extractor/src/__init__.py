@@ -1,4 +1,5 @@
-from .repo_getter import RepoGetter
+from .repo_getter import RepoGetter, CloneResult
 from .file_finder import FileFinder
+from .change_tracker import ChangeTracker
 
-__all__ = ['RepoGetter', 'FileFinder']
\ No newline at end of file
+__all__ = ['RepoGetter', 'CloneResult', 'FileFinder', 'ChangeTracker']
\ No newline at end of file
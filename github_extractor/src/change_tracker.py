@@ -0,0 +1,139 @@
+import json
+import logging
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional
+from git import Git
+from git.exc import GitError
+
+logger = logging.getLogger(__name__)
+
+class ChangeTracker:
+    """
+    Writes a manifest of the code files that changed in each repository since
+    the commit that was last indexed by the code embedder.
+
+    The embedder owns index_state.json (repo name -> last indexed commit) and
+    updates it after applying the manifest; the extractor only reads it.
+    """
+    MANIFEST_FILE = "changes.json"
+    STATE_FILE = "index_state.json"
+
+    def __init__(
+        self,
+        manifest_dir: str,
+        code_extensions: List[str],
+        ignore_dirs: Optional[List[str]] = None
+    ):
+        self.manifest_dir = Path(manifest_dir)
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        self.code_extensions = code_extensions
+        self.ignore_dirs = set(ignore_dirs or [])
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.manifest_dir / self.MANIFEST_FILE
+
+    @property
+    def state_path(self) -> Path:
+        return self.manifest_dir / self.STATE_FILE
+
+    def load_state(self) -> Dict[str, str]:
+        """Last indexed commit per repository name"""
+        if not self.state_path.exists():
+            return {}
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def write_manifest(self, repo_paths: List[str]) -> Dict:
+        """Diff every repository against its last indexed commit and save the manifest"""
+        state = self.load_state()
+        repos = {}
+        for repo_path in repo_paths:
+            name = Path(repo_path).name
+            try:
+                repos[name] = self.repo_changes(Path(repo_path), state.get(name))
+            except GitError as e:
+                logger.error(f"Could not compute changes for {name}: {str(e)}")
+
+        manifest = {
+            "generated_at": datetime.now().isoformat(),
+            "repos": repos
+        }
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        return manifest
+
+    def repo_changes(self, repo_path: Path, base_commit: Optional[str]) -> Dict:
+        """Code files added, modified, deleted and renamed between base_commit and HEAD"""
+        git = Git(str(repo_path))
+        head_commit = git.rev_parse("HEAD")
+        changes = {
+            "base_commit": base_commit,
+            "head_commit": head_commit,
+            "full": False,
+            "added": [],
+            "modified": [],
+            "deleted": [],
+            "renamed": []
+        }
+
+        if base_commit is None or not self._has_commit(git, base_commit):
+            # Never indexed, or the old commit is gone: every code file is new
+            changes["base_commit"] = None
+            changes["full"] = True
+            changes["added"] = [
+                path for path in git.ls_tree("-r", "--name-only", "-z", "HEAD").split("\0")
+                if path and self._is_code_path(path)
+            ]
+            return changes
+
+        if base_commit == head_commit:
+            return changes
+
+        pathspecs = [f"*{ext}" for ext in self.code_extensions]
+        output = git.diff("--name-status", "-z", "-M", base_commit, head_commit, "--", *pathspecs)
+        fields = [field for field in output.split("\0") if field]
+        i = 0
+        while i < len(fields):
+            status = fields[i]
+            if status[0] in "RC":
+                old_path, new_path = fields[i + 1], fields[i + 2]
+                i += 3
+                old_ok, new_ok = self._is_code_path(old_path), self._is_code_path(new_path)
+                if status[0] == "R" and old_ok and new_ok:
+                    changes["renamed"].append({"from": old_path, "to": new_path})
+                else:
+                    if status[0] == "R" and old_ok:
+                        changes["deleted"].append(old_path)
+                    if new_ok:
+                        changes["added"].append(new_path)
+                continue
+
+            path = fields[i + 1]
+            i += 2
+            if not self._is_code_path(path):
+                continue
+            if status == "A":
+                changes["added"].append(path)
+            elif status == "D":
+                changes["deleted"].append(path)
+            else:  # M, T (type change)
+                changes["modified"].append(path)
+        return changes
+
+    def _is_code_path(self, path: str) -> bool:
+        """Same extension and directory rules the file finders apply"""
+        pure = PurePosixPath(path)
+        return (
+            pure.suffix in self.code_extensions and
+            not any(part in self.ignore_dirs for part in pure.parts[:-1])
+        )
+
+    @staticmethod
+    def _has_commit(git: Git, commit: str) -> bool:
+        try:
+            git.cat_file("-e", f"{commit}^{{commit}}")
+            return True
+        except GitError:
+            return False
@@ -1,52 +1,273 @@
 import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
-from git import Repo
+from typing import Dict, List, Optional
+from git import Git
 from git.exc import GitError
 import logging
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class CloneResult:
+    """Outcome of cloning or updating a single repository"""
+    url: str
+    path: Optional[str]
+    action: str  # "clone" or "update"
+    success: bool
+    duration: float
+    size_bytes: int = 0
+    error: Optional[str] = None
+
 class RepoGetter:
-    def __init__(self, repos_dir: str = "repositories"):
+    # full: complete history and checkout
+    # shallow: only the latest commit
+    # blobless: complete history, file contents are fetched only when checked out
+    # sparse: latest commit, only files matching code_extensions are fetched and checked out
+    # objects: latest commit without a working tree, for indexing straight from git objects
+    CLONE_MODES = ("full", "shallow", "blobless", "sparse", "objects")
+
+    def __init__(
+        self,
+        repos_dir: str = "repositories",
+        max_workers: int = 1,
+        timeout: Optional[float] = None,
+        clone_mode: str = "full",
+        code_extensions: Optional[List[str]] = None,
+        ignore_dirs: Optional[List[str]] = None,
+        object_cache: Optional[str] = None
+    ):
+        if clone_mode not in self.CLONE_MODES:
+            raise ValueError(f"Unknown clone mode '{clone_mode}', expected one of {self.CLONE_MODES}")
+        if clone_mode == "sparse" and not code_extensions:
+            raise ValueError("Sparse clone mode requires code_extensions")
+
         self.repos_dir = Path(repos_dir)
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout  # Per-repository limit in seconds, None = no limit
+        self.clone_mode = clone_mode
+        self.code_extensions = code_extensions or []
+        self.ignore_dirs = ignore_dirs or []
         os.makedirs(self.repos_dir, exist_ok=True)
         logger.info(f"Ensured repositories directory exists at: {self.repos_dir}")
 
+        # Optional bare repository holding the objects of every cloned repository.
+        # Clones borrow from it through git alternates, so content shared by
+        # forks is downloaded and stored once.
+        self.object_cache = Path(object_cache).absolute() if object_cache else None
+        self._cache_lock = threading.Lock()
+        if self.object_cache and not self.object_cache.exists():
+            self.object_cache.parent.mkdir(parents=True, exist_ok=True)
+            Git(str(self.object_cache.parent)).execute(["git", "init", "-q", "--bare", str(self.object_cache)])
+            logger.info(f"Created shared object cache at: {self.object_cache}")
+
 
     def clone_repo(self, repo_url: str) -> Optional[str]:
         """Clone or update a single repository"""
+        result = self.clone_or_update(repo_url)
+        return result.path if result.success else None
+
+    def clone_repos(self, repo_urls: List[str]) -> List[str]:
+        """Clone multiple repositories with progress feedback"""
+        return [result.path for result in self.clone_all(repo_urls)
+                if result.success]
+
+    def clone_all(self, repo_urls: List[str], max_workers: Optional[int] = None) -> List[CloneResult]:
+        """
+        Clone or update repositories using a bounded pool of workers.
+        Results are returned in the same order as repo_urls.
+        """
+        workers = min(max_workers or self.max_workers, max(1, len(repo_urls)))
+        if workers == 1:
+            return [self.clone_or_update(url) for url in repo_urls]
+
+        logger.info(f"Cloning {len(repo_urls)} repositories with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clone") as pool:
+            return list(pool.map(self.clone_or_update, repo_urls))
+
+    def clone_or_update(self, repo_url: str) -> CloneResult:
+        """Clone or update a single repository and report what happened"""
+        repo_name = self._extract_repo_name(repo_url)
+        repo_path = self.repos_dir / repo_name
+        action = "update" if repo_path.exists() else "clone"
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        start = time.perf_counter()
+
         try:
-            logger.info(f"Attempting to clone/update repository from URL: {repo_url}")
-     
-            repo_name = self._extract_repo_name(repo_url)
-            repo_path = self.repos_dir / repo_name
-            
-            if repo_path.exists():
-                self._update_repo(repo_path)
+            logger.info(f"Attempting to {action} repository from URL: {repo_url}")
+            if action == "update":
+                self._update_repo(repo_path, deadline)
             else:
-                logger.info(f"Cloning repository from: {repo_url} to: {repo_path}")
-                Repo.clone_from(repo_url, str(repo_path))
-                logger.info(f"Successfully cloned repository from {repo_url} to {repo_path}.")
+                self._clone_new(repo_url, repo_path, deadline)
+            result = CloneResult(
+                url=repo_url,
+                path=str(repo_path),
+                action=action,
+                success=True,
+                duration=time.perf_counter() - start,
+                size_bytes=self._dir_size(repo_path)
+            )
+            logger.info(f"Finished {action} of {repo_name} in {result.duration:.2f}s")
+            return result
 
-                
-            return str(repo_path)
-            
-        except GitError as e:
-            print(f"Failed to clone {repo_url}: {str(e)}")
-            return None
+        except (GitError, OSError) as e:
+            if action == "clone" and repo_path.exists():
+                # Never leave a half-written clone behind, the next run would try to pull it
+                shutil.rmtree(repo_path, ignore_errors=True)
+            logger.error(f"Failed to {action} {repo_url}: {str(e)}")
+            return CloneResult(
+                url=repo_url,
+                path=None,
+                action=action,
+                success=False,
+                duration=time.perf_counter() - start,
+                error=str(e)
+            )
 
-    def clone_repos(self, repo_urls: List[str]) -> List[str]:
-        """Clone multiple repositories with progress feedback"""
-        return [path for url in repo_urls 
-               if (path := self.clone_repo(url)) is not None]
+    def _clone_new(self, repo_url: str, repo_path: Path, deadline: Optional[float]):
+        """Clone a repository that does not exist locally yet"""
+        logger.info(f"Cloning repository from: {repo_url} to: {repo_path} ({self.clone_mode} mode)")
+        reference = []
+        if self.object_cache:
+            self._fetch_into_cache(repo_url, deadline)
+            reference = ["--reference", str(self.object_cache)]
+        self._git(
+            ["clone", *self._clone_args(), *reference, repo_url, str(repo_path.absolute())],
+            self.repos_dir,
+            deadline
+        )
+        if self.clone_mode == "sparse":
+            self._apply_sparse_checkout(repo_path, deadline)
+            self._git(["checkout"], repo_path, deadline)
+
+    def _clone_args(self) -> List[str]:
+        """Extra `git clone` options for the configured clone mode"""
+        return {
+            "full": [],
+            "shallow": ["--depth", "1"],
+            "blobless": ["--filter=blob:none"],
+            # Nothing is checked out until the sparse patterns are set, so only
+            # the blobs of matching files are ever downloaded
+            "sparse": ["--depth", "1", "--filter=blob:none", "--no-checkout"],
+            "objects": ["--depth", "1", "--no-checkout"],
+        }[self.clone_mode]
+
+    def _sparse_patterns(self) -> List[str]:
+        """Non-cone sparse-checkout patterns selecting code files outside ignored dirs"""
+        patterns = [f"*{ext}" for ext in self.code_extensions]
+        patterns += [f"!**/{directory}/**" for directory in self.ignore_dirs]
+        return patterns
+
+    def _apply_sparse_checkout(self, repo_path: Path, deadline: Optional[float]):
+        """Restrict the working tree to code files"""
+        self._git(
+            ["sparse-checkout", "set", "--no-cone", *self._sparse_patterns()],
+            repo_path,
+            deadline
+        )
 
     def _extract_repo_name(self, repo_url: str) -> str:
         """Extract repository name from URL"""
-        return repo_url.split('/')[-1].replace('.git', '')
+        return repo_url.rstrip('/').split('/')[-1].replace('.git', '')
 
-    def _update_repo(self, repo_path: Path):
+    def _update_repo(self, repo_path: Path, deadline: Optional[float] = None):
         """Pull latest changes for existing repository"""
-        print(f"Updating {repo_path.name}...")
-        repo = Repo(str(repo_path))
-        repo.remotes.origin.pull()
\ No newline at end of file
+        logger.info(f"Updating {repo_path.name}...")
+        if self.object_cache and self._uses_cache(repo_path):
+            remote_url = self._git(["remote", "get-url", "origin"], repo_path, deadline)
+            self._fetch_into_cache(remote_url, deadline)
+        if self.clone_mode in ("full", "blobless"):
+            self._git(["pull"], repo_path, deadline)
+            return
+
+        # Shallow histories cannot always be merged, so move straight to the remote tip
+        if self.clone_mode == "sparse":
+            self._apply_sparse_checkout(repo_path, deadline)
+        self._git(["fetch", "--depth", "1", "origin"], repo_path, deadline)
+        # Without a working tree only the branch needs to move
+        reset_mode = "--soft" if self.clone_mode == "objects" else "--hard"
+        self._git(["reset", reset_mode, "FETCH_HEAD"], repo_path, deadline)
+
+    def maintain_object_cache(self) -> Dict:
+        """
+        Repack and garbage-collect the shared object cache.
+
+        Every clone's HEAD is first recorded in the cache, so nothing a clone
+        still borrows can be pruned. Afterwards each clone drops its local copies
+        of objects that the cache now holds.
+        """
+        if not self.object_cache:
+            raise ValueError("No object cache configured")
+
+        size_before = self._dir_size(self.object_cache)
+        clones = [
+            path for path in sorted(self.repos_dir.iterdir())
+            if path.is_dir() and self._uses_cache(path)
+        ]
+        with self._cache_lock:
+            for clone in clones:
+                self._git(
+                    ["fetch", "--quiet", "--no-tags", "--update-shallow", str(clone.absolute()),
+                     f"+HEAD:refs/clones/{clone.name}"],
+                    self.object_cache,
+                    None
+                )
+            self._git(["gc", "--quiet", "--prune=now"], self.object_cache, None)
+
+        for clone in clones:
+            # -l skips objects available through alternates, -d drops the old packs
+            self._git(["repack", "-a", "-d", "-l", "-q"], clone, None)
+            self._git(["prune-packed"], clone, None)
+
+        summary = {
+            "clones": len(clones),
+            "cache_bytes_before": size_before,
+            "cache_bytes_after": self._dir_size(self.object_cache),
+        }
+        logger.info(f"Object cache maintenance done: {summary}")
+        return summary
+
+    def _fetch_into_cache(self, repo_url: str, deadline: Optional[float]):
+        """Fetch a repository's branches into the shared cache, transferring only new objects"""
+        namespace = re.sub(r"[^A-Za-z0-9._-]+", "_", repo_url.split("://")[-1]).strip("_")
+        depth = ["--depth", "1"] if self.clone_mode in ("shallow", "sparse", "objects") else []
+        # Fetches are serialised: a fork fetched after its template only
+        # receives the objects the template does not have
+        with self._cache_lock:
+            self._git(
+                ["fetch", "--quiet", "--no-tags", *depth, repo_url,
+                 f"+refs/heads/*:refs/remotes/{namespace}/*"],
+                self.object_cache,
+                deadline
+            )
+
+    def _uses_cache(self, repo_path: Path) -> bool:
+        """Whether a clone borrows objects from the shared cache"""
+        alternates = repo_path / ".git" / "objects" / "info" / "alternates"
+        return alternates.exists() and str(self.object_cache / "objects") in alternates.read_text()
+
+    def _git(self, args: List[str], cwd: Path, deadline: Optional[float]) -> str:
+        """Run a git command, killing it once the repository deadline has passed"""
+        kill_after = None
+        if deadline is not None:
+            kill_after = deadline - time.monotonic()
+            if kill_after <= 0:
+                raise GitError(f"Timed out before running: git {' '.join(args)}")
+        return Git(str(cwd)).execute(["git", *args], kill_after_timeout=kill_after)
+
+    @staticmethod
+    def _dir_size(path: Path) -> int:
+        """Total size in bytes of all files below path"""
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    continue
+        return total
@@ -1,4 +1,6 @@
+import json
 import os
+import subprocess
 import sys
 import pytest
 from pathlib import Path
@@ -7,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.repo_getter import RepoGetter
+from src.change_tracker import ChangeTracker
 from config.settings import settings
 
 @pytest.fixture
@@ -33,6 +36,232 @@ def test_github_cloning(cloned_repos):
         assert str(Path(path).parent.parent) == str(Path(settings.DATA_ROOT).resolve()), \
                "Repository not stored in data directory"
 
+def _git(cwd, *args):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+def _make_remote(root: Path, name: str, files: dict) -> str:
+    """Create a bare repository with one commit and return its file:// URL"""
+    work = root / f"{name}-work"
+    work.mkdir(parents=True)
+    _git(work, "init", "-q", "-b", "main")
+    for rel, content in files.items():
+        path = work / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    _git(work, "add", "-A")
+    _git(work, "-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "init")
+    bare = root / f"{name}.git"
+    _git(root, "clone", "-q", "--bare", str(work), str(bare))
+    # Let partial clones request filtered packs, as GitHub does
+    _git(bare, "config", "uploadpack.allowFilter", "true")
+    return bare.as_uri()
+
+def _push_commit(remote_url: str, files: dict):
+    """Commit files in the remote's work tree and push them to the bare remote"""
+    bare = Path(remote_url[len("file://"):])
+    work = bare.parent / bare.name.replace(".git", "-work")
+    for rel, content in files.items():
+        path = work / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    _git(work, "add", "-A")
+    _git(work, "-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "-q", "-m", "update")
+    _git(work, "push", "-q", str(bare), "main")
+
+@pytest.fixture
+def local_remotes(tmp_path):
+    """Three local file:// remotes so cloning can be tested offline"""
+    remotes_dir = tmp_path / "remotes"
+    return [
+        _make_remote(remotes_dir, f"repo{i}", {"main.py": f"print({i})\n", "src/util.js": "let x = 1;\n"})
+        for i in range(3)
+    ]
+
+def test_parallel_clone_local_remotes(tmp_path, local_remotes):
+    """Parallel mode clones every remote and reports per-repo results in input order"""
+    getter = RepoGetter(repos_dir=str(tmp_path / "repos"), max_workers=3, timeout=60)
+    results = getter.clone_all(local_remotes)
+
+    assert [r.url for r in results] == local_remotes
+    for i, result in enumerate(results):
+        assert result.success, result.error
+        assert result.action == "clone"
+        assert result.size_bytes > 0
+        assert result.duration >= 0
+        assert (Path(result.path) / "main.py").read_text() == f"print({i})\n"
+
+    # A second run updates the existing checkouts instead of cloning again
+    updated = getter.clone_all(local_remotes)
+    assert all(r.success and r.action == "update" for r in updated)
+
+def test_clone_failure_is_reported(tmp_path, local_remotes):
+    """A broken remote yields a failed result without stopping the others"""
+    getter = RepoGetter(repos_dir=str(tmp_path / "repos"), max_workers=2)
+    missing = (tmp_path / "remotes" / "missing.git").as_uri()
+    results = getter.clone_all([missing, local_remotes[0]])
+
+    assert not results[0].success
+    assert results[0].error
+    assert not (tmp_path / "repos" / "missing").exists()
+    assert results[1].success
+    assert getter.clone_repos([missing, local_remotes[0]]) == [results[1].path]
+
+def test_sparse_clone_only_checks_out_code(tmp_path):
+    """Sparse mode fetches one commit and checks out only code files outside ignored dirs"""
+    remote = _make_remote(tmp_path / "remotes", "mixed", {
+        "app.py": "print('app')\n",
+        "docs/manual.md": "# manual\n",
+        "assets/logo.bin": "\x00" * 5000,
+        "node_modules/lib/index.js": "module.exports = 1;\n",
+        "web/index.js": "console.log(1);\n",
+    })
+    _push_commit(remote, {"app.py": "print('app v2')\n"})
+    getter = RepoGetter(
+        repos_dir=str(tmp_path / "repos"),
+        clone_mode="sparse",
+        code_extensions=[".py", ".js"],
+        ignore_dirs=["node_modules"]
+    )
+    result = getter.clone_or_update(remote)
+    assert result.success, result.error
+
+    repo_path = Path(result.path)
+    checked_out = sorted(
+        str(p.relative_to(repo_path)) for p in repo_path.rglob("*")
+        if p.is_file() and ".git" not in p.parts
+    )
+    assert checked_out == ["app.py", "web/index.js"]
+    log = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=repo_path, capture_output=True, text=True)
+    assert log.stdout.strip() == "1"
+
+    # Updates move to the new remote tip and keep the sparse patterns
+    _push_commit(remote, {"app.py": "print('app v3')\n", "docs/more.md": "more\n"})
+    updated = getter.clone_or_update(remote)
+    assert updated.success, updated.error
+    assert (repo_path / "app.py").read_text() == "print('app v3')\n"
+    assert not (repo_path / "docs").exists()
+
+def test_shallow_clone_has_single_commit(tmp_path):
+    """Shallow mode keeps only the latest commit"""
+    remote = _make_remote(tmp_path / "remotes", "history", {"a.py": "1\n"})
+    _push_commit(remote, {"a.py": "2\n"})
+    getter = RepoGetter(repos_dir=str(tmp_path / "repos"), clone_mode="shallow")
+    result = getter.clone_or_update(remote)
+
+    assert result.success, result.error
+    log = subprocess.run(["git", "rev-list", "--count", "HEAD"], cwd=result.path, capture_output=True, text=True)
+    assert log.stdout.strip() == "1"
+    assert (Path(result.path) / "a.py").read_text() == "2\n"
+
+def test_objects_clone_has_no_working_tree(tmp_path):
+    """Objects mode keeps the latest commit in git objects only"""
+    remote = _make_remote(tmp_path / "remotes", "objects", {"a.py": "1\n"})
+    getter = RepoGetter(repos_dir=str(tmp_path / "repos"), clone_mode="objects")
+    result = getter.clone_or_update(remote)
+    assert result.success, result.error
+    assert not (Path(result.path) / "a.py").exists()
+
+    _push_commit(remote, {"a.py": "2\n"})
+    assert getter.clone_or_update(remote).success
+    content = subprocess.run(["git", "show", "HEAD:a.py"], cwd=result.path, capture_output=True, text=True)
+    assert content.stdout == "2\n"
+    assert not (Path(result.path) / "a.py").exists()
+
+def _local_object_count(repo_path) -> int:
+    out = subprocess.run(["git", "count-objects", "-v"], cwd=repo_path, capture_output=True, text=True).stdout
+    counts = dict(line.split(": ") for line in out.splitlines())
+    return int(counts["count"]) + int(counts["in-pack"])
+
+def test_object_cache_shared_by_forks(tmp_path):
+    """Forks borrow objects from the shared cache and survive its maintenance"""
+    template = _make_remote(tmp_path / "remotes", "template", {
+        f"src/module{i}.py": f"def f{i}():\n    return {i}\n" for i in range(20)
+    })
+    fork_bare = tmp_path / "remotes" / "fork.git"
+    _git(tmp_path, "clone", "-q", "--bare", template, str(fork_bare))
+    _git(tmp_path, "clone", "-q", str(fork_bare), str(tmp_path / "remotes" / "fork-work"))
+    fork = fork_bare.as_uri()
+    _push_commit(fork, {"src/extra.py": "print('fork')\n"})
+
+    cache = tmp_path / "object_cache.git"
+    getter = RepoGetter(repos_dir=str(tmp_path / "repos"), max_workers=2, object_cache=str(cache))
+    results = getter.clone_all([template, fork])
+    assert all(r.success for r in results), [r.error for r in results]
+
+    for result in results:
+        alternates = Path(result.path) / ".git" / "objects" / "info" / "alternates"
+        assert str(cache / "objects") in alternates.read_text()
+        assert _local_object_count(result.path) == 0
+    assert (Path(results[1].path) / "src" / "extra.py").exists()
+
+    _push_commit(fork, {"src/extra.py": "print('fork v2')\n"})
+    assert getter.clone_or_update(fork).success
+
+    summary = getter.maintain_object_cache()
+    assert summary["clones"] == 2
+    for result in results:
+        fsck = subprocess.run(["git", "fsck", "--connectivity-only"], cwd=result.path, capture_output=True)
+        assert fsck.returncode == 0, fsck.stderr
+    assert (Path(results[1].path) / "src" / "extra.py").read_text() == "print('fork v2')\n"
+
+def test_unknown_clone_mode_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RepoGetter(repos_dir=str(tmp_path), clone_mode="magic")
+
+def test_change_manifest_tracks_code_changes(tmp_path):
+    """The manifest lists every code file first, then only what changed since the indexed commit"""
+    remote = _make_remote(tmp_path / "remotes", "tracked", {
+        "keep.py": "keep\n",
+        "edit.py": "v1\n",
+        "old_name.py": "".join(f"line {i}\n" for i in range(20)),
+        "gone.js": "gone\n",
+        "README.md": "readme\n",
+        "node_modules/dep.js": "dep\n",
+    })
+    getter = RepoGetter(repos_dir=str(tmp_path / "repos"))
+    repo_path = getter.clone_repo(remote)
+    tracker = ChangeTracker(str(tmp_path / "manifests"), code_extensions=[".py", ".js"], ignore_dirs=["node_modules"])
+
+    first = tracker.write_manifest([repo_path])["repos"]["tracked"]
+    assert first["full"] and first["base_commit"] is None
+    assert sorted(first["added"]) == ["edit.py", "gone.js", "keep.py", "old_name.py"]
+
+    # The embedder records the commit it indexed
+    tracker.state_path.write_text(json.dumps({"tracked": first["head_commit"]}))
+    unchanged = tracker.write_manifest([repo_path])["repos"]["tracked"]
+    assert not unchanged["full"]
+    assert unchanged["added"] == unchanged["modified"] == unchanged["deleted"] == unchanged["renamed"] == []
+
+    work = tmp_path / "remotes" / "tracked-work"
+    _git(work, "mv", "old_name.py", "new_name.py")
+    _git(work, "rm", "-q", "gone.js")
+    _push_commit(remote, {"edit.py": "v2\n", "added.go": "package main\n", "README.md": "changed\n"})
+    getter.clone_repo(remote)
+
+    changes = tracker.write_manifest([repo_path])["repos"]["tracked"]
+    assert changes["base_commit"] == first["head_commit"]
+    assert changes["head_commit"] != first["head_commit"]
+    assert changes["added"] == []  # .go is not a tracked extension here
+    assert changes["modified"] == ["edit.py"]
+    assert changes["deleted"] == ["gone.js"]
+    assert changes["renamed"] == [{"from": "old_name.py", "to": "new_name.py"}]
+
+def test_file_finder_uses_embedder_scanner(tmp_path):
+    """FileFinder applies the code embedder's scan filters"""
+    # The project root is on the path in the extractor image
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from src.file_finder import FileFinder
+
+    repo = tmp_path / "repo"
+    (repo / "build").mkdir(parents=True)
+    (repo / ".gitignore").write_text("build/\n")
+    (repo / "main.py").write_text("print('main')\n")
+    (repo / "gen.py").write_text("# @generated\nx = 1\n")
+    (repo / "build" / "out.py").write_text("built\n")
+
+    files = FileFinder(repos_dir=str(tmp_path)).find_code_files("repo")
+    assert [(f['name'], f['relative_path']) for f in files] == [("main.py", "main.py")]
+
 if __name__ == "__main__":
     # Manual test execution
     print("Running cloning tests directly...")
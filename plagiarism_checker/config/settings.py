@@ -19,5 +19,52 @@ class Settings:
         "embeddings",
         "metadata.json"
     )
+    # "torch", "onnx" or "onnx-int8", exports shared with the code embedder
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    EMBEDDING_MODEL = "microsoft/codebert-base"
+    # Running embedding service shared with the code embedder, see
+    # code_embedder/serve_embeddings.py; empty loads the model in the API process
+    EMBEDDING_SERVICE = os.getenv("EMBEDDING_SERVICE", "")
+    # Thread count benchmarked for this hardware, saved by the code embedder
+    # or, with AUTO_CALIBRATE, by the API itself on its first start
+    USE_CALIBRATION = os.getenv("USE_CALIBRATION", "true").lower() == "true"
+    AUTO_CALIBRATE = os.getenv("AUTO_CALIBRATE", "false").lower() == "true"
+    CALIBRATION_PATH = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "data",
+        "calibration.json"
+    )
+    MODELS_DIR = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "data",
+        "models"
+    )
+    # Query embeddings cached by text hash, in the same store the embedder fills
+    USE_EMBEDDING_CACHE = os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "data",
+        "cache",
+        "embedding_cache.db"
+    )
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "2048"))
+    # Lexical first stage: hashed token n-gram index built by the code embedder.
+    # With LEXICAL_SHORTCUT, a candidate at least this similar is returned without
+    # running CodeBERT; its similarity is then the n-gram cosine, not CodeBERT's
+    USE_LEXICAL_PREFILTER = os.getenv("USE_LEXICAL_PREFILTER", "true").lower() == "true"
+    LEXICAL_SHORTCUT = os.getenv("LEXICAL_SHORTCUT", "false").lower() == "true"
+    LEXICAL_SHORTCUT_SIMILARITY = float(os.getenv("LEXICAL_SHORTCUT_SIMILARITY", "0.9"))
+    LEXICAL_INDEX_DIR = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "data",
+        "embeddings",
+        "lexical"
+    )
+    # "chroma" for the HNSW collection, "numpy" for exact in-process search
+    # over the memory-mapped embeddings (vector_db/src/numpy_db.py)
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "chroma")
+    # Exact search matrix stored as float32 or float16, scanned this many rows per matrix product
+    EXACT_DTYPE = os.getenv("EXACT_DTYPE", "float32")
+    EXACT_BLOCK_ROWS = int(os.getenv("EXACT_BLOCK_ROWS", "4096"))
     COLLECTION_NAME = "code_collection"
     INDEX_CONFIG = {"hnsw:space": "cosine"}
\ No newline at end of file
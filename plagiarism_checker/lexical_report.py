@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from plagiarism_checker.src.plagiarism_checker_functions import PlagiarismChecker
+from vector_db.src.chroma_manager import ChromaCodeDB
+
+logger = logging.getLogger(__name__)
+
+def main(samples: int, lines: int, top_k: int, seed: int):
+    """Query both search paths with snippets of indexed files and compare latency and results"""
+    checker = PlagiarismChecker()
+    if checker.lexical is None:
+        logger.error("No usable lexical index, run the code embedder first")
+        return None
+
+    rows = list(checker.lexical.rows)
+    random.Random(seed).shuffle(rows)
+    codes, sources = [], []
+    for row, meta in zip(rows, checker.lexical_metadata.rows(rows[:samples * 2])):
+        # A run of lines from inside the file, as a partial copy would be
+        content = ChromaCodeDB.read_document(meta).splitlines()
+        if len(content) < 3:
+            continue
+        start = random.Random(row).randrange(max(1, len(content) - lines))
+        codes.append("\n".join(content[start:start + lines]))
+        sources.append(meta['file_path'])
+        if len(codes) == samples:
+            break
+    return checker.compare_lexical(codes, top_k, sources)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the lexical index with CodeBERT search")
+    parser.add_argument("--samples", type=int, default=100, help="Number of indexed files to query with")
+    parser.add_argument("--lines", type=int, default=20, help="Lines per query snippet")
+    parser.add_argument("-k", type=int, default=5, help="Results per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = main(args.samples, args.lines, args.k, args.seed)
+    if not report:
+        sys.exit(1)
+    print(json.dumps(report, indent=2))
+    print(f"\nLexical {report['lexical_ms']['mean']:.1f} ms vs CodeBERT {report['embedding_ms']['mean']:.1f} ms per query, "
+          f"recall of CodeBERT's top {report['top_k']}: {report['recall_of_embedding_results']:.2%}")
@@ -12,7 +12,7 @@ from typing import Optional
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from plagiarism_checker.src.plagiarism_checker_functions import PlagiarismChecker
+from plagiarism_checker.src.plagiarism_checker_functions import PlagiarismChecker, summarize_results
 from plagiarism_checker.config.settings import Settings
 from dotenv import load_dotenv
 
@@ -60,6 +60,16 @@ async def root():
                 <input type="submit" value="Check Plagiarism (RAG Only)">
             </form>
             <hr>
+            <h2>Check Plagiarism (Lexical Only)</h2>
+            <form method="post" action="/check_plagiarism_lexical/">
+                <label for="code_lexical">Code to Check:</label><br>
+                <textarea id="code_lexical" name="code" rows="10" cols="80"></textarea><br>
+                <label for="threshold_lexical">Similarity Threshold (0.0 - 1.0):</label>
+                <input type="number" id="threshold_lexical" name="threshold" min="0.0" max="1.0" step="0.01" value="0.8"><br>
+                <input type="hidden" name="check_type" value="Lexical Only">
+                <input type="submit" value="Check Plagiarism (Lexical Only)">
+            </form>
+            <hr>
             <h2>Check Plagiarism (LLM Only)</h2>
             <form method="post" action="/check_plagiarism_llm_only/">
                 <label for="code_llm">Code to Check:</label><br>
@@ -79,19 +89,14 @@ async def root():
 async def check_plagiarism_rag_only(code: str = Form(...), threshold: float = Form(0.8), check_type: str = Form("RAG Only")):
     logging.info(f"Received request for RAG-only plagiarism check with code: {code[:50]}...")
     try:
-        embedding = plagiarism_checker.embedder.embed([code])[0].tolist()
-        results = plagiarism_checker.db.search(embedding, top_k=5)
-        logging.info(f"RAG-only raw search results: {results}")
-        max_similarity = 0.0
-        similar_codes = []
-        if results:
-            for result in results:
-                similarity = result.get('similarity', 0.0)
-                code_snippet = result.get('code', '')
-                file_path = result.get('file_path', '')
-                if code_snippet:
-                    similar_codes.append({"file_path": file_path, "code": code_snippet, "similarity": similarity})
-                    max_similarity = max(max_similarity, similarity)
+        # Code is read only for the top_k matches, not for every candidate
+        results = plagiarism_checker.search(code, top_k=5)
+        logging.info(f"RAG-only raw search results: {summarize_results(results)}")
+        similar_codes = [
+            {"file_path": result['file_path'], "code": result['code'], "similarity": result['similarity']}
+            for result in results if result['code']
+        ]
+        max_similarity = max((match['similarity'] for match in similar_codes), default=0.0)
 
         plagiarism_result = "Not plagiarized (RAG)"
         if max_similarity > threshold:
@@ -111,6 +116,38 @@ async def check_plagiarism_rag_only(code: str = Form(...), threshold: float = Fo
         logging.error(f"Error during RAG-only plagiarism check: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
 
+@app.post("/check_plagiarism_lexical/")
+async def check_plagiarism_lexical(code: str = Form(...), threshold: float = Form(0.8), check_type: str = Form("Lexical Only")):
+    logging.info(f"Received request for lexical plagiarism check with code: {code[:50]}...")
+    if plagiarism_checker.lexical is None:
+        raise HTTPException(status_code=503, detail="Lexical index not available, run the code embedder first")
+    try:
+        results = plagiarism_checker.lexical_search(code, top_k=5)
+        logging.info(f"Lexical raw search results: {summarize_results(results)}")
+        max_similarity = max((result['similarity'] for result in results), default=0.0)
+        similar_codes = [
+            {"file_path": result['file_path'], "code": result['code'], "similarity": result['similarity']}
+            for result in results if result['code']
+        ]
+
+        plagiarism_result = "Not plagiarized (Lexical)"
+        if max_similarity > threshold:
+            plagiarism_result = f"Plagiarized (Lexical similarity: {max_similarity:.2f})"
+
+        CHECK_RESULTS.append({
+            "check_type": check_type,
+            "input_code": code,
+            "result": plagiarism_result,
+            "similarity": max_similarity,
+            "references": None
+        })
+
+        logging.info(f"Lexical check result: {plagiarism_result}")
+        return JSONResponse(content={"input_code": code, "similar_code": similar_codes, "result": plagiarism_result})
+    except Exception as e:
+        logging.error(f"Error during lexical plagiarism check: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
 @app.post("/check_plagiarism_llm_only/")
 async def check_plagiarism_llm_only(code: str = Form(...), check_type: str = Form("LLM Only")):
     logging.info(f"Received request for LLM-only plagiarism check with code: {code[:50]}...")
@@ -145,9 +182,8 @@ async def check_plagiarism_llm_only(code: str = Form(...), check_type: str = For
 async def check_plagiarism_full(code: str = Form(...), check_type: str = Form("Full System")):
     logging.info(f"Received request for full system plagiarism check with code: {code[:50]}...")
     try:
-        embedding = plagiarism_checker.embedder.embed([code])[0].tolist()
-        results = plagiarism_checker.db.search(embedding, top_k=5)
-        logging.info(f"Full system raw search results: {results}")
+        results = plagiarism_checker.search(code, top_k=5)
+        logging.info(f"Full system raw search results: {summarize_results(results)}")
 
         similar_codes_for_llm = []
         if results:
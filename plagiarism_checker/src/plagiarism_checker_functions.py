@@ -1,15 +1,22 @@
 # plagiarism_checker/src/plagiarism_checker_functions.py
 import os
 import sys
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(__file__)), '..')))
 
 from vector_db.src.chroma_manager import ChromaCodeDB
+from vector_db.src.metadata_table import MetadataTable
+from vector_db.src.numpy_db import NumpyCodeDB
 from plagiarism_checker.config.settings import Settings
-from code_embedder.src.embedder import CodeBertEmbedder
+from code_embedder.src.embedder import create_embedder
+from code_embedder.src.calibration import calibrate, embedder_id, load_calibration, save_calibration
+from code_embedder.src.embedding_cache import EmbeddingCache
+from code_embedder.src.lexical_index import LexicalIndex, read_header
 from plagiarism_checker.src.llm_interaction import LLMInteractor
+import hashlib
+import time
 import openai
 from dotenv import load_dotenv
 import logging
@@ -22,23 +29,158 @@ logging.basicConfig(
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+def summarize_results(results: List[Dict]) -> List[Dict]:
+    """File path and similarity of search results, for logging without their metadata"""
+    return [{'file_path': r['file_path'], 'similarity': round(r['similarity'], 4)} for r in results]
+
 class PlagiarismChecker:
     def __init__(self):
-        self.db = ChromaCodeDB()
+        if Settings.SEARCH_BACKEND == "numpy":
+            self.db = NumpyCodeDB(dtype=Settings.EXACT_DTYPE, block_rows=Settings.EXACT_BLOCK_ROWS)
+        else:
+            self.db = ChromaCodeDB()
         db_loaded = self.db.load_from_disk()
         if db_loaded:
             logging.info("Existing vector database loaded successfully.")
         else:
             logging.warning("No existing vector database found, or load failed.")
 
-        self.embedder = CodeBertEmbedder()
+        model_id = embedder_id(Settings.EMBEDDING_BACKEND, Settings.EMBEDDING_MODEL)
+        tuned = None
+        if Settings.USE_CALIBRATION and not Settings.EMBEDDING_SERVICE:
+            # A query calibration if there is one, otherwise the embedder's for this hardware
+            tuned = (load_calibration(Settings.CALIBRATION_PATH, model_id, "query")
+                     or load_calibration(Settings.CALIBRATION_PATH, model_id))
+        self.embedder = create_embedder(Settings.EMBEDDING_BACKEND, model_name=Settings.EMBEDDING_MODEL,
+                                        export_dir=Settings.MODELS_DIR,
+                                        threads=tuned["threads"] if tuned else None,
+                                        service=Settings.EMBEDDING_SERVICE or None)
+        if Settings.EMBEDDING_SERVICE:
+            logging.info(f"Embedding queries with the service at {Settings.EMBEDDING_SERVICE}.")
+        elif tuned:
+            logging.info(f"Embedding queries with {tuned['threads']} calibrated threads.")
+        elif Settings.USE_CALIBRATION and Settings.AUTO_CALIBRATE:
+            # Queries are embedded one at a time, so only the thread count is tuned
+            tuned = calibrate(self.embedder, batch_sizes=(1,), max_tokens=())
+            if tuned:
+                save_calibration(Settings.CALIBRATION_PATH, model_id, tuned, "query")
+                logging.info(f"Calibrated query embedding to {tuned['threads']} threads.")
+        self.cache = None
+        if Settings.USE_EMBEDDING_CACHE:
+            self.cache = EmbeddingCache(
+                Settings.EMBEDDING_CACHE_PATH,
+                model_name=self.embedder.model_id,
+                max_length=self.embedder.max_length,
+                max_bytes=Settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+            )
+        self.lexical = None
+        self.lexical_metadata = None
+        if Settings.USE_LEXICAL_PREFILTER:
+            self.load_lexical()
         self.llm_interactor = LLMInteractor()
 
+    def load_lexical(self) -> bool:
+        """Open the lexical index over the active rows, leaving it off if it is missing or out of date"""
+        try:
+            header = read_header(Settings.LEXICAL_INDEX_DIR)
+            if header is None:
+                logging.warning("No lexical index found, every query runs CodeBERT.")
+                return False
+            metadata = MetadataTable.open(Settings.METADATA_PATH)
+            if header["rows"] != len(metadata):
+                logging.warning(f"Lexical index has {header['rows']} rows for {len(metadata)} files, not using it.")
+                return False
+            self.lexical = LexicalIndex.open(Settings.LEXICAL_INDEX_DIR, metadata.active_rows())
+            self.lexical_metadata = metadata
+            logging.info(f"Lexical index loaded with {len(self.lexical)} files.")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to load the lexical index: {e}")
+            return False
+
+    def lexical_search(self, code: str, top_k: int = 5, with_code: bool = True) -> List[Dict]:
+        """Top files by n-gram overlap, in the same form as ChromaCodeDB.search results"""
+        if self.lexical is None:
+            return []
+        hits = self.lexical.search(code, top_k)
+        metadatas = self.lexical_metadata.rows([row for row, _ in hits])
+        results = [{
+            'file_path': meta['file_path'],
+            'similarity': similarity,
+            'language': meta.get('language', 'unknown'),
+            'repo': meta.get('repo_name', 'unknown'),
+            'metadata': meta
+        } for (_, similarity), meta in zip(hits, metadatas)]
+        return self.db.with_snippets(results) if with_code else results
+
+    def search(self, code: str, top_k: int = 5, with_code: bool = True) -> List[Dict]:
+        """
+        Embed the code and search with CodeBERT. With LEXICAL_SHORTCUT, lexical
+        candidates come first and a near-verbatim copy is answered from them
+        directly, scored by n-gram similarity. The code of the results is
+        only read with with_code.
+        """
+        results = None
+        if self.lexical is not None and Settings.LEXICAL_SHORTCUT:
+            results = self.lexical_search(code, top_k, with_code=False)
+            if results and results[0]['similarity'] >= Settings.LEXICAL_SHORTCUT_SIMILARITY:
+                logging.info(f"Lexical match {results[0]['similarity']:.2f}, skipping CodeBERT.")
+            else:
+                results = None
+        if results is None:
+            results = self.db.search(self.embed_query(code), top_k=top_k)
+        return self.db.with_snippets(results) if with_code else results
+
+    def compare_lexical(self, codes: List[str], top_k: int = 5, sources: Optional[List[str]] = None) -> Dict:
+        """
+        Latency of lexical and CodeBERT search (uncached embedding plus Chroma
+        query) over codes, the share of CodeBERT's top_k files the lexical
+        index also returns, and, given each query's source file, how often
+        each method ranks it first.
+        """
+        lexical_seconds, embedding_seconds, overlap = [], [], []
+        first = {"lexical": 0, "embedding": 0}
+        for i, code in enumerate(codes):
+            started = time.perf_counter()
+            lexical = self.lexical_search(code, top_k, with_code=False)
+            lexical_seconds.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            embedded = self.db.search(self.embedder.embed([code])[0].tolist(), top_k=top_k)
+            embedding_seconds.append(time.perf_counter() - started)
+            expected = {r['file_path'] for r in embedded}
+            if expected:
+                overlap.append(len(expected & {r['file_path'] for r in lexical}) / len(expected))
+            if sources:
+                first["lexical"] += bool(lexical) and lexical[0]['file_path'] == sources[i]
+                first["embedding"] += bool(embedded) and embedded[0]['file_path'] == sources[i]
+        report = {
+            "queries": len(codes),
+            "top_k": top_k,
+            "lexical_ms": {"mean": 1000 * sum(lexical_seconds) / max(1, len(codes)),
+                           "max": 1000 * max(lexical_seconds, default=0)},
+            "embedding_ms": {"mean": 1000 * sum(embedding_seconds) / max(1, len(codes)),
+                             "max": 1000 * max(embedding_seconds, default=0)},
+            "recall_of_embedding_results": sum(overlap) / max(1, len(overlap))
+        }
+        if sources:
+            report["source_ranked_first"] = {name: hits / max(1, len(codes)) for name, hits in first.items()}
+        return report
+
+    def embed_query(self, code: str) -> List[float]:
+        """Embed submitted code, reusing the cached vector for text seen before"""
+        if self.cache is None:
+            return self.embedder.embed([code])[0].tolist()
+        # Prefixed so a query never collides with the content hash of an indexed file
+        key = "query:" + hashlib.md5(code.encode('utf-8')).hexdigest()
+        vector = self.cache.get(key)
+        if vector is None:
+            vector = self.embedder.embed([code])[0]
+            self.cache.put_many([key], [vector])
+        return vector.tolist()
+
     def rag_only_check(self, code: str, similarity_threshold: float = 0.8) -> str:
-        print(f"Debugging RAG Results: {self.db.search(self.embedder.embed([code])[0].tolist(), top_k=5)}")
-        embedding = self.embedder.embed([code])[0].tolist()
-        results = self.db.search(embedding, top_k=5)
-        print(f"RAG Results: {results}") # Keep this for now too
+        results = self.search(code, top_k=5, with_code=False)
+        logging.info(f"RAG Results: {summarize_results(results)}")
         max_similarity = 0.0
         if results:
             for result in results:
@@ -72,9 +214,8 @@ class PlagiarismChecker:
         """
         Checks for plagiarism using vector search and then LLM verification.
         """
-        embedding = self.embedder.embed([code])[0].tolist()
-        results = self.db.search(embedding, top_k=5)
-        print(f"Full System Results: {results}") # Print results for debugging
+        results = self.search(code, top_k=5)
+        logging.info(f"Full System Results: {summarize_results(results)}")
 
         similar_codes_for_llm = []
         if results and results[0] and 'ids' in results[0]:
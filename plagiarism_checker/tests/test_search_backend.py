@@ -0,0 +1,56 @@
+import sys
+import json
+import pytest
+import numpy as np
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(root_dir))
+sys.path.insert(0, str(root_dir / "plagiarism_checker"))
+
+from plagiarism_checker.src import plagiarism_checker_functions
+from plagiarism_checker.config.settings import Settings
+from vector_db.src.numpy_db import NumpyCodeDB
+import config.settings
+
+class FakeEmbedder:
+    model_id = "fake"
+    max_length = 512
+
+    def embed(self, texts):
+        return np.array([[1.0, 0.0, 0.1] if "first" in text else [0.0, 1.0, 0.1] for text in texts])
+
+def test_numpy_backend(tmp_path, monkeypatch):
+    """SEARCH_BACKEND=numpy builds the checker on NumpyCodeDB and searches it"""
+    files = []
+    for name, body in [("first.py", "def first():\n    return 1\n"), ("second.py", "def second():\n    return 2\n")]:
+        (tmp_path / name).write_text(body)
+        files.append({"file_path": str(tmp_path / name), "language": "python", "file_hash": name})
+    np.save(tmp_path / "embeddings.npy", np.array([[0.9, 0.1, 0.1], [0.1, 0.9, 0.1]]))
+    (tmp_path / "metadata.json").write_text(json.dumps({"files": files}))
+
+    # vector_db reads config.settings, the API's own settings under another module name
+    for settings in {Settings, config.settings.Settings}:
+        monkeypatch.setattr(settings, "CHROMA_DIR", str(tmp_path / "vector_db"))
+        monkeypatch.setattr(settings, "EMBEDDINGS_PATH", str(tmp_path / "embeddings.npy"))
+        monkeypatch.setattr(settings, "METADATA_PATH", str(tmp_path / "metadata.json"))
+        monkeypatch.setattr(settings, "SEARCH_BACKEND", "numpy")
+        monkeypatch.setattr(settings, "USE_CALIBRATION", False)
+        monkeypatch.setattr(settings, "USE_EMBEDDING_CACHE", False)
+        monkeypatch.setattr(settings, "USE_LEXICAL_PREFILTER", False)
+    monkeypatch.setattr(plagiarism_checker_functions, "create_embedder", lambda *args, **kwargs: FakeEmbedder())
+
+    checker = plagiarism_checker_functions.PlagiarismChecker()
+    assert isinstance(checker.db, NumpyCodeDB) and len(checker.db.vectors) == 2
+    results = checker.search("def first(): pass", top_k=2)
+    assert [r['file_path'] for r in results] == [files[0]["file_path"], files[1]["file_path"]]
+    assert results[0]['similarity'] > results[1]['similarity']
+    assert results[0]['code'] == "def first():\n    return 1\n"
+    assert 'metadata' not in results[0]
+    unread = checker.search("def first(): pass", top_k=2, with_code=False)
+    assert 'code' not in unread[0]
+    assert checker.db.with_snippets(unread[:1])[0]['code'] == results[0]['code']
+    assert checker.rag_only_check("def second(): pass").startswith("Plagiarized")
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 class Settings:
@@ -9,9 +10,20 @@ class Settings:
     CHROMA_DIR = DATA_DIR / "vector_db"
     COLLECTION_NAME = "code_embeddings"
     
-    # Embedding source paths
+    # Embedding source paths; shards in a "shards" directory next to
+    # EMBEDDINGS_PATH and metadata.db next to METADATA_PATH take precedence
+    # over the single-file layout of older runs
     EMBEDDINGS_PATH = DATA_DIR / "embeddings" / "embeddings.npy"
     METADATA_PATH = DATA_DIR / "embeddings" / "metadata.json"
+    # Rows read from the shards and upserted at once, capped at the client's max batch size
+    LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "4096"))
+    # Threads reading vectors, metadata and source files for the next batches
+    # while the current one is written; 1 reads and writes in turn
+    LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "4"))
+    # Source text is kept compressed next to the collection, keyed by file
+    # hash, instead of as Chroma documents; snippets are read on demand
+    DOC_CHUNK_CHARS = int(os.getenv("DOC_CHUNK_CHARS", "8192"))
+    DOC_CACHE_MB = int(os.getenv("DOC_CACHE_MB", "64"))
     
     # Indexing configuration (optimized for code search)
     INDEX_CONFIG = {
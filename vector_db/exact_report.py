@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.chroma_manager import ChromaCodeDB
+from src.numpy_db import NumpyCodeDB, compare_backends
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def main(queries: int, k: int, dtype: str, noise: float):
+    """Search near stored rows with the exact NumPy backend and with Chroma, and compare them"""
+    exact = NumpyCodeDB(dtype=dtype)
+    chroma = ChromaCodeDB()
+    if not exact.load_from_disk() or not chroma.load_from_disk():
+        logger.error("Couldn't load the embeddings, run the code embedder first")
+        return None
+    if not len(exact.vectors):
+        logger.error("No active embeddings to search")
+        return None
+    return compare_backends(exact, chroma, queries=queries, k=k, noise=noise)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare exact NumPy search with Chroma's HNSW index")
+    parser.add_argument("--queries", type=int, default=200, help="Number of stored rows to search near")
+    parser.add_argument("-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32",
+                        help="Precision of the exact search matrix")
+    parser.add_argument("--noise", type=float, default=0.05, help="Query noise relative to the row norm")
+    args = parser.parse_args()
+
+    report = main(args.queries, args.k, args.dtype, args.noise)
+    if not report:
+        sys.exit(1)
+    print(json.dumps(report, indent=2))
+    print(f"\nExact {report['exact_ms']['mean']:.2f} ms vs Chroma {report['other_ms']['mean']:.2f} ms per query "
+          f"over {report['rows']} rows, Chroma recall@{report['k']}: {report['recall_at_k']:.2%}")
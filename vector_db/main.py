@@ -1,7 +1,4 @@
 #!/usr/bin/env python3
-import numpy as np
-import json
-import os
 from src.chroma_manager import ChromaCodeDB
 from config.settings import Settings
 import logging
@@ -14,48 +11,21 @@ logging.basicConfig(
 
 def main():
     # Initialize ChromaDB
-    db = ChromaCodeDB()
-
-    # Define paths to embeddings and metadata
-    embeddings_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "embeddings", "embeddings.npy")
-    metadata_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "embeddings", "metadata.json")
-
-    # Load embeddings and metadata from disk
-    try:
-        embeddings = np.load(embeddings_path)
-        with open(metadata_path, 'r') as f:
-            metadata = json.load(f)
-        logging.info("Embeddings and metadata loaded from disk successfully.")
-        logging.info(f"Loaded {len(embeddings)} embeddings and {len(metadata['files'])} metadata entries.")
-    except Exception as e:
-        logging.error(f"Failed to load embeddings or metadata: {e}")
-        return
-
-    # Load embeddings and add to ChromaDB
-    if db.load_from_disk():
-        logging.info("Checking for existing embeddings and adding new ones.")
-
-        #get all the ids that are in the database.
-        existing_ids = db.collection.get(include=[])['ids']
-
-        for i, embedding in enumerate(embeddings):
-            if str(i) not in existing_ids:
-                db.collection.add(
-                    embeddings=[embedding.tolist()],
-                    metadatas=[metadata['files'][i]],
-                    ids=[str(i)]
-                )
-                # logging.info(f"Added embedding with ID: {i}")
-            else:
-                pass
-                # logging.warning(f"Embedding with ID: {i} already exists.")
-
-        # logging.info("Finished adding new embeddings to ChromaDB.")
-    else:
+    db = ChromaCodeDB(
+        load_batch_size=Settings.LOAD_BATCH_SIZE,
+        load_workers=Settings.LOAD_WORKERS,
+        doc_chunk_chars=Settings.DOC_CHUNK_CHARS,
+        doc_cache_mb=Settings.DOC_CACHE_MB
+    )
+
+    # Reads the embedder's output from EMBEDDINGS_PATH and METADATA_PATH. Nothing
+    # is loaded when the collection's build stamp matches the files, and an
+    # existing collection only gets the rows that changed since the last run
+    if not db.load_from_disk():
         logging.error("Failed to load embeddings and metadata into ChromaDB.")
         return
 
-    logging.info("Embeddings added to ChromaDB.");
+    logging.info(f"ChromaDB holds {db.collection.count()} embeddings.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
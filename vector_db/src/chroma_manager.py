@@ -1,16 +1,53 @@
-import numpy as np
+import hashlib
 import json
+import os
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
+import numpy as np
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Tuple
 import logging
 from config.settings import Settings
+from .doc_store import DocStore, pack_text
+from .embedding_shards import EmbeddingShards
+from .metadata_table import MetadataTable
 
 logger = logging.getLogger(__name__)
 
+STAMP_FILE = "build_stamp_{collection}.json"  # Kept in CHROMA_DIR, one per collection
+DOCS_DIR = "docs"  # Kept in CHROMA_DIR
+SNIPPET_CHARS = 1000  # Characters of a file returned as the code of a search result
+STAMP_VERSION = 2
+
+def file_id(meta: Dict, model_id: str = "") -> str:
+    """
+    Collection id of a file's embedding: a hash of the model that embedded
+    it, its repository, its path within the repository and its content.
+    Discovery order and row numbers play no part, so the same file keeps
+    its id across embedder runs and a changed file gets a new one.
+    """
+    key = "\0".join([
+        model_id,
+        meta.get('repo_name') or "",
+        meta.get('relative_path') or meta['file_path'],
+        meta.get('file_hash') or meta.get('blob_sha') or ""
+    ])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
 class ChromaCodeDB:
-    def __init__(self):
+    """
+    Paths, the collection name and index configuration come from the calling
+    service's config.settings; load and doc store tuning is passed in, so
+    services that only search need not define it.
+    """
+    def __init__(self, load_batch_size: int = 4096, load_workers: int = 4,
+                 doc_chunk_chars: int = 8192, doc_cache_mb: int = 64):
         """Initialize ChromaDB connection with optimized settings"""
+        self.load_batch_size = load_batch_size
+        self.load_workers = load_workers
         self.client = chromadb.PersistentClient(
             path=str(Settings.CHROMA_DIR),
             settings=chromadb.config.Settings(allow_reset=False)
@@ -19,53 +56,262 @@ class ChromaCodeDB:
             name=Settings.COLLECTION_NAME,
             metadata=Settings.INDEX_CONFIG
         )
+        self.docs = DocStore(str(Path(Settings.CHROMA_DIR) / DOCS_DIR), chunk_chars=doc_chunk_chars,
+                             cache_bytes=doc_cache_mb * 1024 * 1024)
         logger.info("ChromaDB initialized for code embeddings")
 
-    def load_from_disk(self) -> bool:
+    def load_from_disk(self, force: bool = False) -> bool:
         """
         Load embeddings and metadata from disk into ChromaDB
         Returns True if successful, False otherwise
+
+        The collection carries a build stamp of the files it was loaded from.
+        When they are unchanged this is only a stamp comparison, otherwise
+        only the files whose ids changed are upserted or deleted (see sync).
+        force drops the collection and loads everything again.
         """
         try:
-            # Load numpy embeddings
-            embeddings = np.load(Settings.EMBEDDINGS_PATH)
+            stamp = self.build_stamp()
+            saved = self.read_stamp()
+            if not force and saved and saved["stamp"] == stamp["stamp"] and saved.get("count") == self.collection.count():
+                logger.info(f"Collection is up to date with the embeddings ({saved['count']} rows), nothing to load")
+                return True
+
+            # Map the embedding shards, rows are read a batch at a time
+            embeddings = EmbeddingShards.open(Settings.EMBEDDINGS_PATH)
             
-            # Load metadata
-            with open(Settings.METADATA_PATH) as f:
-                metadata_list = json.load(f)['files']
+            # Metadata rows are read along with their embeddings
+            metadata = MetadataTable.open(Settings.METADATA_PATH)
             
             # Verify alignment
-            if len(embeddings) != len(metadata_list):
+            if len(embeddings) != len(metadata):
                 raise ValueError(
                     f"Embedding count ({len(embeddings)}) "
-                    f"doesn't match metadata count ({len(metadata_list)})"
+                    f"doesn't match metadata count ({len(metadata)})"
                 )
             
-            # Generate document contents
-            documents = []
-            for meta in metadata_list:
-                try:
-                    with open(meta['file_path'], 'r') as f:
-                        documents.append(f.read())
-                except Exception as e:
-                    logger.warning(f"Couldn't read {meta['file_path']}: {str(e)}")
-                    documents.append("")
-            
-            # Store in ChromaDB
-            self.collection.add(
-                ids=[str(i) for i in range(len(embeddings))],
-                embeddings=embeddings.tolist(),
-                metadatas=metadata_list,
-                documents=documents
-            )
-            
-            logger.info(f"Loaded {len(embeddings)} code embeddings")
+            if force and self.collection.count():
+                self.reset()
+            self.sync(metadata, embeddings)
+            self.write_stamp(stamp)
             return True
             
         except Exception as e:
             logger.error(f"Failed to load embeddings: {str(e)}", exc_info=True)
             return False
 
+    def sync(self, manifest=None, embeddings=None) -> Dict:
+        """
+        Bring the collection in line with a manifest of the embedder's output
+        (a MetadataTable, by default the one at METADATA_PATH) and its
+        embeddings. Ids of the active rows are compared with those stored:
+        files that are new or whose content changed are upserted, ids no
+        longer in the manifest (deleted files, old versions, rows from a
+        previous model) are deleted. Row order plays no part, so a full
+        embedder rebuild costs only the files that actually changed.
+        """
+        manifest = manifest if manifest is not None else MetadataTable.open(Settings.METADATA_PATH)
+        if embeddings is None:
+            embeddings = EmbeddingShards.open(Settings.EMBEDDINGS_PATH)
+        model_id = manifest.info().get("model_id", "")
+
+        # Rows of files that were deleted or changed since are kept on disk
+        # to preserve row positions, but never indexed
+        active = manifest.active_rows()
+        wanted = {}
+        for start in range(0, len(active), 10000):
+            batch = active[start:start + 10000]
+            for row, meta in zip(batch, manifest.rows(batch)):
+                wanted[file_id(meta, model_id)] = row
+
+        existing = set(self.collection.get(include=[])['ids'])
+        to_delete = sorted(existing - wanted.keys())
+        to_add = sorted(wanted[i] for i in wanted.keys() - existing)
+        if to_delete:
+            self.delete_ids(to_delete)
+        stats = self.bulk_upsert(to_add, embeddings, manifest)
+        logger.info(f"Synced collection: {len(to_add)} added, {len(to_delete)} removed, "
+                    f"{len(wanted) - len(to_add)} unchanged ({stats['rows_per_second']:.0f} rows/s)")
+        return {"added": len(to_add), "removed": len(to_delete)}
+
+    def upsert_files(self, files: List[Dict], embeddings, model_id: str = "") -> int:
+        """
+        Add or replace files given their metadata and one embedding each.
+        A changed file gets a new id, its previous version is removed with
+        delete_files or the next sync. Returns the number of files written.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        stats = self.bulk_upsert(range(len(files)), embeddings, MetadataTable(files=list(files)), model_id=model_id)
+        return stats["rows"]
+
+    def delete_files(self, files: List[Dict], model_id: str = "") -> int:
+        """Remove files given their metadata, as kept in the embedder's tombstoned rows"""
+        ids = sorted({file_id(meta, model_id) for meta in files})
+        self.delete_ids(ids)
+        return len(ids)
+
+    def reset(self):
+        """Drop every row, keeping the collection and its index configuration"""
+        self.client.delete_collection(Settings.COLLECTION_NAME)
+        self.collection = self.client.get_or_create_collection(
+            name=Settings.COLLECTION_NAME,
+            metadata=Settings.INDEX_CONFIG
+        )
+        self.stamp_path().unlink(missing_ok=True)
+
+    @staticmethod
+    def build_stamp() -> Dict:
+        """
+        Identifies the embedder output on disk without reading it: the shard
+        index (or the size and mtime of a single embeddings file), the
+        metadata store's creation and last write, and the collection settings.
+        """
+        embeddings_path = Path(Settings.EMBEDDINGS_PATH)
+        metadata_path = Path(Settings.METADATA_PATH)
+        index_path = embeddings_path.parent / "shards" / "index.json"
+        db_path = metadata_path.with_name("metadata.db")
+
+        def signature(path: Path):
+            stat = path.stat()
+            return [stat.st_size, stat.st_mtime_ns]
+
+        parts = {
+            "version": STAMP_VERSION,
+            "collection": Settings.COLLECTION_NAME,
+            "index_config": Settings.INDEX_CONFIG,
+            "embeddings": index_path.read_text(encoding='utf-8') if index_path.exists() else signature(embeddings_path),
+            "metadata": MetadataTable(db_path=db_path).info() if db_path.exists() else signature(metadata_path)
+        }
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return {"stamp": digest}
+
+    @staticmethod
+    def stamp_path() -> Path:
+        """Stamp of this collection; the API and vector_db/main.py keep different collections in CHROMA_DIR"""
+        return Path(Settings.CHROMA_DIR) / STAMP_FILE.format(collection=Settings.COLLECTION_NAME)
+
+    @staticmethod
+    def read_stamp() -> Optional[Dict]:
+        """Stamp written by the last successful load, None if there is none"""
+        try:
+            with open(ChromaCodeDB.stamp_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_stamp(self, stamp: Dict):
+        path = self.stamp_path()
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(dict(stamp, count=self.collection.count(),
+                                            loaded_at=time.strftime("%Y-%m-%dT%H:%M:%S"))), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def bulk_upsert(self, rows: Sequence[int], embeddings, metadata, batch_size: Optional[int] = None,
+                    workers: Optional[int] = None, model_id: Optional[str] = None) -> Dict:
+        """
+        Upsert rows of the embedder's output in large batches. A thread pool
+        reads the vectors, metadata and source files of the next batches
+        while this thread writes the current one; writes are never concurrent.
+        Source text goes to the doc store, only for content it doesn't have yet.
+        Upserting makes an interrupted load safe to run again. Ids come from
+        file_id with model_id, by default the one recorded in the metadata.
+        Returns rows, seconds and rows_per_second.
+        """
+        if model_id is None:
+            model_id = metadata.info().get("model_id", "")
+        batch_size = max(1, min(batch_size or self.load_batch_size, self.client.max_batch_size))
+        workers = max(1, workers or self.load_workers)
+        rows = list(rows)
+        started = time.perf_counter()
+        written = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chroma-load") as pool:
+            pending = deque()
+            for start in range(0, len(rows), batch_size):
+                pending.append(pool.submit(self._prepare, rows[start:start + batch_size], embeddings, metadata, model_id))
+                if len(pending) > workers:
+                    written += self._write(pending.popleft().result(), written, len(rows), started)
+            while pending:
+                written += self._write(pending.popleft().result(), written, len(rows), started)
+        seconds = time.perf_counter() - started
+        return {"rows": written, "seconds": seconds, "rows_per_second": written / seconds if seconds else 0.0}
+
+    def _prepare(self, batch: List[int], embeddings, metadata,
+                 model_id: str) -> Tuple[List[str], List, List[Dict], Dict]:
+        """ids, vectors and metadata of one batch, and the compressed text of files new to the doc store"""
+        metadatas = metadata.rows(batch)
+        missing = set(self.docs.missing(meta['file_hash'] for meta in metadatas if meta.get('file_hash')))
+        packed = {}
+        for meta in metadatas:
+            if meta.get('file_hash') in missing and meta['file_hash'] not in packed:
+                text = self.read_document(meta)
+                if text:
+                    packed[meta['file_hash']] = pack_text(text, self.docs.chunk_chars)
+        return (
+            [file_id(meta, model_id) for meta in metadatas],
+            embeddings[batch].tolist(),
+            metadatas,
+            packed
+        )
+
+    def _write(self, prepared: Tuple, written: int, total: int, started: float) -> int:
+        ids, vectors, metadatas, packed = prepared
+        # Text first: a row in the collection always has its snippet available
+        self.docs.put_many(packed)
+        self.collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas)
+        done = written + len(ids)
+        logger.info(f"Upserted {done}/{total} rows ({done / (time.perf_counter() - started):.0f} rows/s)")
+        return len(ids)
+
+    def delete_ids(self, ids: Sequence[str]):
+        """Remove ids from the collection, in batches the client accepts"""
+        ids = list(ids)
+        for start in range(0, len(ids), self.client.max_batch_size):
+            self.collection.delete(ids=ids[start:start + self.client.max_batch_size])
+
+    def snippet(self, meta: Dict, length: Optional[int] = None) -> str:
+        """
+        The first length characters of a file, from the doc store by its
+        hash, or from the file itself for rows loaded without one
+        """
+        length = length or SNIPPET_CHARS
+        text = self.docs.read(meta['file_hash'], 0, length) if meta.get('file_hash') else None
+        if text is None:
+            text = self.read_document(meta)[:length]
+        return text
+
+    def with_snippets(self, results: List[Dict], length: Optional[int] = None) -> List[Dict]:
+        """Add the code of each search result the caller is going to use, in place of its metadata"""
+        for result in results:
+            result['code'] = self.snippet(result.pop('metadata'), length)
+        return results
+
+    @staticmethod
+    def read_document(meta: Dict) -> str:
+        """Source text stored alongside an embedding, empty if the file is unreadable"""
+        try:
+            with open(meta['file_path'], 'r') as f:
+                return f.read()
+        except Exception as e:
+            if meta.get('blob_sha') and meta.get('relative_path'):
+                content = ChromaCodeDB._read_blob(meta)
+                if content is not None:
+                    return content
+            logger.warning(f"Couldn't read {meta['file_path']}: {str(e)}")
+            return ""
+
+    @staticmethod
+    def _read_blob(meta: Dict) -> Optional[str]:
+        """Read a file that was indexed from git objects, without a working tree"""
+        depth = len(Path(meta['relative_path']).parts)
+        repo_dir = Path(meta['file_path']).parents[depth - 1]
+        result = subprocess.run(
+            ["git", "-C", str(repo_dir), "cat-file", "blob", meta['blob_sha']],
+            capture_output=True
+        )
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode('utf-8', errors='replace')
+
     def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
         """
         Search for similar code snippets
@@ -73,25 +319,27 @@ class ChromaCodeDB:
             query_embedding: 768-dimensional embedding vector
             top_k: Number of results to return
         Returns:
-            List of dictionaries with results
+            List of dictionaries with results, without code: pass the ones
+            that are used to with_snippets()
         """
         try:
             results = self.collection.query(
                 query_embeddings=[query_embedding],
                 n_results=top_k,
-                include=["metadatas", "distances", "documents"]
+                include=["metadatas", "distances"]
             )
             
             return [{
+                'id': row_id,
                 'file_path': meta['file_path'],
                 'similarity': 1 - distance,
                 'language': meta.get('language', 'unknown'),
                 'repo': meta.get('repo_name', 'unknown'),
-                'code': doc[:1000]  # Return first 1000 chars of code
-            } for meta, distance, doc in zip(
+                'metadata': meta
+            } for row_id, meta, distance in zip(
+                results['ids'][0],
                 results['metadatas'][0],
-                results['distances'][0],
-                results['documents'][0]
+                results['distances'][0]
             )]
             
         except Exception as e:
@@ -0,0 +1,184 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+PACK_FILE = "docs.pack"
+INDEX_FILE = "docs.db"
+
+def pack_text(text: str, chunk_chars: int = 8192, level: int = 6) -> Tuple[int, int, List[bytes]]:
+    """
+    (length in characters, size in bytes, compressed chunks) of a document.
+    Every chunk_chars characters are compressed on their own, so a range
+    of the text can be read without decompressing what comes before it.
+    """
+    chunks = [zlib.compress(text[start:start + chunk_chars].encode('utf-8'), level)
+              for start in range(0, len(text), chunk_chars)]
+    return len(text), len(text.encode('utf-8')), chunks
+
+class DocStore:
+    """
+    Source text of the indexed files, kept out of the vector index.
+    Documents are keyed by content hash, so identical files and unchanged
+    files across loads are stored once. Compressed chunks are appended to
+    one pack file and located through a SQLite index; reads fetch only the
+    chunks covering the requested range and keep them in an LRU cache
+    bounded by cache_bytes. The pack is append-only: deleting the directory
+    is safe, documents missing from it are read from their source files.
+    """
+    def __init__(self, directory: str, chunk_chars: int = 8192, cache_bytes: int = 64 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.chunk_chars = chunk_chars
+        self.cache_bytes = cache_bytes
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self._fd = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # WAL lets the API read while a load writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "key TEXT PRIMARY KEY, "
+                "offset INTEGER NOT NULL, "
+                "length INTEGER NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "chunk_chars INTEGER NOT NULL, "
+                "chunks TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.directory / INDEX_FILE, timeout=60)
+
+    def missing(self, keys: Iterable[str]) -> List[str]:
+        """Keys without a stored document"""
+        keys = list(dict.fromkeys(keys))
+        found = set()
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                found.update(key for key, in conn.execute(
+                    f"SELECT key FROM docs WHERE key IN ({', '.join('?' * len(batch))})", batch
+                ))
+        return [key for key in keys if key not in found]
+
+    def put_many(self, packed: Dict[str, Tuple[int, int, List[bytes]]]) -> int:
+        """
+        Store documents from pack_text() under their keys, skipping keys
+        already stored. Returns the number added.
+        """
+        with closing(self._connect()) as conn, conn:
+            # Holding the write lock makes appends from concurrent loads land in turn
+            conn.execute("BEGIN IMMEDIATE")
+            new = [key for key in packed
+                   if not conn.execute("SELECT 1 FROM docs WHERE key = ?", (key,)).fetchone()]
+            if not new:
+                return 0
+            rows = []
+            with open(self.directory / PACK_FILE, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                for key in new:
+                    length, size, chunks = packed[key]
+                    f.write(b"".join(chunks))
+                    rows.append((key, offset, length, size, self.chunk_chars, json.dumps([len(c) for c in chunks])))
+                    offset += sum(len(c) for c in chunks)
+                f.flush()
+                os.fsync(f.fileno())
+            conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(new)
+
+    def read(self, key: str, start: int = 0, end: Optional[int] = None) -> Optional[str]:
+        """Characters start to end of a document, None if it isn't stored"""
+        entry = self._entry(key)
+        if entry is None:
+            return None
+        length, chunk_chars, positions = entry
+        end = length if end is None else min(end, length)
+        if start >= end:
+            return ""
+        first, last = start // chunk_chars, (end - 1) // chunk_chars
+        text = "".join(self._chunk(key, i, positions[i], positions[i + 1] - positions[i])
+                       for i in range(first, last + 1))
+        return text[start - first * chunk_chars:end - first * chunk_chars]
+
+    def _entry(self, key: str) -> Optional[Tuple[int, int, List[int]]]:
+        """length, chunk_chars and chunk offsets in the pack; stored documents never change, so they are cached"""
+        entry = self._cached((key, None), count=False)
+        if entry is not None:
+            return entry
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT offset, length, chunk_chars, chunks FROM docs WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        offset, length, chunk_chars, sizes = row
+        positions = [offset]
+        for size in json.loads(sizes):
+            positions.append(positions[-1] + size)
+        entry = (length, chunk_chars, positions)
+        self._remember((key, None), entry, 8 * len(positions))
+        return entry
+
+    def _chunk(self, key: str, index: int, position: int, size: int) -> str:
+        text = self._cached((key, index))
+        if text is not None:
+            return text
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(self.directory / PACK_FILE, os.O_RDONLY)
+            fd = self._fd
+        # pread leaves no shared file position, so reads can run concurrently
+        text = zlib.decompress(os.pread(fd, size, position)).decode('utf-8')
+        self._remember((key, index), text, len(text))
+        return text
+
+    def _cached(self, cache_key: Tuple, count: bool = True):
+        """Cached value, moved to the most recently used end; hits and misses count chunks only"""
+        with self._lock:
+            item = self._cache.get(cache_key)
+            if item is None:
+                self.misses += count
+                return None
+            self._cache.move_to_end(cache_key)
+            self.hits += count
+            return item[0]
+
+    def _remember(self, cache_key: Tuple, value, size: int):
+        with self._lock:
+            if cache_key not in self._cache:
+                self._cache[cache_key] = (value, size)
+                self._cached_bytes += size
+            while self._cached_bytes > self.cache_bytes and len(self._cache) > 1:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached_bytes -= evicted
+
+    def stats(self) -> Dict:
+        """Documents stored, their total size and the size of the pack file"""
+        with closing(self._connect()) as conn:
+            count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM docs").fetchone()
+        pack = self.directory / PACK_FILE
+        return {
+            "documents": count,
+            "text_bytes": size,
+            "stored_bytes": pack.stat().st_size if pack.exists() else 0,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses
+        }
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
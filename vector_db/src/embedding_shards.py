@@ -0,0 +1,92 @@
+import json
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingShards:
+    """
+    Read-only view of the embedder's output. Rows live in .npy shards listed
+    in order by shards/index.json; each shard is memory-mapped the first time
+    one of its rows is read, so only the rows asked for are loaded. A single
+    embeddings.npy from older runs is read the same way. float16 and int8
+    shards (the latter with per-row scales) are returned as float32.
+    """
+    def __init__(self, files: List[Path], counts: List[int], scales: Optional[List[Optional[Path]]] = None):
+        self.files = files
+        self.counts = counts
+        self.scales = scales or [None] * len(files)
+        self.starts = np.cumsum([0] + counts[:-1]).tolist() if counts else []
+        self._mapped = {}
+
+    @classmethod
+    def open(cls, embeddings_path) -> "EmbeddingShards":
+        """Shards next to embeddings_path if there are any, otherwise embeddings_path itself"""
+        embeddings_path = Path(embeddings_path)
+        index_path = embeddings_path.parent / "shards" / "index.json"
+        if index_path.exists():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            return cls(
+                [index_path.parent / shard["file"] for shard in index["shards"]],
+                [shard["rows"] for shard in index["shards"]],
+                [index_path.parent / shard["scales"] if "scales" in shard else None for shard in index["shards"]]
+            )
+        if not embeddings_path.exists():
+            raise FileNotFoundError(f"No embeddings at {embeddings_path} or {index_path.parent}")
+        return cls([embeddings_path], [len(np.load(embeddings_path, mmap_mode="r"))])
+
+    def __len__(self) -> int:
+        return sum(self.counts)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        if isinstance(rows, (int, np.integer)):
+            shard, offset = self._locate(int(rows))
+            return self._read(shard, np.array([offset]))[0]
+        return self.take(rows)
+
+    def take(self, rows: Sequence[int]) -> np.ndarray:
+        """Rows in the given order, reading each shard once"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size and (rows.min() < 0 or rows.max() >= len(self)):
+            raise IndexError(f"Row out of range for {len(self)} embeddings")
+        shards = np.searchsorted(self.starts, rows, side="right") - 1
+        result = None
+        for shard in np.unique(shards):
+            selected = shards == shard
+            vectors = self._read(shard, rows[selected] - self.starts[shard])
+            if result is None:
+                result = np.empty((len(rows), vectors.shape[1]), dtype=np.float32)
+            result[selected] = vectors
+        return result if result is not None else np.empty((0, 0), dtype=np.float32)
+
+    def batches(self, rows: Sequence[int], batch_size: int) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """Yield (rows, vectors) a batch at a time"""
+        rows = list(rows)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            yield batch, self.take(batch)
+
+    def _locate(self, row: int) -> Tuple[int, int]:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"Row {row} out of range for {len(self)} embeddings")
+        shard = int(np.searchsorted(self.starts, row, side="right")) - 1
+        return shard, row - self.starts[shard]
+
+    def _read(self, shard: int, offsets: np.ndarray) -> np.ndarray:
+        """float32 rows of one shard, read from its memory map"""
+        if shard not in self._mapped:
+            self._mapped[shard] = (
+                np.load(self.files[shard], mmap_mode="r"),
+                np.load(self.scales[shard], mmap_mode="r") if self.scales[shard] else None
+            )
+        stored, scales = self._mapped[shard]
+        vectors = np.asarray(stored[offsets], dtype=np.float32)
+        if scales is not None:
+            vectors *= scales[offsets][:, None]
+        return vectors
@@ -0,0 +1,82 @@
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Typed columns of the embedder's metadata.db, see code_embedder/src/metadata_store.py
+FIELDS = ["file_path", "file_name", "repo_name", "relative_path", "language",
+          "file_size", "last_modified", "file_hash", "blob_sha", "file_extension"]
+
+class MetadataTable:
+    """
+    Read-only view of the embedder's per-row metadata. Reads metadata.db
+    next to the metadata path a row range at a time when there is one, and
+    falls back to a metadata.json list from older runs.
+    """
+    def __init__(self, db_path: Optional[Path] = None, files: Optional[List[Dict]] = None):
+        self.db_path = db_path
+        self.files = files
+
+    @classmethod
+    def open(cls, metadata_path) -> "MetadataTable":
+        """metadata.db next to metadata_path if there is one, otherwise metadata_path itself"""
+        metadata_path = Path(metadata_path)
+        db_path = metadata_path.with_name("metadata.db")
+        if db_path.exists():
+            return cls(db_path=db_path)
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            return cls(files=json.load(f)['files'])
+
+    def __len__(self) -> int:
+        if self.files is not None:
+            return len(self.files)
+        return self._query("SELECT COUNT(*) FROM files")[0][0]
+
+    def __getitem__(self, row: int) -> Dict:
+        return self.rows([row])[0]
+
+    def info(self) -> Dict[str, str]:
+        """created_at, model_id, generated_at and total_files of metadata.db, empty for metadata.json"""
+        if self.files is not None:
+            return {}
+        return dict(self._query("SELECT key, value FROM info"))
+
+    def active_rows(self) -> List[int]:
+        """Rows not marked deleted, in order"""
+        if self.files is not None:
+            return [i for i, meta in enumerate(self.files) if not meta.get('deleted')]
+        return [row for row, in self._query("SELECT row FROM files WHERE deleted = 0 ORDER BY row")]
+
+    def rows(self, rows: Sequence[int]) -> List[Dict]:
+        """Metadata of the given rows, in the order asked for"""
+        if self.files is not None:
+            return [self.files[i] for i in rows]
+        rows = list(rows)
+        found = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            for record in self._query(
+                f"SELECT row, {', '.join(FIELDS)}, deleted, extra FROM files "
+                f"WHERE row IN ({', '.join('?' * len(batch))})", batch
+            ):
+                found[record[0]] = self._to_dict(record[1:])
+        return [found[row] for row in rows]
+
+    @staticmethod
+    def _to_dict(record) -> Dict:
+        meta = {name: value for name, value in zip(FIELDS, record) if value is not None}
+        deleted, extra = record[len(FIELDS)], record[len(FIELDS) + 1]
+        if extra:
+            meta.update(json.loads(extra))
+        if deleted:
+            meta['deleted'] = True
+        return meta
+
+    def _query(self, sql: str, params: Sequence = ()) -> List:
+        # Read-only, so a running embedder can keep writing
+        with closing(sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)) as conn:
+            return conn.execute(sql, params).fetchall()
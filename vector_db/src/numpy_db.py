@@ -0,0 +1,204 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import logging
+
+import numpy as np
+
+from config.settings import Settings
+from .chroma_manager import ChromaCodeDB, DOCS_DIR, SNIPPET_CHARS, file_id
+from .doc_store import DocStore
+from .embedding_shards import EmbeddingShards
+from .metadata_table import MetadataTable
+
+logger = logging.getLogger(__name__)
+
+EXACT_DIR = "exact"  # Kept in CHROMA_DIR
+VECTORS_FILE = "vectors.npy"
+ROWS_FILE = "rows.npy"
+INDEX_FILE = "index.json"
+
+class NumpyCodeDB:
+    """
+    Exact cosine search over the embedder's output, in process and without
+    a vector index. The active rows are normalized once into a float32 or
+    float16 matrix next to the collection, rebuilt when the build stamp of
+    the embeddings changes, and memory-mapped. A query scans the matrix
+    block_rows at a time with a matrix product and argpartition, so memory
+    stays bounded at any corpus size and every result is exact.
+    Searches return the same results as ChromaCodeDB.search.
+    """
+    def __init__(self, dtype: str = "float32", block_rows: int = 4096, doc_cache_mb: int = 64):
+        self.dtype = dtype
+        self.block_rows = block_rows
+        self.directory = Path(Settings.CHROMA_DIR) / EXACT_DIR
+        # Only read here, the chunk size of stored documents is in their index
+        self.docs = DocStore(str(Path(Settings.CHROMA_DIR) / DOCS_DIR), cache_bytes=doc_cache_mb * 1024 * 1024)
+        self.vectors = None
+        self.rows = None
+        self.metadata = None
+        self.model_id = ""
+
+    def load_from_disk(self, force: bool = False) -> bool:
+        """
+        Map the normalized matrix, building it first if the embeddings
+        changed since it was written
+        Returns True if successful, False otherwise
+        """
+        try:
+            stamp = ChromaCodeDB.build_stamp()["stamp"]
+            header = self._read_header()
+            if force or not header or header["stamp"] != stamp or header["dtype"] != self.dtype:
+                self._build(stamp)
+            else:
+                logger.info(f"Exact search matrix is up to date with the embeddings ({header['rows']} rows)")
+            self.vectors = np.load(self.directory / VECTORS_FILE, mmap_mode="r")
+            self.rows = np.load(self.directory / ROWS_FILE)
+            self.metadata = MetadataTable.open(Settings.METADATA_PATH)
+            self.model_id = self.metadata.info().get("model_id", "")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to load embeddings for exact search: {str(e)}", exc_info=True)
+            return False
+
+    def _read_header(self) -> Optional[Dict]:
+        try:
+            with open(self.directory / INDEX_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _build(self, stamp: str):
+        """Write the normalized active rows and their row numbers, replacing the previous matrix once complete"""
+        embeddings = EmbeddingShards.open(Settings.EMBEDDINGS_PATH)
+        metadata = MetadataTable.open(Settings.METADATA_PATH)
+        if len(embeddings) != len(metadata):
+            raise ValueError(
+                f"Embedding count ({len(embeddings)}) "
+                f"doesn't match metadata count ({len(metadata)})"
+            )
+        rows = np.asarray(metadata.active_rows(), dtype=np.int64)
+        dim = embeddings[0].shape[0] if len(embeddings) else 0
+        started = time.perf_counter()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / (VECTORS_FILE + ".tmp.npy")
+        matrix = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=self.dtype, shape=(len(rows), dim))
+        for start in range(0, len(rows), self.block_rows):
+            block = embeddings.take(rows[start:start + self.block_rows])
+            block /= np.maximum(np.linalg.norm(block, axis=1, keepdims=True), 1e-12)
+            matrix[start:start + len(block)] = block
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, self.directory / VECTORS_FILE)
+        np.save(self.directory / ROWS_FILE, rows)
+        tmp_path = self.directory / (INDEX_FILE + ".tmp")
+        tmp_path.write_text(json.dumps({"stamp": stamp, "dtype": self.dtype, "rows": len(rows), "dim": dim}),
+                            encoding='utf-8')
+        os.replace(tmp_path, self.directory / INDEX_FILE)
+        logger.info(f"Built {self.dtype} exact search matrix of {len(rows)} rows "
+                    f"in {time.perf_counter() - started:.1f}s")
+
+    def top_rows(self, query_embedding: Sequence[float], top_k: int = 5) -> List[tuple]:
+        """(position in the matrix, cosine similarity) of the top_k rows, best first"""
+        if self.vectors is None or not len(self.vectors) or top_k < 1:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        candidates, scores = [], []
+        for start in range(0, len(self.vectors), self.block_rows):
+            # float16 blocks are widened, BLAS has no half-precision product
+            block = np.asarray(self.vectors[start:start + self.block_rows], dtype=np.float32)
+            block_scores = block @ query
+            k = min(top_k, len(block_scores))
+            top = np.argpartition(-block_scores, k - 1)[:k]
+            candidates.append(top + start)
+            scores.append(block_scores[top])
+        candidates, scores = np.concatenate(candidates), np.concatenate(scores)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def search(self, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
+        """
+        Search for similar code snippets
+        Args:
+            query_embedding: 768-dimensional embedding vector
+            top_k: Number of results to return
+        Returns:
+            List of dictionaries with results, in the form of ChromaCodeDB.search
+        """
+        try:
+            hits = self.top_rows(query_embedding, top_k)
+            metadatas = self.metadata.rows([int(self.rows[i]) for i, _ in hits]) if hits else []
+            return [{
+                'id': file_id(meta, self.model_id),
+                'file_path': meta['file_path'],
+                'similarity': similarity,
+                'language': meta.get('language', 'unknown'),
+                'repo': meta.get('repo_name', 'unknown'),
+                'metadata': meta
+            } for (_, similarity), meta in zip(hits, metadatas)]
+        except Exception as e:
+            logger.error(f"Search failed: {str(e)}")
+            return []
+
+    def snippet(self, meta: Dict, length: Optional[int] = None) -> str:
+        """The first length characters of a file, from the doc store a Chroma load fills or from the file"""
+        length = length or SNIPPET_CHARS
+        text = self.docs.read(meta['file_hash'], 0, length) if meta.get('file_hash') else None
+        if text is None:
+            text = ChromaCodeDB.read_document(meta)[:length]
+        return text
+
+    def with_snippets(self, results: List[Dict], length: Optional[int] = None) -> List[Dict]:
+        """Add the code of each search result the caller is going to use, in place of its metadata"""
+        for result in results:
+            result['code'] = self.snippet(result.pop('metadata'), length)
+        return results
+
+    def get_stats(self) -> Dict:
+        """Get matrix statistics"""
+        return {
+            'total_embeddings': 0 if self.vectors is None else len(self.vectors),
+            'dtype': self.dtype,
+            'block_rows': self.block_rows
+        }
+
+def compare_backends(exact: NumpyCodeDB, other, queries: int = 100, k: int = 10,
+                     noise: float = 0.05, seed: int = 0) -> Dict:
+    """
+    Latency of both backends and the recall@k of other (ChromaCodeDB)
+    against the exact results. Queries are stored rows with gaussian noise
+    of the given scale relative to their norm, so they are near, not on, a row.
+    """
+    rng = np.random.default_rng(seed)
+    positions = rng.choice(len(exact.vectors), size=min(queries, len(exact.vectors)), replace=False)
+    exact_seconds, other_seconds, recall = [], [], []
+    for position in positions:
+        query = np.asarray(exact.vectors[position], dtype=np.float32)
+        query = (query + rng.normal(scale=noise / np.sqrt(len(query)), size=len(query))).tolist()
+        started = time.perf_counter()
+        expected = exact.search(query, k)
+        exact_seconds.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        found = other.search(query, k)
+        other_seconds.append(time.perf_counter() - started)
+        expected = {r['id'] for r in expected}
+        if expected:
+            recall.append(len(expected & {r['id'] for r in found}) / len(expected))
+
+    def latency(seconds: List[float]) -> Dict:
+        return {"mean": 1000 * float(np.mean(seconds)), "p95": 1000 * float(np.percentile(seconds, 95))}
+
+    return {
+        "queries": len(positions),
+        "k": k,
+        "rows": len(exact.vectors),
+        "dtype": exact.dtype,
+        "exact_ms": latency(exact_seconds) if len(positions) else None,
+        "other_ms": latency(other_seconds) if len(positions) else None,
+        "recall_at_k": sum(recall) / max(1, len(recall))
+    }
@@ -8,7 +8,7 @@ from pathlib import Path
 # Add the parent directory to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.chroma_manager import ChromaCodeDB
+from src.chroma_manager import ChromaCodeDB, SNIPPET_CHARS, file_id
 from config.settings import Settings
 
 @pytest.fixture
@@ -54,6 +54,9 @@ def empty_db(tmp_path):
         pass # collection does not exist, so it is empty
     return db
 
+def stored_paths(db) -> list:
+    return sorted(meta['file_path'] for meta in db.collection.get(include=["metadatas"])['metadatas'])
+
 def test_similarity_ranking(test_db):
     """Test embeddings return in correct similarity order"""
     results = test_db.search([1.0, 0.0, 0.0])  # Should match first embedding
@@ -86,5 +89,290 @@ def test_exact_match_similarity(test_db):
     results = test_db.search(embeddings[0].tolist())
     assert abs(results[0]['similarity'] - 1.0) < 0.01
 
+def test_deleted_rows_not_indexed(tmp_path):
+    """Rows marked deleted by incremental runs are skipped, positions of the rest are kept"""
+    Settings.CHROMA_DIR = tmp_path / "chroma_deleted"
+    Settings.EMBEDDINGS_PATH = tmp_path / "embeddings.npy"
+    Settings.METADATA_PATH = tmp_path / "metadata.json"
+    np.save(Settings.EMBEDDINGS_PATH, np.array([
+        [0.9, 0.1, 0.1],
+        [0.1, 0.8, 0.1],
+        [0.1, 0.1, 0.7]
+    ]))
+    with open(Settings.METADATA_PATH, 'w') as f:
+        json.dump({"files": [
+            {"file_path": "old.py", "language": "python", "deleted": True},
+            {"file_path": "kept.py", "language": "python"},
+            {"file_path": "new.py", "language": "python"}
+        ]}, f)
+
+    db = ChromaCodeDB()
+    assert db.load_from_disk()
+    assert stored_paths(db) == ["kept.py", "new.py"]
+    results = db.search([1.0, 0.0, 0.0])
+    assert "old.py" not in [r['file_path'] for r in results]
+
+def test_sync_follows_tombstones(tmp_path):
+    """An existing collection drops deleted rows and gains appended ones"""
+    from src.metadata_table import MetadataTable
+
+    Settings.CHROMA_DIR = tmp_path / "chroma_sync"
+    Settings.EMBEDDINGS_PATH = tmp_path / "embeddings.npy"
+    Settings.METADATA_PATH = tmp_path / "metadata.json"
+    embeddings = np.array([
+        [0.9, 0.1, 0.1],
+        [0.1, 0.8, 0.1],
+        [0.1, 0.1, 0.7]
+    ])
+    files = [
+        {"file_path": "a.py", "language": "python", "file_hash": "a1"},
+        {"file_path": "b.py", "language": "python", "file_hash": "b1"}
+    ]
+    np.save(Settings.EMBEDDINGS_PATH, embeddings[:2])
+    with open(Settings.METADATA_PATH, 'w') as f:
+        json.dump({"files": files}, f)
+
+    db = ChromaCodeDB()
+    assert db.load_from_disk()
+
+    # b.py changed: its old row is tombstoned and the new version appended
+    files = files + [{"file_path": "b.py", "language": "python", "file_hash": "b2"}]
+    files[1] = dict(files[1], deleted=True)
+    db.sync(MetadataTable(files=files), embeddings)
+    assert sorted(db.collection.get(include=[])['ids']) == sorted(file_id(meta) for meta in [files[0], files[2]])
+    stored = db.collection.get(ids=[file_id(files[2])], include=["embeddings"])
+    np.testing.assert_allclose(stored["embeddings"][0], embeddings[2], rtol=1e-6)
+
+def test_load_from_shards(tmp_path):
+    """Shards and metadata.db written by the embedder are preferred and read lazily in row order"""
+    from src.embedding_shards import EmbeddingShards
+    from src.metadata_table import MetadataTable
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from code_embedder.src.metadata_store import MetadataStore
+
+    Settings.CHROMA_DIR = tmp_path / "chroma_shards"
+    Settings.EMBEDDINGS_PATH = tmp_path / "embeddings.npy"
+    Settings.METADATA_PATH = tmp_path / "metadata.json"
+    shards_dir = tmp_path / "shards"
+    shards_dir.mkdir()
+    np.save(shards_dir / "shard-00000.npy", np.array([[0.9, 0.1, 0.1], [0.1, 0.8, 0.1]], dtype=np.float32))
+    np.save(shards_dir / "shard-00001.npy", np.array([[0.1, 0.1, 0.7]], dtype=np.float32))
+    (shards_dir / "index.json").write_text(json.dumps({
+        "version": 1, "dim": 3, "dtype": "float32", "rows": 3,
+        "shards": [{"file": "shard-00000.npy", "rows": 2}, {"file": "shard-00001.npy", "rows": 1}]
+    }))
+    files = [
+        {"file_path": "x.py", "language": "python"},
+        {"file_path": "y.py", "language": "python", "deleted": True},
+        {"file_path": "z.py", "language": "python", "blob_sha": "abc"}
+    ]
+    MetadataStore.create(str(tmp_path / "metadata.db"), files)
+
+    shards = EmbeddingShards.open(Settings.EMBEDDINGS_PATH)
+    assert len(shards) == 3
+    np.testing.assert_allclose(shards[[2, 0]], [[0.1, 0.1, 0.7], [0.9, 0.1, 0.1]], rtol=1e-6)
+    table = MetadataTable.open(Settings.METADATA_PATH)
+    assert len(table) == 3 and table.active_rows() == [0, 2]
+    assert table.rows([2, 1]) == [files[2], files[1]]
+
+    db = ChromaCodeDB()
+    assert db.load_from_disk()
+    assert stored_paths(db) == ["x.py", "z.py"]
+    assert db.search([0.0, 0.0, 1.0])[0]['file_path'] == "z.py"
+
+def test_bulk_upsert_batches_and_reruns(tmp_path):
+    """Rows are upserted in batches prepared ahead of the writes, and loading again changes nothing"""
+    from src.metadata_table import MetadataTable
+
+    Settings.CHROMA_DIR = tmp_path / "chroma_bulk"
+    rng = np.random.default_rng(0)
+    embeddings = rng.random((10, 3))
+    files = MetadataTable(files=[{"file_path": f"f{i}.py", "language": "python"} for i in range(10)])
+
+    db = ChromaCodeDB()
+    rows = [0, 2, 3, 5, 6, 7, 9]
+    stats = db.bulk_upsert(rows, embeddings, files, batch_size=3, workers=2)
+    assert stats["rows"] == 7 and stats["rows_per_second"] > 0
+    stored = db.collection.get(ids=[file_id(files[5])], include=["embeddings", "metadatas"])
+    np.testing.assert_allclose(stored["embeddings"][0], embeddings[5], rtol=1e-6)
+    assert stored["metadatas"][0]["file_path"] == "f5.py"
+
+    db.bulk_upsert(rows, embeddings, files, batch_size=4, workers=1)
+    assert db.collection.count() == 7
+    db.delete_ids([file_id(files[0]), file_id(files[9])])
+    assert stored_paths(db) == ["f2.py", "f3.py", "f5.py", "f6.py", "f7.py"]
+
+def test_load_skipped_when_stamp_matches(tmp_path, monkeypatch):
+    """A current collection is not reloaded, otherwise only changed files are loaded"""
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+    from code_embedder.src.metadata_store import MetadataStore
+    from code_embedder.src.shard_store import ShardWriter
+
+    Settings.CHROMA_DIR = tmp_path / "chroma_stamp"
+    Settings.EMBEDDINGS_PATH = tmp_path / "embeddings.npy"
+    Settings.METADATA_PATH = tmp_path / "metadata.json"
+    writer = ShardWriter(str(tmp_path / "shards"), rows_per_shard=2)
+    writer.append(np.array([[0.9, 0.1, 0.1], [0.1, 0.8, 0.1]]))
+    writer.close()
+    files = [{"file_path": "x.py", "language": "python", "file_hash": "x1"},
+             {"file_path": "y.py", "language": "python", "file_hash": "y1"}]
+    store = MetadataStore.create(str(tmp_path / "metadata.db"), files)
+
+    assert ChromaCodeDB().load_from_disk()
+    loads = []
+    original = ChromaCodeDB.bulk_upsert
+    def counting_upsert(self, rows, *args, **kwargs):
+        loads.append(list(rows))
+        return original(self, rows, *args, **kwargs)
+    monkeypatch.setattr(ChromaCodeDB, "bulk_upsert", counting_upsert)
+
+    db = ChromaCodeDB()
+    assert db.load_from_disk() and loads == []
+
+    # An incremental run tombstones y.py and appends its new version
+    writer = ShardWriter(str(tmp_path / "shards"), rows_per_shard=2, append=True)
+    writer.append(np.array([[0.1, 0.1, 0.7]]))
+    writer.close()
+    store.append([{"file_path": "y.py", "language": "python", "file_hash": "y2"}], deleted=[1])
+    db = ChromaCodeDB()
+    assert db.load_from_disk() and loads == [[2]]
+    assert stored_paths(db) == ["x.py", "y.py"]
+
+    # A full run renumbers the rows: only files whose content differs are loaded
+    MetadataStore.create(str(tmp_path / "metadata.db"),
+                         [{"file_path": "z.py", "language": "python", "file_hash": "z1"}] + files)
+    db = ChromaCodeDB()
+    assert db.load_from_disk() and loads[-1] == [0, 2]
+    assert db.collection.count() == 3
+    assert db.load_from_disk() and len(loads) == 2
+
+    # Embeddings from another model replace every id
+    store = MetadataStore(str(tmp_path / "metadata.db"))
+    store.set_info(model_id="other-model")
+    assert ChromaCodeDB().load_from_disk() and loads[-1] == [0, 1, 2]
+    assert ChromaCodeDB().collection.count() == 3
+
+def test_stamp_kept_per_collection(tmp_path, monkeypatch):
+    """Collections sharing CHROMA_DIR keep their own stamps"""
+    Settings.CHROMA_DIR = tmp_path / "chroma_collections"
+    Settings.EMBEDDINGS_PATH = tmp_path / "embeddings.npy"
+    Settings.METADATA_PATH = tmp_path / "metadata.json"
+    np.save(Settings.EMBEDDINGS_PATH, np.eye(2, 3))
+    with open(Settings.METADATA_PATH, 'w') as f:
+        json.dump({"files": [{"file_path": "a.py"}, {"file_path": "b.py"}]}, f)
+
+    assert ChromaCodeDB().load_from_disk()
+    monkeypatch.setattr(Settings, "COLLECTION_NAME", "code_collection")
+    other = ChromaCodeDB()
+    assert other.read_stamp() is None
+    assert other.load_from_disk()
+    other.reset()
+    monkeypatch.undo()
+    assert ChromaCodeDB().read_stamp()["count"] == 2
+    assert sorted(p.name for p in Settings.CHROMA_DIR.glob("build_stamp_*.json")) == ["build_stamp_code_embeddings.json"]
+
+def test_upsert_and_delete_files(tmp_path):
+    """Files are written and removed by content-derived ids, whatever order they come in"""
+    Settings.CHROMA_DIR = tmp_path / "chroma_files"
+    files = [{"file_path": f"/repos/r/{name}", "repo_name": "r", "relative_path": name,
+              "language": "python", "file_hash": f"{name}-1"} for name in ["a.py", "b.py", "c.py"]]
+    embeddings = np.eye(3)
+
+    db = ChromaCodeDB()
+    assert db.upsert_files(files, embeddings) == 3
+    assert db.upsert_files(files[::-1], embeddings[::-1]) == 3
+    assert db.collection.count() == 3
+    assert db.search([0.0, 1.0, 0.0])[0]['file_path'] == "/repos/r/b.py"
+
+    # b.py changes: its new version is added and the old one removed
+    changed = dict(files[1], file_hash="b.py-2")
+    db.upsert_files([changed], [[0.0, 0.0, 1.0]])
+    assert db.delete_files([files[1]]) == 1
+    assert db.collection.count() == 3
+    stored = db.collection.get(ids=[file_id(changed)], include=["embeddings"])
+    np.testing.assert_allclose(stored["embeddings"][0], [0.0, 0.0, 1.0])
+    assert file_id(files[1]) not in db.collection.get(include=[])['ids']
+    assert file_id(files[0]) != file_id(files[0], model_id="other-model")
+
+def test_documents_kept_in_doc_store(tmp_path):
+    """Source text is stored compressed by file hash, search results get their code on request"""
+    from src.doc_store import DocStore, pack_text
+
+    store = DocStore(str(tmp_path / "docs"), chunk_chars=10, cache_bytes=600)
+    text = "".join(f"line {i} ✓\n" for i in range(50))
+    assert store.put_many({"h1": pack_text(text, 10)}) == 1
+    assert store.put_many({"h1": pack_text(text, 10)}) == 0
+    assert store.missing(["h1", "h2"]) == ["h2"]
+    assert store.read("h1") == text
+    for start, end in [(0, 5), (8, 23), (95, 300), (30, 30)]:
+        assert store.read("h1", start, end) == text[start:end]
+    assert store.read("h2") is None
+    misses = store.misses
+    assert store.read("h1", 290, 295) == text[290:295]
+    assert store.hits > 0 and store.misses == misses
+    assert store._cached_bytes <= 600 and ("h1", 0) not in store._cache
+    store.close()
+
+    Settings.CHROMA_DIR = tmp_path / "chroma_docs"
+    files = []
+    for name, body in [("a.py", "def a():\n    return 1\n" * 200), ("b.py", "class B:\n    pass\n")]:
+        path = tmp_path / name
+        path.write_text(body)
+        files.append({"file_path": str(path), "language": "python", "file_hash": f"hash-{name}"})
+    db = ChromaCodeDB()
+    assert db.upsert_files(files, np.eye(2, 3)) == 2
+    assert db.collection.get(include=["documents"])["documents"] == [None, None]
+    assert db.docs.stats()["stored_bytes"] < db.docs.stats()["text_bytes"]
+    results = db.search([1.0, 0.0, 0.0], top_k=1)
+    assert 'code' not in results[0]
+
+    # The copy in the doc store is read, not the file
+    (tmp_path / "a.py").write_text("changed")
+    db.with_snippets(results)
+    assert results[0]['code'] == ("def a():\n    return 1\n" * 200)[:SNIPPET_CHARS]
+    assert db.snippet({"file_path": str(tmp_path / "b.py")}, 5) == "class"
+
+def test_numpy_search_is_exact(tmp_path):
+    """Blocked NumPy search returns the brute-force top-k in ChromaCodeDB's result form"""
+    from src.numpy_db import NumpyCodeDB, compare_backends
+
+    Settings.CHROMA_DIR = tmp_path / "chroma_exact"
+    Settings.EMBEDDINGS_PATH = tmp_path / "embeddings.npy"
+    Settings.METADATA_PATH = tmp_path / "metadata.json"
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(50, 8))
+    np.save(Settings.EMBEDDINGS_PATH, embeddings)
+    files = [{"file_path": f"f{i}.py", "language": "python", "file_hash": f"h{i}", "deleted": i == 3}
+             for i in range(50)]
+    with open(Settings.METADATA_PATH, 'w') as f:
+        json.dump({"files": files}, f)
+
+    db = NumpyCodeDB(block_rows=7)
+    assert db.load_from_disk()
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    for i in [0, 3, 42]:
+        scores = normalized @ normalized[i]
+        scores[3] = -np.inf  # Deleted
+        expected = np.argsort(-scores)[:5]
+        results = db.search(embeddings[i].tolist(), top_k=5)
+        assert [r['file_path'] for r in results] == [f"f{j}.py" for j in expected]
+        assert results[0]['id'] == file_id(files[expected[0]])
+        np.testing.assert_allclose([r['similarity'] for r in results], scores[expected], rtol=1e-5)
+    assert len(db.search(embeddings[0].tolist(), top_k=100)) == 49
+
+    # The matrix is reused while the embeddings are unchanged
+    mtime = (db.directory / "vectors.npy").stat().st_mtime_ns
+    assert NumpyCodeDB().load_from_disk()
+    assert (db.directory / "vectors.npy").stat().st_mtime_ns == mtime
+    half = NumpyCodeDB(dtype="float16")
+    assert half.load_from_disk() and half.vectors.dtype == np.float16
+    assert half.search(embeddings[7].tolist(), 1)[0]['file_path'] == "f7.py"
+
+    chroma = ChromaCodeDB()
+    assert chroma.load_from_disk()
+    report = compare_backends(db, chroma, queries=10, k=5)
+    assert report["queries"] == 10 and report["rows"] == 49
+    assert report["recall_at_k"] > 0.9 and report["exact_ms"]["mean"] > 0
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file